@@ -73,6 +73,8 @@ class XObj(cmodel.Struct):
     
     __order__ = ["magic", "numgroups", "groups", "numsections", "sections"]
 
+cmodel.compile_schema(XObj)
+
 def asm2rad(asmDegs):
     return (asmDegs / (384 * 256)) % 1 * pi
 
@@ -67,6 +67,8 @@ class Rgb2(cmodel.Struct):
     
     __order__ = ["magic", "numsyms", "numsects", "symbols", "sections"]
 
+cmodel.compile_schema(Rgb2)
+
 _gnummap = {0:"BSS", 1:"VRAM", 2:"CODE", 3:("HOME", 0), 4:"HRAM"}
 
 class RGBDSLinker(linker.Linker):
@@ -0,0 +1,283 @@
+"""cmodel benchmark suite.
+
+Generates synthetic RGB2 objects, XObj objects and BPS patches of whatever
+size is asked for, times cmodel parsing and encoding them, and compares the
+results against an earlier run. Nothing here needs real object files, so it
+can be run anywhere CodeModule is installed."""
+import gc, io, json, platform, struct, sys, time, tracemalloc
+
+from CodeModule.cmd import command, logged, argument
+from CodeModule.asm import rgbds, asmotor
+from CodeModule import bps
+
+def _cstr(text):
+    return text.encode("ascii") + b"\x00"
+
+def _varint(number):
+    """Encode a number as a BPS variable size integer."""
+    encoded = bytearray()
+    while True:
+        lowbits = number & 0x7F
+        number >>= 7
+        if number == 0:
+            encoded.append(lowbits | 0x80)
+            return bytes(encoded)
+        
+        encoded.append(lowbits)
+        number -= 1
+
+def rgb2_object(symbols = 1000, sections = 100, patches = 8, exprlen = 5):
+    """Generate the bytes of an RGB2 object file.
+    
+    Every other section holds code, each with patches patches whose
+    expressions are exprlen operations long. A third of the symbols are
+    imports, which have no value."""
+    out = [b"RGB2", struct.pack("<II", symbols, sections)]
+    for symnum in range(symbols):
+        symtype = symnum % 3
+        out.append(_cstr("sym{}".format(symnum)) + bytes((symtype,)))
+        if symtype != 1:
+            out.append(struct.pack("<II", symnum % sections, symnum * 4))
+    
+    #LONG n, then pairs of (SymID n, ADD)
+    expr = [b"\x80" + struct.pack("<I", 5)]
+    for opnum in range(1, exprlen):
+        if opnum % 2:
+            expr.append(b"\x81" + struct.pack("<I", opnum))
+        else:
+            expr.append(b"\x00")
+    expr = b"".join(expr)
+    
+    for secnum in range(sections):
+        data = bytes(range(64))
+        if secnum % 2:
+            out.append(struct.pack("<IBii", len(data), 0, -1, -1))
+            continue
+        
+        out.append(struct.pack("<IBii", len(data), 2, -1, secnum))
+        out.append(data + struct.pack("<I", patches))
+        for patchnum in range(patches):
+            out.append(_cstr("src/file{}.asm".format(secnum)))
+            out.append(struct.pack("<IIBI", patchnum + 1, patchnum * 2 % len(data), 1, len(expr)))
+            out.append(expr)
+    
+    return b"".join(out)
+
+def xobj_object(symbols = 1000, sections = 100, patches = 8, exprlen = 5):
+    """Generate the bytes of an ASMotor XObj object file.
+    
+    symbols are spread evenly over the sections. Every other section is in
+    the code group, and has patches fixups with exprlen operations each."""
+    out = [b"XOB\x00", struct.pack("<I", 2)]
+    out.append(_cstr("BSS") + struct.pack("<I", 1))
+    out.append(_cstr("CODE") + struct.pack("<I", 0))
+    out.append(struct.pack("<I", sections))
+    
+    #OBJ_CONSTANT n, then pairs of (OBJ_SYMBOL n, OBJ_OP_ADD)
+    expr = [b"\x1e" + struct.pack("<I", 5)]
+    for opnum in range(1, exprlen):
+        if opnum % 2:
+            expr.append(b"\x1f" + struct.pack("<I", opnum))
+        else:
+            expr.append(b"\x01")
+    expr = b"".join(expr)
+    
+    symsper = symbols // sections if sections else 0
+    for secnum in range(sections):
+        groupid = 1 if secnum % 2 == 0 else 0
+        out.append(struct.pack("<i", groupid) + _cstr("sect{}".format(secnum)))
+        out.append(struct.pack("<iiI", -1, -1, symsper))
+        for symnum in range(symsper):
+            symtype = symnum % 3
+            out.append(_cstr("s{}_{}".format(secnum, symnum)) + struct.pack("<i", symtype))
+            if symtype != 1:
+                out.append(struct.pack("<i", symnum * 4))
+        
+        data = bytes(range(64))
+        out.append(struct.pack("<I", len(data)))
+        if groupid == 1:
+            out.append(data + struct.pack("<I", patches))
+            for patchnum in range(patches):
+                out.append(struct.pack("<III", patchnum * 2 % len(data), 0, len(expr)))
+                out.append(expr)
+    
+    return b"".join(out)
+
+def bps_patch(commands = 5000, readlen = 16):
+    """Generate the bytes of a BPS patch with commands commands.
+    
+    Commands cycle through all four actions; target reads carry readlen bytes
+    of data. The checksums are not real checksums."""
+    metadata = b"<patch/>"
+    out = [b"BPS1", _varint(commands * readlen), _varint(commands * readlen),
+           _varint(len(metadata)), metadata]
+    for cmdnum in range(commands):
+        action = cmdnum % 4
+        out.append(_varint(((readlen - 1) << 2) | action))
+        if action == 1:
+            out.append(bytes(range(readlen)))
+        elif action > 1:
+            #Relative offsets keep their sign in the lowest bit
+            out.append(_varint(cmdnum % 7 << 1 | cmdnum % 2))
+    
+    out.append(struct.pack("<III", 0, 0, 0))
+    return b"".join(out)
+
+#Each case is a schema and a function which generates bytes for it at a scale
+CASES = {
+    "rgb2": (rgbds.Rgb2, lambda scale: rgb2_object(scale["symbols"], scale["sections"], scale["patches"], scale["exprlen"])),
+    "xobj": (asmotor.XObj, lambda scale: xobj_object(scale["symbols"], scale["sections"], scale["patches"], scale["exprlen"])),
+    "bps": (bps.BPSPatchStruct, lambda scale: bps_patch(scale["commands"], scale["readlen"])),
+}
+
+DEFAULT_SCALE = {"symbols": 1000, "sections": 100, "patches": 8, "exprlen": 5,
+                 "commands": 5000, "readlen": 16}
+
+OPERATIONS = ("load", "parsebytes", "bytes", "save", "core")
+
+def _operation(opname, schema, data):
+    """Get the function which runs an operation, and the one which sets it up.
+    
+    Setup isn't timed. Operations other than parsing work on a freshly parsed
+    field, so that they don't just return what an earlier run cached."""
+    def parsed():
+        field = schema()
+        field.parsebytes(data)
+        return field
+    
+    if opname == "load":
+        return (lambda fileobj: schema().load(fileobj), lambda: io.BytesIO(data))
+    if opname == "parsebytes":
+        return (lambda unused: schema().parsebytes(data), lambda: None)
+    if opname == "bytes":
+        return (lambda field: field.bytes, parsed)
+    if opname == "save":
+        return (lambda field: field.save(io.BytesIO()), parsed)
+    if opname == "core":
+        return (lambda field: field.core, parsed)
+    raise KeyError(opname)
+
+def measure(opname, schema, data, repeat = 5):
+    """Time one operation on data.
+    
+    Returns a dict of the fastest and median times in seconds, throughput as
+    MB/s of encoded data and as whole files per second, both from the fastest
+    time, and the peak memory allocated by one more run, in bytes."""
+    run, setup = _operation(opname, schema, data)
+    
+    times = []
+    for i in range(repeat):
+        arg = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - start)
+    
+    #Tracing allocations is slow, so it gets its own run
+    arg = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    times.sort()
+    best = times[0]
+    return {"seconds": best,
+            "median": times[len(times) // 2],
+            "mbps": len(data) / best / 1000000 if best > 0 else None,
+            "files_per_s": 1 / best if best > 0 else None,
+            "peak": peak}
+
+def run_suite(cases = None, scale = None, repeat = 5, operations = OPERATIONS):
+    """Generate each case at the given scale and measure every operation on it.
+    
+    scale is a dict overriding some of DEFAULT_SCALE. Returns the results in
+    the form saved as JSON: the scale and environment the run used, and for
+    each case, its size in bytes and the measurements of each operation."""
+    fullscale = dict(DEFAULT_SCALE)
+    fullscale.update(scale or {})
+    
+    results = {"python": platform.python_version(),
+               "implementation": platform.python_implementation(),
+               "scale": fullscale,
+               "repeat": repeat,
+               "cases": {}}
+    
+    for casename in (cases or sorted(CASES.keys())):
+        schema, generate = CASES[casename]
+        data = generate(fullscale)
+        caseresults = {"size": len(data), "operations": {}}
+        for opname in operations:
+            caseresults["operations"][opname] = measure(opname, schema, data, repeat)
+        results["cases"][casename] = caseresults
+    
+    return results
+
+def compare(results, baseline, tolerance = 0.1):
+    """Find operations which got slower than in a baseline run.
+    
+    Only the fastest times are compared, and only for cases and operations in
+    both runs. Returns (case, operation, baseline seconds, new seconds) for
+    every one more than tolerance (a fraction) slower than the baseline."""
+    regressions = []
+    for casename, caseresults in sorted(results["cases"].items()):
+        basecase = baseline.get("cases", {}).get(casename)
+        if basecase is None:
+            continue
+        
+        for opname, measured in sorted(caseresults["operations"].items()):
+            baseop = basecase["operations"].get(opname)
+            if baseop is None:
+                continue
+            
+            if measured["seconds"] > baseop["seconds"] * (1 + tolerance):
+                regressions.append((casename, opname, baseop["seconds"], measured["seconds"]))
+    
+    return regressions
+
+@argument('-c', type=str, action="append", choices=sorted(CASES.keys()), dest="cases")
+@argument('--symbols', type=int, default=DEFAULT_SCALE["symbols"])
+@argument('--sections', type=int, default=DEFAULT_SCALE["sections"])
+@argument('--patches', type=int, default=DEFAULT_SCALE["patches"], help="patches per code section")
+@argument('--exprlen', type=int, default=DEFAULT_SCALE["exprlen"], help="operations per patch expression")
+@argument('--commands', type=int, default=DEFAULT_SCALE["commands"], help="commands per BPS patch")
+@argument('--readlen', type=int, default=DEFAULT_SCALE["readlen"], help="bytes per BPS command")
+@argument('-r', type=int, default=5, dest="repeat")
+@argument('-o', type=str, metavar="results.json", dest="outfile")
+@argument('--baseline', type=str, metavar="baseline.json")
+@argument('--tolerance', type=float, default=0.1)
+@command
+@logged("bench")
+def bench(logger, cases, symbols, sections, patches, exprlen, commands, readlen, repeat, outfile, baseline, tolerance, **kwargs):
+    """Benchmark cmodel on synthetic object files and patches."""
+    scale = {"symbols": symbols, "sections": sections, "patches": patches,
+             "exprlen": exprlen, "commands": commands, "readlen": readlen}
+    
+    logger.info("Benchmarking at scale %(scale)r..." % {"scale": scale})
+    results = run_suite(cases, scale, repeat)
+    
+    for casename, caseresults in sorted(results["cases"].items()):
+        for opname in OPERATIONS:
+            measured = caseresults["operations"][opname]
+            logger.info("%(case)-5s %(op)-10s %(ms)9.2f ms %(mbps)8.2f MB/s %(filesps)9.2f files/s %(peak)9.0f KiB peak" % {
+                "case": casename, "op": opname, "ms": measured["seconds"] * 1000,
+                "mbps": measured["mbps"] or 0, "filesps": measured["files_per_s"] or 0,
+                "peak": measured["peak"] / 1024})
+    
+    if outfile is not None:
+        with open(outfile, "w") as fileobj:
+            json.dump(results, fileobj, indent = 2, sort_keys = True)
+    
+    if baseline is not None:
+        with open(baseline, "r") as fileobj:
+            regressions = compare(results, json.load(fileobj), tolerance)
+        
+        for casename, opname, oldtime, newtime in regressions:
+            logger.warning("%(case)s %(op)s regressed: %(old).2f ms -> %(new).2f ms" % {
+                "case": casename, "op": opname, "old": oldtime * 1000, "new": newtime * 1000})
+        
+        if len(regressions) > 0:
+            sys.exit(1)
@@ -3,87 +3,105 @@
 Includes linker writeout module."""
 
 from CodeModule import cmodel
-from CodeModule.asm import linker
-from math import ceil
+from CodeModule.asm import writeout
+from CodeModule.exc import CorruptedData
 
 class VarInt(cmodel.Int(-1)):
-    """Like Py3K, BPS also uses variable size integers."""
+    """Like Py3K, BPS also uses variable size integers.
+    
+    Each byte holds seven bits of the number, lowest first, and the high bit
+    marks the last byte. Every byte after the first also adds one to the
+    number's place value, so that each number has only one encoding."""
     def load(self, fileobj):
-        continueParse = 1
         data = 0
-        while continueParse is 1:
+        shift = 1
+        while True:
             newbyte = fileobj.read(1)
-            data = data << 7 + (newbyte & 0x7F)
-            continueParse = newbyte >> 7
-
-        self.core = data
+            if len(newbyte) < 1:
+                raise CorruptedData
+            
+            data += (newbyte[0] & 0x7F) * shift
+            if newbyte[0] & 0x80:
+                break
+            
+            shift <<= 7
+            data += shift
+        
+        self.structvalue = data
     
     @property
     def bytes(self):
         data = self.core
-        bytesCount = ceil(data.bit_length / 7)
-        bytesDat = b""
-        for i in range(0, bytesCount):
-            highbit = 0x80
-            if i is bytesCount - 1:
-                highbit = 0x00
-
-            bytesDat += bytes((data & 0x7F) + highbit, "raw_unicode_escape")
-            data = data >> 7
-
-        return bytesDat
-
-    def __decode(self, obytes):
-        continueParse = 1
-        data = 0
-        while continueParse is 1:
-            newbyte = obytes[0]
-            obytes = obytes[1:]
-            data = data << 7 + (newbyte & 0x7F)
-            continueParse = newbyte >> 7
+        if data < 0:
+            raise CorruptedData
         
-        return (obytes, data)
+        bytesDat = bytearray()
+        while True:
+            lowbits = data & 0x7F
+            data >>= 7
+            if data == 0:
+                bytesDat.append(lowbits | 0x80)
+                return bytes(bytesDat)
+            
+            bytesDat.append(lowbits)
+            data -= 1
+
+    def __decode(self, view, offset):
+        data = 0
+        shift = 1
+        while True:
+            if offset >= len(view):
+                raise CorruptedData
+            
+            newbyte = view[offset]
+            offset += 1
+            data += (newbyte & 0x7F) * shift
+            if newbyte & 0x80:
+                return (offset, data)
+            
+            shift <<= 7
+            data += shift
     
     def bytesetter(self, obytes):
         #TODO: Rethink Int.bytesetter hack, should varints be enumable?
         #For right now, varints replicate the bytesetter hack.
-        (obytes, data) = self.__decode(obytes)
+        (offset, data) = self.__decode(memoryview(obytes), 0)
         
-        if len(obytes) > 0:
+        if offset < len(obytes):
             raise CorruptedData
         
         self.core = data
 
-    def parsebytes(self, obytes):
-        (obytes, data) = self.__decode(obytes)
+    def parseview(self, view, offset):
+        (offset, data) = self.__decode(view, offset)
         
-        self.core = data
-        return obytes
-
-    @property
-    def core(self):
-        return self.__coreint
-
-    @core.setter
-    def core(self, varint):
-        self.__coreint = varint
+        self.structvalue = data
+        return offset
+
+class PatchCommand(cmodel.BitStruct):
+    """The number that starts each patch command: what to do, and for how many bytes, less one."""
+    __storage__ = VarInt
+    action = (0, 2)
+    length = (2, -1)
+    
+    __order__ = ["action", "length"]
 
 class PatchSrcRead(cmodel.Struct):
-    __length = cmodel.BitField("cmdLength", 2, -1)
-    length = cmodel.Bias("__length", 1)
+    __order__ = []
 
 class PatchTgtRead(cmodel.Struct):
-    __length = cmodel.BitField("cmdLength", 2, -1)
-    length = cmodel.Bias("__length", 1)
     data = cmodel.Blob("length")
+    
+    __order__ = ["data"]
 
 class PatchCopyCmd(cmodel.Struct):
-    __length = cmodel.BitField("cmdLength", 2, -1)
-    length = cmodel.Bias("__length", 1)
     offset = VarInt
+    
+    __order__ = ["offset"]
 
 class PatchUnion(cmodel.Union):
-    __tag__ = cmodel.Enum(cmodel.BitField("cmdLength", 0, 2), "SRC_READ", "TGT_READ", "SRC_COPY", "TGT_COPY")
+    __tagname__ = "action"
+    __tag__ = cmodel.Enum(cmodel.U8, "SRC_READ", "TGT_READ", "SRC_COPY", "TGT_COPY")
 
     SRC_READ = PatchSrcRead
     TGT_READ = PatchTgtRead
@@ -91,19 +109,28 @@ class PatchUnion(cmodel.Union):
     TGT_COPY = PatchCopyCmd
 
 class PatchEntry(cmodel.Struct):
-    cmdLength = VarInt
+    cmdLength = PatchCommand
+    action = cmodel.Subfield("cmdLength", "action")
+    rawLength = cmodel.Subfield("cmdLength", "length")
+    length = cmodel.Bias("rawLength", 1)
     command = PatchUnion
+    
+    __order__ = ["cmdLength", "action", "rawLength", "length", "command"]
 
 class BPSPatchStruct(cmodel.Struct):
     magic = cmodel.Magic(b"BPS1")
     srcSize = VarInt
     targetSize = VarInt
     metadataSize = VarInt
-    metadata = cmodel.String("utf-8") #This is also XML, consider adding cmodel.XML?
+    metadata = cmodel.Blob("metadataSize") #This is also XML, consider adding cmodel.XML?
     patchData = cmodel.Array(PatchEntry, 12, cmodel.ParseToEOF)
     srcChksum = cmodel.LeU32
     tgtChksum = cmodel.LeU32
     chksum = cmodel.LeU32
+    
+    __order__ = ["magic", "srcSize", "targetSize", "metadataSize", "metadata", "patchData", "srcChksum", "tgtChksum", "chksum"]
+
+cmodel.compile_schema(BPSPatchStruct)
 
 def applyPatch(src, patch, tgt):
     bps = BPSPatchStruct()
@@ -113,6 +140,6 @@ def applyPatch(src, patch, tgt):
 #UNFINISHED CODE   
 #    for command in 
 
-class Writeout(linker.Writeout):
+class Writeout(writeout.OverlayWriteout):
     def __init__(self, srcrom):
         pass
@@ -1,7 +1,161 @@
 """Django.db.model-esque API for defining structs."""
-import math, collections
+import math, collections, struct, io, array, sys, mmap
 from CodeModule.exc import CorruptedData, InvalidSchema, PEBKAC #these are just empty Exception subclasses
 
+def _scan(view, offset, terminator = 0):
+    """Find the index of a terminator byte in a memoryview.
+
+    Searches in growing chunks so that we never copy the whole remaining view
+    just to find a short null-terminated string."""
+    chunk = 64
+    end = len(view)
+    while offset < end:
+        found = bytes(view[offset:offset + chunk]).find(terminator)
+        if found != -1:
+            return offset + found
+        
+        offset += chunk
+        chunk = min(chunk * 2, 65536)
+    
+    #Unterminated
+    raise CorruptedData
+
+class ReadBuffer(object):
+    """Buffered reader that Struct.load hands to all of its fields.
+    
+    Reads the underlying file in large chunks, so that fields which load a few
+    bytes at a time don't each cost a call into the file object. On top of
+    read, tell and seek it supports read_until, for null-terminated data, and
+    peek.
+    
+    Since we read ahead of what fields actually consume, call release once
+    loading is done to put the underlying file at the end of the loaded data.
+    Files which can't seek are never read ahead of what was asked for, unless
+    a field asks how much of them remains or peeks ahead."""
+    CHUNKSIZE = 65536
+    
+    def __init__(self, raw):
+        self.__raw = raw
+        try:
+            self.__readahead = raw.seekable()
+        except AttributeError:
+            self.__readahead = False
+        
+        #__buf holds the file's data from offset __base onwards, and the file
+        #itself is always positioned at the end of __buf.
+        self.__base = raw.tell() if self.__readahead else 0
+        self.__buf = b""
+        self.__pos = 0
+    
+    def __fill(self, count):
+        """Make sure count bytes past the current position are buffered.
+        
+        Returns False if the file ended first."""
+        avail = len(self.__buf) - self.__pos
+        if avail >= count:
+            return True
+        
+        want = count - avail
+        if self.__readahead:
+            want = max(want, self.CHUNKSIZE)
+        
+        chunks = [self.__buf[self.__pos:]]
+        while want > 0:
+            more = self.__raw.read(want)
+            if not more:
+                break
+            chunks.append(more)
+            want -= len(more)
+        
+        self.__base += self.__pos
+        self.__buf = b"".join(chunks)
+        self.__pos = 0
+        return len(self.__buf) >= count
+    
+    def read(self, count = -1):
+        if count is None or count < 0:
+            data = self.__buf[self.__pos:] + self.__raw.read()
+            self.__base = self.tell() + len(data)
+            self.__buf = b""
+            self.__pos = 0
+            return data
+        
+        self.__fill(count)
+        data = self.__buf[self.__pos:self.__pos + count]
+        self.__pos += len(data)
+        return data
+    
+    def read_until(self, terminator = b"\x00"):
+        """Read up to the next terminator, which is consumed but not returned.
+        
+        Raises CorruptedData if the file ends before the terminator does."""
+        scanned = 0
+        while True:
+            found = self.__buf.find(terminator, self.__pos + scanned)
+            if found != -1:
+                data = self.__buf[self.__pos:found]
+                self.__pos = found + len(terminator)
+                return data
+            
+            scanned = max(len(self.__buf) - self.__pos - len(terminator) + 1, 0)
+            if not self.__fill(len(self.__buf) - self.__pos + 1):
+                raise CorruptedData
+    
+    def peek(self, count = 1):
+        """Return up to count bytes without consuming them."""
+        self.__fill(count)
+        return self.__buf[self.__pos:self.__pos + count]
+    
+    def tell(self):
+        return self.__base + self.__pos
+    
+    def seek(self, offset, whence = io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            offset += self.size
+        
+        if self.__base <= offset <= self.__base + len(self.__buf):
+            self.__pos = offset - self.__base
+        else:
+            self.__raw.seek(offset, io.SEEK_SET)
+            self.__base = offset
+            self.__buf = b""
+            self.__pos = 0
+        
+        return offset
+    
+    @property
+    def size(self):
+        """Total size of the underlying file."""
+        end = self.__raw.seek(0, io.SEEK_END)
+        self.__raw.seek(self.__base + len(self.__buf), io.SEEK_SET)
+        return end
+    
+    @property
+    def remaining(self):
+        """Number of bytes left in the file past the current position.
+        
+        Files which can't seek are read to the end to find out, and everything
+        read is kept in the buffer until it is consumed."""
+        if self.__readahead:
+            return self.size - self.tell()
+        
+        self.__base += self.__pos
+        self.__buf = self.__buf[self.__pos:] + self.__raw.read()
+        self.__pos = 0
+        return len(self.__buf)
+    
+    def release(self):
+        """Drop the buffer and return the underlying file, positioned just past the data consumed."""
+        if self.__readahead:
+            self.__raw.seek(self.tell(), io.SEEK_SET)
+        
+        self.__base = self.tell()
+        self.__buf = b""
+        self.__pos = 0
+        return self.__raw
+
 class CField(object):
     def __init__(self, name = None, container = None, *args, **kwargs):
         if name is not None:
@@ -10,6 +164,31 @@ class CField(object):
         self.__container = container
         super(CField, self).__init__(*args, **kwargs)
 
+    @classmethod
+    def from_mmap(cls, mapping, offset = 0):
+        """Parse a new instance of this field out of a memory-mapped file.
+        
+        Works with any buffer, but mmaps are special: Blobs and lazy Arrays
+        parsed out of a read-only mapping reference the mapped pages instead
+        of copying them, so the mapping is kept open for as long as they are.
+        Blobs still give out bytes, copied the first time they're asked for,
+        after which they no longer hold the mapping open."""
+        self = cls()
+        self.parseview(memoryview(mapping), offset)
+        return self
+    
+    @classmethod
+    def load_path(cls, path):
+        """Memory-map the file at path and parse a new instance out of it."""
+        with open(path, "rb") as fileobj:
+            try:
+                mapping = mmap.mmap(fileobj.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError:
+                #Empty files can't be mapped
+                return cls.from_mmap(b"")
+        
+        return cls.from_mmap(mapping)
+    
     def extSuper(self, exobject):
         """Helper function: Get super of an object we don't know the class of.
 
@@ -20,33 +199,169 @@ class CField(object):
         else:
             return super(exobject.__class__, exobject)
     
-    def find_argument_field(self, argfieldname):
-        """Given a dynamic argument name, return the field instance.
-
-        This function is the basis of the *_dynamic_argument functions. It
-        returns a CField object directly."""
-        argcontainer = self.__container
-
-        while argcontainer != None:
-            try:
-                return argcontainer.__getfield(argfieldname)
-            except:
+    def __init_subclass__(cls, **kwargs):
+        super(CField, cls).__init_subclass__(**kwargs)
+        #Filled in by the Struct metaclass; see _bind.
+        cls.__bindings = {}
+    
+    def __argslot(self, argfieldname):
+        """Find the container holding the field named argfieldname.
+        
+        Returns the container and the index of the field within it. Schemas
+        resolve most dynamic arguments when they are declared, so we usually
+        just have to climb a known number of containers; otherwise we search
+        for the nearest container with a field of that name."""
+        binding = type(self).__bindings.get(argfieldname)
+        if binding is not None:
+            levels, owner, index = binding
+            argcontainer = self
+            while levels > 0 and argcontainer is not None:
                 argcontainer = argcontainer.__container
+                levels -= 1
+            
+            if isinstance(argcontainer, owner):
+                return argcontainer, index
+        
+        argcontainer = self.__container
+        while argcontainer is not None:
+            index = argcontainer.__fieldindex(argfieldname)
+            if index is not None:
+                return argcontainer, index
+            argcontainer = argcontainer.__container
 
         #Only raised if the argument field requested does not exist
-        raise AttributeError
+        raise AttributeError(argfieldname)
+    
+    def changed(self, delta = None):
+        """Drop the cached encoding of this field and of everything containing it.
+        
+        Containers cache their bytes once encoded, and their core value once
+        read, so every public way of changing a field's value must call this. Parsing doesn't; containers
+        drop their own cache when they parse, and their containers must be
+        parsing too or else have been told by parsebytes or load. Containers
+        with fields that look up dynamic arguments from outside them never
+        cache anything, since changing those arguments wouldn't reach them.
+        
+        delta is the number of bytes the field's encoding grew by, if the
+        caller knows it and no other field's size depends on the change.
+        Containers which know their encoded size adjust it by delta instead of
+        forgetting it, so that sizes stay cheap to ask for after an edit."""
+        field = self
+        while field is not None:
+            if field.__cache is not None:
+                field.__cache = None
+            if field.__corecache is not None:
+                field.__corecache = None
+            if field.__size is not None:
+                if delta is None:
+                    field.__size = None
+                else:
+                    field.__size += delta
+            field = field.__container
+    
+    def __reloaded(self, fileobj):
+        """Tell our containers that we were loaded with new contents.
+        
+        Fields which don't go through a bytes setter to load call this when
+        they're done. Containers loading us hand us a ReadBuffer, and are
+        rebuilding their caches anyway, so only a load called directly on a
+        field which is already in a container has anything to drop."""
+        if self.__container is not None and not isinstance(fileobj, ReadBuffer):
+            self.changed()
+    
+    def find_argument_field(self, argfieldname):
+        """Given a dynamic argument name, return the field instance.
+
+        This function returns a CField object directly. Containers which store
+        field values compactly will create the field object on demand; prefer
+        the *_dynamic_argument functions if you only need the value."""
+        argcontainer, index = self.__argslot(argfieldname)
+        return argcontainer.__getslot(index)
 
     def alter_dynamic_argument(self, argfieldname, callback):
-        arg = self.find_argument_field(argfieldname)
-        newarg = callback(arg.core)
-        arg.core = newarg
+        argcontainer, index = self.__argslot(argfieldname)
+        newarg = callback(argcontainer.__getslotvalue(index))
+        argcontainer.__setslotvalue(index, newarg)
 
     def get_dynamic_argument(self, argfieldname):
-        v = self.find_argument_field(argfieldname).core
-        return v
+        argcontainer, index = self.__argslot(argfieldname)
+        return argcontainer.__getslotvalue(index)
 
     def set_dynamic_argument(self, argfieldname, newval):
-        self.alter_dynamic_argument(argfieldname, lambda x: newval)
+        argcontainer, index = self.__argslot(argfieldname)
+        argcontainer.__setslotvalue(index, newval)
+    
+    def __skipsize(self):
+        """Number of bytes this field will take up in the data about to be loaded.
+        
+        Returns None if that can't be known without parsing the field. Used
+        to seek past fields that a projected load doesn't want."""
+        return self.STATICSIZE
+    
+    @classmethod
+    def validate(cls, source, offset = 0):
+        """Check that source holds a well-formed instance of this field type.
+        
+        source is a file object, which is read from its current position, or
+        a buffer. The schema is walked over the data without creating any
+        fields or core values: magic numbers, enum values, sizes and counts
+        against the remaining data, and the rule that Arrays' elements must
+        consume some data, are all checked.
+        
+        Returns (True, end offset) if the data is good, or (False, offset of
+        the first field found to be bad). Offsets are positions in the file,
+        or in the buffer. Fields looking up a dynamic argument this type
+        doesn't have are bad, since nothing can be parsed without it. Fields
+        which can't be skimmed are parsed in full, inside stand-ins for their
+        containers; see _SkimScope. Conditions that look at their containers
+        make us keep the values of Array elements, for them to look at."""
+        start = 0
+        if hasattr(source, "read"):
+            try:
+                start = source.tell()
+            except OSError:
+                #Pipes don't know where they are; count from where we started
+                pass
+            source = source.read()
+        view = memoryview(source)
+        keep = any(argname is _ANYFIELD for (_, argname, _) in _unbound(cls))
+        
+        try:
+            return (True, start + _skimfield(cls, view, offset, _SkimScope({}, None, keep))[1])
+        except CorruptedData as e:
+            return (False, start + e.args[0])
+    
+    @classmethod
+    def __skim(cls, view, offset, scope):
+        """Check one instance of this field type in view at offset, without creating it.
+        
+        scope is the _SkimScope of the innermost container being skimmed.
+        Returns (value, offset): the field's value, if a dynamic argument
+        might need it, and the offset just past it. Raises CorruptedData if
+        the data is bad.
+        
+        Types with bare values can use their parsevalue; others are created and
+        parsed after all, in scope, which stands in for their container. Only
+        this one field is created, so containers should override this."""
+        if cls.SLOTTED:
+            return cls.parsevalue(view, offset)
+        
+        field = cls(container = scope if len(_unbound(cls)) > 0 else None)
+        offset = field.parseview(view, offset)
+        return (field.core if cls.PRIMITIVE else None, offset)
+    
+    #Containers which have named subfields override these.
+    def __fieldindex(self, name):
+        return None
+    
+    def __getslot(self, index):
+        raise AttributeError(index)
+    
+    def __getslotvalue(self, index):
+        return self.__getslot(index).core
+    
+    def __setslotvalue(self, index, val):
+        self.__getslot(index).core = val
 
     def reparent(self, name = None, container = None):
         #Not sure if this is still needed; since I've eliminated almost all code
@@ -63,6 +378,33 @@ class CField(object):
 
         self.__container = container
     
+    def clone(self):
+        """Copy this field, as a new field that isn't in any container.
+        
+        Much faster than encoding the field and parsing it again. Containers
+        copy their structure, so either copy can be changed without affecting
+        the other, but immutable values such as strings and blob bytes are
+        shared between them instead of being copied."""
+        return self.__clone(None)
+    
+    def __deepcopy__(self, memo):
+        twin = memo.get(id(self))
+        if twin is None:
+            twin = memo[id(self)] = self.clone()
+        return twin
+    
+    def __clone(self, container):
+        """Copy this field into container.
+        
+        The copy starts out with all of this field's attributes, which is
+        enough for fields holding immutable values; containers extend this to
+        copy their fields into the copy."""
+        cls = type(self)
+        twin = cls.__new__(cls)
+        twin.__dict__.update(self.__dict__)
+        twin.__container = container
+        return twin
+    
     def save(self, fileobj):
         """Default implementation of file encoding/saving.
         
@@ -70,6 +412,18 @@ class CField(object):
         just save it automatically."""
         fileobj.write(self.bytes)
     
+    def writeinto(self, buf, offset):
+        """Encode this field into the writable buffer buf, starting at offset.
+        
+        Returns the offset just past the encoded field; buf must have room for
+        bytelength bytes at offset. Containers override this to have their
+        fields encode straight into the buffer, rather than joining together
+        byte strings for each of them."""
+        obytes = self.bytes
+        end = offset + len(obytes)
+        buf[offset:end] = obytes
+        return end
+    
     def load(self, fileobj):
         """Default implementation of file parsing/loading.
         
@@ -85,10 +439,6 @@ class CField(object):
     def parsebytes(self, obytes):
         """Default implementation of byte string parsing.
         
-        Like CField.load, fields that don't know their size until after they
-        have been parsed should override parsebytes with a proper parser for
-        that field type.
-        
         CField.parsebytes is equivalent to CField.load, but for byte strings
         instead of files. The byte string equivalent to CField.save is the bytes
         property.
@@ -96,9 +446,32 @@ class CField(object):
         The bytes property may have a setter. In this case, the setter method
         property should only accept properly formatted input with no extra bytes
         while parsebytes may accept said input with extra bytes, so long as it
-        returns any bytes it does not need."""
-        self.bytes = obytes[0:self.bytelength]
-        return obytes[self.bytelength:-1]
+        returns any bytes it does not need.
+        
+        Fields should not override this; override parseview instead."""
+        self.changed()
+        end = self.parseview(memoryview(obytes), 0)
+        return obytes[end:]
+    
+    def parseview(self, view, offset):
+        """Default implementation of zero-copy buffer parsing.
+        
+        Parse this field out of the memoryview view, starting at offset, and
+        return the offset just past the end of the field. Containers pass the
+        same view down to all of their children, so parsing a buffer never
+        copies more than the bytes of each individual field.
+        
+        Like CField.load, fields that don't know their size until after they
+        have been parsed should override parseview with a proper parser for
+        that field type. Fields must not read past the end of the view; it may
+        have been truncated by an enclosing byte-counted Array."""
+        end = offset + self.bytelength
+        if end > len(view):
+            #We ran out of data before parsing was complete.
+            raise CorruptedData
+        
+        self.bytes = bytes(view[offset:end])
+        return end
 
     #When this is declared True, Struct and Union will attempt to hide the field
     #entirely from user code by returning the core property in getattribute.
@@ -110,6 +483,95 @@ class CField(object):
     #objects and users should be working with those. Declaring PRIMITIVE = False
     #indicates that your object has subfields useful to it's users.
     PRIMITIVE = True
+    
+    #Fixed-size fields which can be expressed as a single struct module format
+    #code (e.g. "<H", "4s") declare it here. Struct coalesces runs of adjacent
+    #STRUCTFMT fields into one precompiled struct.Struct and moves values in and
+    #out of them through the structvalue property, bypassing load and bytes.
+    #Subclasses which change how the field is encoded MUST reset this to None.
+    STRUCTFMT = None
+    
+    #Primitive fields whose entire state is their core value can be stored by
+    #Struct as a bare value instead of a field object; the field object is only
+    #created if someone asks for it (e.g. find_argument_field). Such fields
+    #declare SLOTTED = True, a DEFAULTVALUE, and the classmethods checkvalue,
+    #loadvalue, parsevalue and encodevalue, which mirror core.setter, load,
+    #parseview and bytes. The same rule as STRUCTFMT applies to subclasses.
+    SLOTTED = False
+    
+    #Fields whose values fit an array module typecode declare it here, along
+    #with the byte order they are encoded in. Arrays of them are stored as one
+    #native array.array rather than a list of field objects. The same rule as
+    #STRUCTFMT applies to subclasses.
+    TYPECODE = None
+    BYTEORDER = sys.byteorder
+    
+    #Names of the dynamic arguments this field type looks up in its containers.
+    #Struct resolves them to a fixed container and slot when the schema is
+    #declared, so that instances don't have to search for them at runtime.
+    DYNARGS = ()
+    
+    #The dynamic arguments this field type ties to its own length, with
+    #tie_to_length. Struct keeps those fields as field objects throughout.
+    TIEDARGS = ()
+    
+    #Dynamic arguments used by subfields which couldn't be resolved within this
+    #type. Container types fill this in; see _unbound.
+    __nested = ()
+    
+    #Encoded bytes of a container, kept until something inside it changes.
+    __cache = None
+    
+    #Core value of a container, kept under the same rules as __cache.
+    __corecache = None
+    
+    #False for containers holding fields which look up dynamic arguments from
+    #outside them. Those fields can change when the argument does, without
+    #anything inside the container being told, so it can't keep a cache.
+    __cacheable = True
+    
+    #Encoded size of a container, kept up to date by changed() when possible.
+    __size = None
+    
+    #Field types whose every instance encodes to the same number of bytes
+    #declare that number here; None means the size depends on the data. Struct
+    #and Union compute it from their fields, and Arrays from their element
+    #type, whenever they have a fixed layout.
+    STATICSIZE = None
+    
+    #Field types which contain other field types list them here, so that
+    #schema-wide passes such as compile_schema can find them.
+    SUBTYPES = ()
+    
+    #Fields whose checkvalue accepts every value their STRUCTFMT can decode,
+    #unchanged, declare this so compiled schemas can skip the check. Subclasses
+    #which override checkvalue MUST reset this to False.
+    STRUCTEXACT = False
+
+#Stands in for the argument of an If with a callable condition, which may
+#read any field of any of its containers. No Struct has a field by this name,
+#so it is never resolved, and nothing containing the If keeps a cache.
+_ANYFIELD = "<any field>"
+
+def _unbound(fieldtype):
+    """List the dynamic arguments used within a field type that it can't resolve itself.
+    
+    Each entry is (consumer, name, levels): the field type which looks up the
+    argument, its name, and how many containers up from the consumer an
+    instance of fieldtype is."""
+    own = [(fieldtype, argname, 0) for argname in fieldtype.DYNARGS]
+    return own + list(fieldtype._CField__nested)
+
+def _bind(consumer, argname, binding):
+    """Record where a consumer field type finds a dynamic argument.
+    
+    Field types used in several places which disagree on where an argument
+    lives are left unbound, and fall back to searching at runtime."""
+    bindings = consumer._CField__bindings
+    if argname not in bindings:
+        bindings[argname] = binding
+    elif bindings[argname] != binding:
+        bindings[argname] = None
 
 def Magic(magicbytes):
     class MagicInstance(CField):
@@ -128,10 +590,11 @@ def Magic(magicbytes):
             else:
                 raise CorruptedData
         
-        def parsebytes(self, obytes):
-            omagic = obytes[0:len(magicbytes)]
-            self.bytes = omagic
-            return obytes[len(magicbytes):-1]
+        def parseview(self, view, offset):
+            end = offset + len(magicbytes)
+            if view[offset:end] != magicbytes:
+                raise CorruptedData
+            return end
         
         @property
         def core(self):
@@ -141,6 +604,36 @@ def Magic(magicbytes):
         def core(self, val):
             if val != magicbytes:
                 raise CorruptedData
+        
+        structvalue = core
+        
+        @property
+        def bytelength(self):
+            return len(magicbytes)
+        
+        @classmethod
+        def checkvalue(cls, val):
+            if val != magicbytes:
+                raise CorruptedData
+            return magicbytes
+        
+        @classmethod
+        def loadvalue(cls, fileobj):
+            return cls.checkvalue(fileobj.read(len(magicbytes)))
+        
+        @classmethod
+        def parsevalue(cls, view, offset):
+            end = offset + len(magicbytes)
+            return (cls.checkvalue(view[offset:end]), end)
+        
+        @classmethod
+        def encodevalue(cls, val):
+            return magicbytes
+        
+        STRUCTFMT = "{}s".format(len(magicbytes))
+        STATICSIZE = len(magicbytes)
+        SLOTTED = True
+        DEFAULTVALUE = magicbytes
 
     return MagicInstance
 
@@ -151,13 +644,8 @@ def String(encoding = "utf-8"):
             super(StringInstance, self).__init__(*args, **kwargs)
         
         def load(self, fileobj):
-            corestr = []
-            while True:
-                ltr = fileobj.read(1)
-                corestr.append(ltr)
-                if (ltr == b"\x00"):
-                    break
-            self.bytes = b"".join(corestr)
+            self.__corestr = self.loadvalue(fileobj)
+            self._CField__reloaded(fileobj)
         
         @property
         def core(self):
@@ -165,7 +653,9 @@ def String(encoding = "utf-8"):
 
         @core.setter
         def core(self, val):
+            oldlength = self.bytelength
             self.__corestr = val
+            self.changed(self.bytelength - oldlength)
         
         @property
         def bytes(self):
@@ -175,29 +665,53 @@ def String(encoding = "utf-8"):
         def bytes(self, inbytes):
             if inbytes[-1] != 0:
                 raise CorruptedData
+            oldlength = self.bytelength
             self.__corestr = inbytes[0:-1].decode(encoding)
+            self.changed(self.bytelength - oldlength)
         
         @property
         def bytelength(self):
-            raise PEBKAC #Strings are always variable length null-terminated,
-                         #and thus cannot have a bytelength
+            #Strings are variable length and null-terminated, so this is only
+            #known once the string has been loaded or set.
+            return len(self.__corestr.encode(encoding)) + 1
         
-        def parsebytes(self, obytes):
-            corestr = []
-            overindex = 0
+        def parseview(self, view, offset):
+            (self.__corestr, offset) = self.parsevalue(view, offset)
+            return offset
+        
+        def __str__(self):
+            return self.core
+        
+        @classmethod
+        def checkvalue(cls, val):
+            return val
+        
+        @classmethod
+        def loadvalue(cls, fileobj):
+            if isinstance(fileobj, ReadBuffer):
+                return fileobj.read_until(b"\x00").decode(encoding)
             
-            for i in range(0, len(obytes)):
-                ltr = obytes[i]
-                corestr += ltr
+            corestr = []
+            while True:
+                ltr = fileobj.read(1)
+                if len(ltr) == 0:
+                    raise CorruptedData
                 if (ltr == b"\x00"):
-                    overindex = i + 1
                     break
-            
-            self.bytes = "".join(corestr)
-            return obytes[overindex:-1]
+                corestr.append(ltr)
+            return b"".join(corestr).decode(encoding)
         
-        def __str__(self):
-            return self.core
+        @classmethod
+        def parsevalue(cls, view, offset):
+            end = _scan(view, offset)
+            return (str(view[offset:end], encoding), end + 1)
+        
+        @classmethod
+        def encodevalue(cls, val):
+            return val.encode(encoding) + b"\x00"
+        
+        SLOTTED = True
+        DEFAULTVALUE = ""
     return StringInstance
 
 LittleEndian = 0            # 0x12345678 = b'\x78\x56\x34\x12'
@@ -209,21 +723,95 @@ SignedTwos = Signed = 1     # High bit on means absolute value is complement of
 SignedOnes = 2              # High bit on means absolute value is complement of lower bits
 SignedMagnitude = 3         # High bit on means absolute value is all lower bits
 
+def _arraycode(structfmt):
+    """Return the array module typecode which holds the values of a single-item struct format.
+    
+    Returns None if there isn't one."""
+    code = structfmt.lstrip("<>")
+    if len(code) != 1 or code not in "bBhHiIlLqQ":
+        return None
+    
+    size = struct.calcsize("<" + code)
+    for typecode in ("bhilq" if code.islower() else "BHILQ"):
+        if array.array(typecode).itemsize == size:
+            return typecode
+    return None
+
 def Int(size, endianness = BigEndian, signedness = Unsigned):
     """Integer parsing class factory.
 
     It's result can also be subclassed. If you are writing a variable-int subclass,
     set size - 1 and override ALL parsing functions."""
     bytecount = math.floor(size / 8)
-    if size % 8 is not 0 and size is not -1:
+    if size % 8 != 0 and size != -1:
         raise InvalidSchema #we only support byte-aligned ints for now
         
     decomp  = pow(2,size)
     bitmask = pow(2,size) - 1
     highbit = pow(2,size - 1)
+    byteorder = "little" if endianness is LittleEndian else "big"
 
     if (size == -1): #support for var-int subclasses
         bitmask = -1
+    
+    #Ints that the struct module can encode natively get a precompiled codec.
+    #Everything else (24-bit, ones-complement, sign-magnitude) goes through
+    #int.from_bytes/int.to_bytes instead of a per-byte loop.
+    structfmt = None
+    if bytecount in (1, 2, 4, 8) and signedness in (Unsigned, SignedTwos):
+        structfmt = {1: "B", 2: "H", 4: "I", 8: "Q"}[bytecount]
+        if signedness is SignedTwos:
+            structfmt = structfmt.lower()
+        if bytecount > 1:
+            structfmt = ("<" if endianness is LittleEndian else ">") + structfmt
+    
+    codec = None
+    typecode = None
+    if structfmt is not None:
+        codec = struct.Struct(structfmt if bytecount > 1 else "<" + structfmt)
+        typecode = _arraycode(structfmt)
+    
+    def decode(obytes, offset = 0):
+        if codec is not None:
+            return codec.unpack_from(obytes, offset)[0]
+        
+        result = int.from_bytes(obytes[offset:offset + bytecount], byteorder)
+        if result & highbit != 0:
+            if signedness is Unsigned:
+                pass
+            elif signedness is SignedTwos:
+                #since ints are infinitely big 2s compliment, just shifting the bytes in will not
+                #give us a negative number since we started with a positive number, and thus py3k will
+                #sign extend that erronous highbit foreer. so instead we bitwise decode it to unsigned
+                #and arithmetically negate it to change the high bit
+                result = result - decomp
+            elif signedness is SignedOnes:
+                result = result - bitmask
+            elif signedness is SignedMagnitude:
+                result = -(result - highbit)
+        
+        return result
+    
+    def encode(formattedint):
+        try:
+            if codec is not None:
+                return codec.pack(formattedint)
+            
+            if formattedint < 0:
+                if signedness is Unsigned:
+                    #You can't write negative integers to an unsigned field.
+                    raise CorruptedData
+                elif signedness is SignedTwos:
+                    formattedint = formattedint + decomp
+                elif signedness is SignedOnes:
+                    formattedint = bitmask - abs(formattedint)
+                elif signedness is SignedMagnitude:
+                    formattedint = abs(formattedint) + highbit
+            
+            return formattedint.to_bytes(bytecount, byteorder)
+        except (struct.error, OverflowError):
+            #Value doesn't fit in the field.
+            raise CorruptedData
 
     class IntInstance(CField):
         """Class which parses ints of arbitrary size, endianness, and sign format."""
@@ -256,54 +844,49 @@ def Int(size, endianness = BigEndian, signedness = Unsigned):
             self.__lengthlock = length
             self.__lengthparam = param
         
+        def _CField__clone(self, container):
+            twin = super(IntInstance, self)._CField__clone(container)
+            if self.__lengthlock is not None:
+                #The copy of whatever we're tied to ties its own copy of us.
+                twin.__coreint = self.core
+                twin.__lengthlock = None
+                twin.__lengthparam = None
+            return twin
+        
+        def __lockedlength(self):
+            if self.__lengthparam == "bytes":
+                #Encoded lengths are tracked by bytelength, which doesn't
+                #have to encode the field to know it.
+                return self.__lengthlock.bytelength
+            if self.__lengthparam is not None:
+                return len(self.__lengthlock.__getattribute__(self.__lengthparam))
+            return len(self.__lengthlock)
+        
         @property
         def core(self):
             if self.__lengthlock is not None:
-                if self.__lengthparam is not None:
-                    return len(self.__lengthlock.__getattribute__(self.__lengthparam))
-                return len(self.__lengthlock)
+                return self.__lockedlength()
             return self.__coreint
         
         @core.setter
         def core(self, val):
             #If we have a length-lock, all attempts to write to the field with
             #invalid data will fail.
-            if self.__lengthlock is not None and self.__lengthparam is not None \
-                and val != len(self.__lengthlock.__getattribute__(self.__lengthparam)):
+            if self.__lengthlock is not None and val != self.__lockedlength():
                 raise CorruptedData
-            if self.__lengthlock is not None and val != len(self.__lengthlock):
-                raise CorruptedData
-            self.__coreint = val & bitmask
+            if signedness is Unsigned:
+                val = val & bitmask
+            
+            #We might be some other field's size or condition, so containers
+            #can only keep their size if the value is the same. Tied values
+            #just follow the size of whatever they're tied to.
+            oldval = self.__coreint
+            self.__coreint = val
+            self.changed(0 if val == oldval or self.__lengthlock is not None else None)
         
         @property
         def bytes(self):
-            data = b''
-            stride = endianness
-            if endianness is LittleEndian:
-                stride = -1
-            
-            formattedint = self.__coreint
-            if self.__lengthlock is not None:
-                if self.__lengthparam is not None:
-                    formattedint = len(self.__lengthlock.__getattribute__(self.__lengthparam))
-                else:
-                    formattedint = len(self.__lengthlock)
-            
-            if self.__coreint < 0:
-                if signedness is Unsigned:
-                    #You can't write negative integers to an unsigned field.
-                    raise CorruptedData
-                elif signedness is SignedTwos:
-                    formattedint = ~abs(formattedint) + 1
-                elif signedness is SignedOnes:
-                    formattedint = ~abs(formattedint)
-                elif signedness is SignedMagnitude:
-                    formattedint = formattedint + highbit
-            
-            for i in range(bytecount, 0, stride):
-                data += bytes(chr(formattedint >> i*8 & 0xFF), "raw_unicode_escape")
-            
-            return data
+            return encode(self.core)
         
         @bytes.setter
         def bytes(self, obytes):
@@ -311,48 +894,70 @@ def Int(size, endianness = BigEndian, signedness = Unsigned):
         
         def bytesetter(self, obytes):
             """MASSIVE HACK used so that Enum can set IntInstance.bytes from within Enum.bytes.setter."""
+            if len(obytes) < bytecount:
+                #We ran out of data before parsing was complete.
+                raise CorruptedData
             
+            oldval = self.__coreint
+            self.structvalue = decode(obytes[0:bytecount])
+            self.changed(0 if self.__coreint == oldval else None)
+            return obytes[bytecount:]
+        
+        @property
+        def structvalue(self):
+            return self.core
+        
+        @structvalue.setter
+        def structvalue(self, val):
+            """Install an already-decoded value, as if it had been parsed."""
             self.__lengthlock = None
             self.__lengthparam = None
-            
-            result = 0
-            if endianness is LittleEndian:
-                stride = 1
-                begin = 0
-                end = bytecount
-            if endianness is BigEndian:
-                stride = -1
-                begin = bytecount - 1
-                end = -1
-
-            for i in range (begin, end, stride):
-                result = result + (obytes[i] << i*8)
-
-            if result & highbit != 0:
-                if signedness is Unsigned:
-                    pass
-                elif signedness is SignedTwos:
-                    #since ints are infinitely big 2s compliment, just shifting the bytes in will not
-                    #give us a negative number since we started with a positive number, and thus py3k will
-                    #sign extend that erronous highbit foreer. so instead we bitwise decode it to unsigned
-                    #and arithmetically negate it to change the high bit
-                    result = result - decomp
-                elif signedness is SignedOnes:
-                    result = result - bitmask
-                elif signedness is SignedMagnitude:
-                    result = -(result - highbit)
-            
-            self.__coreint = result
-            
-            return obytes[bytecount:]
+            self.__coreint = val
         
-        def parsebytes(self, obytes):
-            self.bytes = obytes[0:bytecount]
-            return obytes[bytecount:-1]
+        def parseview(self, view, offset):
+            if offset + bytecount > len(view):
+                raise CorruptedData
+            
+            self.structvalue = decode(view, offset)
+            return offset + bytecount
         
         @property
         def bytelength(self):
-            return bytecount
+            if bytecount > 0:
+                return bytecount
+            return len(self.bytes) #var-int subclasses
+        
+        @classmethod
+        def checkvalue(cls, val):
+            if signedness is Unsigned:
+                val = val & bitmask
+            return val
+        
+        @classmethod
+        def loadvalue(cls, fileobj):
+            obytes = fileobj.read(bytecount)
+            if len(obytes) < bytecount:
+                raise CorruptedData
+            return cls.checkvalue(decode(obytes))
+        
+        @classmethod
+        def parsevalue(cls, view, offset):
+            if offset + bytecount > len(view):
+                raise CorruptedData
+            return (cls.checkvalue(decode(view, offset)), offset + bytecount)
+        
+        @classmethod
+        def encodevalue(cls, val):
+            return encode(val)
+        
+        SLOTTED = bytecount > 0
+        DEFAULTVALUE = 0
+        
+        STRUCTFMT = structfmt
+        STRUCTEXACT = True
+        STATICSIZE = bytecount if bytecount > 0 else None
+        TYPECODE = typecode
+        BYTEORDER = byteorder
 
     return IntInstance
 
@@ -375,236 +980,1568 @@ EntriesCount = 0 # Array size is in number of instances of the contained type
 BytesCount = 1   # Array size is in number of encoded bytes in the underlying datablob
 ParseToEOF = 2   # Array is continuously parsed until some bytes before EOF.
 
-def Array(containedType, sizeParam, countType = EntriesCount, *args, **kwargs):
-    """Array class factory.
+def _projection(spec):
+    """Normalize a load projection into nested dicts of field names.
+    
+    Accepts None (load everything), a dict mapping field names to their own
+    projections, or an iterable of dotted paths such as "sections.org". Path
+    components name Struct fields; Arrays, Unions and Ifs apply projections to
+    their contents. A field named without any subfields is loaded in full."""
+    if spec is None or isinstance(spec, dict):
+        return spec
+    
+    if isinstance(spec, str):
+        spec = [spec]
+    
+    projection = {}
+    for path in spec:
+        parts = path.split(".")
+        level = projection
+        for part in parts[:-1]:
+            sublevel = level.get(part, {})
+            if sublevel is None:
+                #Already loading this one in full
+                break
+            level[part] = sublevel
+            level = sublevel
+        else:
+            level[parts[-1]] = None
+    
+    return projection
 
-    CModel arrays can have multiple count types:
+def _writeout(field, fileobj):
+    """Save a container with a single write.
+    
+    If the field's encoded size is already known, it is encoded into one
+    preallocated buffer. Otherwise, measuring it would cost about as much as
+    encoding it, so it is encoded through bytes instead, which also caches the
+    encoding. Either way, its fields aren't written out separately."""
+    size = field.STATICSIZE
+    if size is None:
+        size = field._CField__size
+    if size is None:
+        fileobj.write(field.bytes)
+        return
+    
+    buf = bytearray(size)
+    try:
+        end = field.writeinto(buf, 0)
+    except struct.error:
+        #Value doesn't fit in the field.
+        raise CorruptedData
+    
+    if end != len(buf):
+        #Some field's size disagrees with its contents, e.g. a Blob whose size
+        #parameter was changed without changing the Blob.
+        raise CorruptedData
+    fileobj.write(buf)
 
-    EntriesCount - Parse a specific number of entries from sizeParam
-    BytesCount - Parse a specific number of bytes from sizeParam
-    ParseToEOF - Parse until sizeParam bytes left in the file
+class _SkimScope(object):
+    """Stands in for a container while skimming.
+    
+    Each Struct being skimmed has one, mapping its field names to the values
+    skimmed so far, chained to the scope of its own container. Fields which
+    need a real container to be parsed, such as If with a callable condition,
+    are given one instead; it finds dynamic arguments the way containers do,
+    and reads of a field's value as an attribute work too.
+    
+    If keep is set, Arrays and Unions get scopes of their own, so that there
+    are as many containers to climb as a real parse would have, and Structs
+    and Arrays skimmed within the scope give back their values."""
+    _CField__cache = None
+    _CField__corecache = None
+    _CField__size = None
+    
+    def __init__(self, values, container, keep):
+        self.__values = values
+        self._CField__container = container
+        self._keep = keep
+    
+    def __getattr__(self, name):
+        try:
+            return self.__values[name]
+        except KeyError:
+            raise AttributeError(name)
+    
+    def _CField__fieldindex(self, name):
+        return name if name in self.__values else None
+    
+    def _CField__getslotvalue(self, name):
+        return self.__values[name]
+    
+    def _inner(self, values):
+        """Make the scope of a container being skimmed within this one."""
+        return _SkimScope(values, self, self._keep)
 
-    sizeParam can be an integer (for fixed-size arrays) or the name of another
-    previously-parsed integer parameter in the cmodel.Struct."""
-    class ArrayInstance(CField, list):
-        def __init__(self, *args, **kwargs):
-            super(ArrayInstance, self).__init__(*args, **kwargs)
-            self.__uniqid = 0
-            
-        def load(self, fileobj):
-            scount = sizeParam
-            if type(sizeParam) is not int:
-                scount = self.get_dynamic_argument(sizeParam)
-            
-            if countType is BytesCount:
-                endLoc = scount + fileobj.tell()
-                
-                while fileobj.tell() < endLoc:
-                    item = containedType()
-                    self.append(item)
-                    
-                    oldLoc = fileobj.tell()
-                    item.load(fileobj)
-                    
-                    if oldLoc == fileobj.tell():
-                        #Child types are REQUIRED to consume at least one byte
-                        #in byte-counted array mode.
-                        raise InvalidSchema
+def _skimargument(scope, name):
+    """Look up a dynamic argument while skimming.
+    
+    Like the runtime search, the nearest Struct in scope with a field of that
+    name wins. Scopes may end in a real container, when elements of an Array
+    are skimmed to find where they are; it is searched the same way."""
+    while scope is not None:
+        if type(scope) is _SkimScope:
+            values = scope._SkimScope__values
+            if name in values:
+                return values[name]
+        else:
+            index = scope._CField__fieldindex(name)
+            if index is not None:
+                return scope._CField__getslotvalue(index)
+        scope = scope._CField__container
+    
+    raise AttributeError(name)
+
+def _skimfield(fieldtype, view, offset, scope):
+    """Skim one field, reporting the offset of the innermost field which was bad.
+    
+    A dynamic argument missing from scope makes the field which wanted it bad."""
+    try:
+        return fieldtype._CField__skim(view, offset, scope)
+    except (CorruptedData, ValueError, AttributeError, IndexError, KeyError, TypeError) as e:
+        if isinstance(e, CorruptedData) and len(e.args) > 0:
+            raise
+        raise CorruptedData(offset)
+
+def _arraysize(array, sizeParam):
+    """Resolve an array's size parameter to the count or size it stands for."""
+    if type(sizeParam) is int:
+        return sizeParam
+    return array.get_dynamic_argument(sizeParam)
+
+def _arraytie(array, sizeParam, countType):
+    """Tie the field holding an array's size parameter to the array's length.
+    
+    Returns whether the array has such a field."""
+    if type(sizeParam) is str:
+        if countType is BytesCount:
+            array.find_argument_field(sizeParam).tie_to_length(array, "bytes")
+            return True
+        elif countType is EntriesCount:
+            array.find_argument_field(sizeParam).tie_to_length(array)
+            return True
+    return False
+
+def _arrayretie(twin, sizeParam, countType):
+    """Tie a copy of an array to the copy of its size parameter field."""
+    try:
+        _arraytie(twin, sizeParam, countType)
+    except AttributeError:
+        #The size parameter wasn't copied along with us.
+        pass
+
+def _arraystaticsize(sizeParam, countType, stride):
+    """Find the encoded size of arrays whose size never changes, or None."""
+    if type(sizeParam) is int:
+        if countType is EntriesCount and stride is not None:
+            return sizeParam * stride
+        elif countType is BytesCount:
+            return sizeParam
+    return None
+
+def _arrayskipsize(array, sizeParam, countType, stride):
+    """Find an array's encoded size from its size parameter; see CField.__skipsize."""
+    scount = _arraysize(array, sizeParam)
+    if countType is BytesCount:
+        return scount
+    if countType is EntriesCount and stride is not None:
+        return scount * stride
+    return None
+
+def _arraybytecount(countType, scount, remaining, stride):
+    """Determine how many bytes of remaining input belong to an array of fixed-size elements."""
+    if countType is EntriesCount:
+        size = scount * stride
+    elif countType is BytesCount:
+        size = scount
+    elif countType is ParseToEOF:
+        size = remaining - scount
+    
+    if size > remaining or size % stride != 0:
+        raise CorruptedData
+    return size
+
+def _skimcount(countType, scount, offset, length, stride):
+    """Find where an array ends while skimming, checking it against the data.
+    
+    Returns the end offset, or None if it depends on the elements."""
+    if countType is EntriesCount:
+        if stride is None:
+            return None
+        end = offset + scount * stride
+    elif countType is BytesCount:
+        end = offset + scount
+    elif countType is ParseToEOF:
+        end = length - scount
+    
+    if end > length or end < offset:
+        raise CorruptedData
+    return end
+
+def _readarray(fileobj, countType, scount, stride):
+    """Read the encoded elements of an array of fixed-size elements.
+    
+    Only arrays which run to the end of the file need to find out where it
+    ends; the rest know their size up front and just read it, so that they
+    can be loaded from files which can't seek. Loading one of those to the
+    end of a file which can't seek outside of a ReadBuffer loses whatever
+    data follows it."""
+    if countType is ParseToEOF:
+        buffered = fileobj
+        if not isinstance(fileobj, ReadBuffer):
+            buffered = ReadBuffer(fileobj)
+        
+        try:
+            size = buffered.remaining - scount
+            if size < 0 or size % stride != 0:
+                raise CorruptedData
+            return buffered.read(size)
+        finally:
+            if buffered is not fileobj:
+                buffered.release()
+    
+    if countType is EntriesCount:
+        size = scount * stride
+    elif countType is BytesCount:
+        size = scount
+        if size % stride != 0:
+            raise CorruptedData
+    
+    obytes = fileobj.read(size)
+    if len(obytes) != size:
+        raise CorruptedData
+    return obytes
+
+def _iter_load(fileobj, countType, scount, loadone):
+    """Yield array elements loaded from fileobj one at a time.
+    
+    loadone(fileobj) loads and returns a single element."""
+    buffered = fileobj
+    if not isinstance(fileobj, ReadBuffer):
+        buffered = ReadBuffer(fileobj)
+    
+    try:
+        if countType is EntriesCount:
+            for i in range(0, scount):
+                yield loadone(buffered)
+            return
+        
+        curpos = buffered.tell()
+        if countType is BytesCount:
+            endpos = curpos + scount
+        elif countType is ParseToEOF:
+            endpos = curpos + buffered.remaining - scount
+        
+        while curpos < endpos:
+            item = loadone(buffered)
+            lastpos, curpos = curpos, buffered.tell()
+            if lastpos == curpos:
+                raise InvalidSchema #we MUST consume SOME bytes in this mode
+            yield item
+        
+        if curpos > endpos:
+            raise CorruptedData #we overwrote some other data
+    finally:
+        if buffered is not fileobj:
+            buffered.release()
+
+def _iter_parse(view, offset, countType, scount, parseone):
+    """Yield array elements parsed out of a memoryview one at a time.
+    
+    parseone(view, offset) parses a single element and returns it along with
+    the offset just past it."""
+    if countType is EntriesCount:
+        for i in range(0, scount):
+            if offset >= len(view):
+                raise CorruptedData
+            item, offset = parseone(view, offset)
+            yield item
+        return
+    
+    if countType is BytesCount:
+        endpos = offset + scount
+        if endpos > len(view):
+            raise CorruptedData
+    elif countType is ParseToEOF:
+        endpos = len(view) - scount
+    
+    #Elements only get to see our bytes.
+    view = view[:endpos]
+    while offset < endpos:
+        item, newoffset = parseone(view, offset)
+        if newoffset == offset:
+            raise InvalidSchema
+        offset = newoffset
+        yield item
+
+def _recordoffset(stride, sizeParam, countType, index, start):
+    """Find the offset of an array element, for arrays of fixed-size elements."""
+    if stride is None:
+        raise PEBKAC #only fixed-size elements can be found without parsing
+    
+    if index < 0:
+        raise IndexError(index)
+    if type(sizeParam) is int and countType is EntriesCount and index >= sizeParam:
+        raise IndexError(index)
+    
+    return start + index * stride
+
+def _recordview(source, stride, sizeParam, countType, index, start):
+    """Get a view and offset to parse a single array element from.
+    
+    Reads just the one element if source is a file object."""
+    offset = _recordoffset(stride, sizeParam, countType, index, start)
+    if hasattr(source, "read"):
+        source.seek(offset, io.SEEK_SET)
+        view = memoryview(source.read(stride))
+        offset = 0
+    else:
+        view = memoryview(source)
+    
+    if offset + stride > len(view):
+        raise CorruptedData
+    return (view, offset)
+
+def Array(containedType, sizeParam, countType = EntriesCount, *args, lazy = False, columnar = False, **kwargs):
+    """Array class factory.
+
+    CModel arrays can have multiple count types:
+
+    EntriesCount - Parse a specific number of entries from sizeParam
+    BytesCount - Parse a specific number of bytes from sizeParam
+    ParseToEOF - Parse until sizeParam bytes left in the file
+
+    sizeParam can be an integer (for fixed-size arrays) or the name of another
+    previously-parsed integer parameter in the cmodel.Struct.
+    
+    If lazy is True, loading the array only records where each element starts
+    and keeps the raw bytes around. Elements are parsed the first time they are
+    accessed, in whatever context their container is in at that point. Elements
+    which are never touched are saved back out verbatim.
+    
+    Arrays of primitive ints with a TYPECODE are instead stored as a single
+    array.array and loaded, saved and converted in bulk. Such arrays are
+    already compact, so lazy has no effect on them.
+    
+    If columnar is True, the contained type must be a Struct made only of
+    fixed-size int fields. The array then stores one array.array column per
+    field instead of a list of Structs; see _ColumnarArray."""
+    if columnar:
+        return _ColumnarArray(containedType, sizeParam, countType)
+    
+    if containedType.TYPECODE is not None:
+        return _TypedArray(containedType, sizeParam, countType)
+    
+    stride = containedType.STATICSIZE
+    staticsize = _arraystaticsize(sizeParam, countType, stride)
+    
+    class ArrayInstance(CField, list):
+        DYNARGS = (sizeParam,) if type(sizeParam) is str else ()
+        TIEDARGS = DYNARGS if countType in (EntriesCount, BytesCount) else ()
+        SUBTYPES = (containedType,)
+        _CField__nested = [(consumer, argname, levels + 1) for consumer, argname, levels in _unbound(containedType)]
+        _CField__cacheable = len(_CField__nested) == 0
+        
+        #Set once the size parameter has been tied to our length.
+        __tied = False
+        
+        def __init__(self, *args, **kwargs):
+            super(ArrayInstance, self).__init__(*args, **kwargs)
+            self.__uniqid = 0
+            
+            #Lazy mode state: the raw bytes of the array, and the offset of
+            #each element within them plus the end offset.
+            self.__lazybuf = None
+            self.__lazyoffsets = None
+            self.__pending = 0
+        
+        def __adopt(self, item):
+            """Add a field to the array without updating the size parameter."""
+            itemname = str(self.__uniqid)
+            self.__uniqid += 1
+            super(ArrayInstance, self).append(item)
+            
+            item.reparent(itemname, container = self)
+        
+        def __adoptall(self, items):
+            """Add many fields to the array without updating the size parameter."""
+            uniqid = self.__uniqid
+            super(ArrayInstance, self).extend(items)
+            for item in items:
+                item.reparent(str(uniqid), container = self)
+                uniqid += 1
+            self.__uniqid = uniqid
+        
+        def __coerce(self, items):
+            """Wrap core values in new fields of our contained type."""
+            fields = []
+            for item in items:
+                if type(item) != containedType:
+                    #Arrays, unlike Python lists, can only contain one type
+                    #We'll try to coerce the input into a real type by wrapping it
+                    nitem = containedType()
+                    nitem.core = item
+                    item = nitem
+                fields.append(item)
+            return fields
+        
+        def __resize(self):
+            """Update the size parameter to match our contents."""
+            if type(sizeParam) is not str:
+                return
+            if countType is EntriesCount:
+                self.set_dynamic_argument(sizeParam, len(self))
+            elif countType is BytesCount:
+                self.set_dynamic_argument(sizeParam, self.bytelength)
+        
+        def __tie(self):
+            self.__tied = _arraytie(self, sizeParam, countType)
+        
+        def _CField__clone(self, container):
+            twin = super(ArrayInstance, self)._CField__clone(container)
+            if self.__lazyoffsets is not None:
+                twin.__lazyoffsets = list(self.__lazyoffsets)
+            
+            #Lazy elements not parsed yet stay that way in the copy.
+            items = [item if item is None else item._CField__clone(twin) for item in super(ArrayInstance, self).__iter__()]
+            super(ArrayInstance, twin).extend(items)
+            
+            if self.__tied:
+                _arrayretie(twin, sizeParam, countType)
+            return twin
+        
+        def __reset(self):
+            """Forget our contents before parsing new ones."""
+            super(ArrayInstance, self).__delitem__(slice(None))
+            self.__uniqid = 0
+            self.__lazybuf = None
+            self.__lazyoffsets = None
+            self.__pending = 0
+            self._CField__cache = None
+            self._CField__corecache = None
+            self._CField__size = None
+        
+        def __lazybounds(self, view, offset, endpos, count):
+            """Find the offset of each element in view without keeping them.
+            
+            Either endpos or count must be specified."""
+            if stride is not None:
+                if count is None:
+                    count = (endpos - offset) // stride
+                    if count * stride != endpos - offset:
+                        raise CorruptedData
+                
+                if offset + count * stride > len(view):
+                    raise CorruptedData
+                return list(range(offset, offset + (count + 1) * stride, stride))
+            
+            offsets = [offset]
+            if endpos is not None:
+                view = view[:endpos]
+            
+            scope = self.__skimscope()
+            while (count is None and offset < endpos) or (count is not None and len(offsets) <= count):
+                if offset >= len(view):
+                    raise CorruptedData
+                
+                oldoffset = offset
+                offset = _skimfield(containedType, view, offset, scope)[1]
+                if oldoffset == offset and count is None:
+                    raise InvalidSchema
+                
+                offsets.append(offset)
+            
+            return offsets
+        
+        def __skimscope(self):
+            """Stand in for us while skimming our elements to find where they are."""
+            keep = any(argname is _ANYFIELD for (_, argname, _) in _unbound(containedType))
+            return _SkimScope({}, self._CField__container, keep)
+        
+        def __lazyinstall(self, view, offsets):
+            """Switch the array into lazy mode with unparsed elements at offsets."""
+            if not view.readonly:
+                #Don't let later writes to a mutable buffer change our data.
+                view = memoryview(bytes(view[offsets[0]:offsets[-1]]))
+                offsets = [offset - offsets[0] for offset in offsets]
+            
+            count = len(offsets) - 1
+            self.__lazybuf = view
+            self.__lazyoffsets = offsets
+            self.__pending = count
+            self.__uniqid = count
+            super(ArrayInstance, self).extend([None] * count)
+        
+        def __item(self, index):
+            """Get the field at index, parsing it first if need be."""
+            item = super(ArrayInstance, self).__getitem__(index)
+            if item is None:
+                index = range(len(self))[index]
                 
-                if type(sizeParam) is str:
-                    self.find_argument_field(sizeParam).tie_to_length(self, "bytes")
+                item = containedType()
+                item.reparent(str(index), container = self)
+                item.parseview(self.__lazybuf, self.__lazyoffsets[index])
+                super(ArrayInstance, self).__setitem__(index, item)
+                
+                self.__pending -= 1
+                if self.__pending == 0:
+                    self.__lazybuf = None
+                    self.__lazyoffsets = None
+            
+            return item
+        
+        def __materialize(self):
+            """Parse every outstanding lazy element."""
+            if self.__pending > 0:
+                for i in range(len(self)):
+                    self.__item(i)
+        
+        def load(self, fileobj, projection = None):
+            if (countType is ParseToEOF or lazy) and not isinstance(fileobj, ReadBuffer):
+                #Only a ReadBuffer can find the end of a file which can't seek,
+                #or look ahead in it
+                buffered = ReadBuffer(fileobj)
+                try:
+                    self.load(buffered, projection)
+                finally:
+                    buffered.release()
+                self._CField__reloaded(fileobj)
+                return
+            
+            #Before we're emptied, in case our size parameter is tied to us
+            scount = _arraysize(self, sizeParam)
+            self.__reset()
+            
+            #Projections apply to each of our elements
+            projection = _projection(projection)
+            loaditem = lambda item: item.load(fileobj)
+            if projection is not None and not containedType.PRIMITIVE:
+                loaditem = lambda item: item.load(fileobj, projection)
+            
+            if lazy:
+                self.__lazyload(fileobj, scount)
+            elif countType is BytesCount:
+                endLoc = scount + fileobj.tell()
+                
+                while fileobj.tell() < endLoc:
+                    item = containedType()
+                    self.__adopt(item)
+                    
+                    oldLoc = fileobj.tell()
+                    loaditem(item)
+                    
+                    if oldLoc == fileobj.tell():
+                        #Child types are REQUIRED to consume at least one byte
+                        #in byte-counted array mode.
+                        raise InvalidSchema
             elif countType is EntriesCount:
                 for i in range(0, scount):
                     item = containedType()
-                    self.append(item)
+                    self.__adopt(item)
                     
-                    item.load(fileobj)
-                if type(sizeParam) is str:
-                    self.find_argument_field(sizeParam).tie_to_length(self)
+                    loaditem(item)
             elif countType is ParseToEOF:
                 #determine end position
                 curpos = fileobj.tell()
-                fileobj.seek(scount, whence=SEEK_END)
-                endpos = fileobj.tell()
-                fileobj.seek(curpos, whence=SEEK_SET)   
-                lastpos = fileobj.tell()
+                endpos = curpos + fileobj.remaining - scount
 
                 while curpos < endpos:
                     lastpos = curpos
                     item = containedType()
-                    self.append(item)
+                    self.__adopt(item)
                     
-                    item.load(fileobj)
+                    loaditem(item)
                     curpos = fileobj.tell()
                     if lastpos == curpos:
                         raise InvalidSchema #we MUST consume SOME bytes in this mode
                 
                 if curpos > endpos:
                     raise CorruptedData #we overwrote some other data
+            
+            self.__tie()
+            self._CField__reloaded(fileobj)
+        
+        def iter_load(self, fileobj, size = None, projection = None):
+            """Load elements from fileobj one at a time, yielding each field as it is loaded.
+            
+            The elements are not added to the array, so arbitrarily long
+            streams can be processed in constant memory. They are still
+            parsed in the array's context so that their dynamic arguments
+            resolve. size overrides the array's size parameter, for when there
+            is no Struct to look it up in.
+            
+            fileobj is read through a ReadBuffer until the generator finishes;
+            don't use it for anything else in the meantime. projection is
+            applied to each element, as with load."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            projection = _projection(projection)
+            
+            def loadone(fileobj):
+                item = containedType(name = "stream", container = self)
+                if projection is not None and not containedType.PRIMITIVE:
+                    item.load(fileobj, projection)
+                else:
+                    item.load(fileobj)
+                return item
+            
+            return _iter_load(fileobj, countType, size, loadone)
+        
+        def iterparse(self, obytes, size = None, offset = 0):
+            """Parse elements out of a byte string or buffer one at a time, yielding each field.
+            
+            The iter_load equivalent of parsebytes."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            def parseone(view, offset):
+                item = containedType(name = "stream", container = self)
+                return (item, item.parseview(view, offset))
+            
+            return _iter_parse(memoryview(obytes), offset, countType, size, parseone)
+        
+        def _CField__skipsize(self):
+            return _arrayskipsize(self, sizeParam, countType, stride)
+        
+        def __lazyload(self, fileobj, scount):
+            if countType is EntriesCount and stride is None:
+                #We have to skim the elements to know where the array ends.
+                #Guess at its size, and look further ahead whenever an element
+                #runs past what we have. Like loading to the end of the file,
+                #this loses what follows us in a file which can't seek, unless
+                #our container is loading us through its ReadBuffer.
+                scope = self.__skimscope()
+                offsets = [0]
+                want = max(scount, 4) * 16
+                view = memoryview(fileobj.peek(want))
+                for i in range(0, scount):
+                    while True:
+                        try:
+                            offset = _skimfield(containedType, view, offsets[-1], scope)[1]
+                            break
+                        except CorruptedData:
+                            if len(view) < want:
+                                #The file ended first
+                                raise
+                            want *= 2
+                            view = memoryview(fileobj.peek(want))
+                    offsets.append(offset)
+                
+                view = memoryview(fileobj.read(offsets[-1]))
+            else:
+                count = None
+                if countType is EntriesCount:
+                    count = scount
+                    size = scount * stride
+                elif countType is BytesCount:
+                    size = scount
+                elif countType is ParseToEOF:
+                    size = fileobj.remaining - scount
+                
+                view = memoryview(fileobj.read(size))
+                if len(view) != size:
+                    raise CorruptedData
+                offsets = self.__lazybounds(view, 0, None if count is not None else size, count)
+            
+            self.__lazyinstall(view, offsets)
 
         def save(self, fileobj):
-            for thing in self:
-                thing.save(fileobj)
+            if self._CField__cache is not None:
+                fileobj.write(self._CField__cache)
+                return
+            
+            _writeout(self, fileobj)
+        
+        def writeinto(self, buf, offset):
+            if self._CField__cache is not None:
+                end = offset + len(self._CField__cache)
+                buf[offset:end] = self._CField__cache
+                return end
+            
+            rawstart = None
+            for i in range(len(self)):
+                thing = super(ArrayInstance, self).__getitem__(i)
+                if thing is None:
+                    #Unparsed lazy elements are copied out verbatim
+                    if rawstart is None:
+                        rawstart = self.__lazyoffsets[i]
+                    continue
+                
+                if rawstart is not None:
+                    offset = self.__writeraw(buf, offset, rawstart, self.__lazyoffsets[i])
+                    rawstart = None
+                offset = thing.writeinto(buf, offset)
+            
+            if rawstart is not None:
+                offset = self.__writeraw(buf, offset, rawstart, self.__lazyoffsets[len(self)])
+            return offset
+        
+        def __writeraw(self, buf, offset, start, end):
+            buf[offset:offset + end - start] = self.__lazybuf[start:end]
+            return offset + end - start
+        
+        def __iter__(self):
+            for i in range(len(self)):
+                yield self.__item(i)
+        
+        def index(self, value, *args):
+            self.__materialize()
+            return super(ArrayInstance, self).index(value, *args)
+        
+        def __contains__(self, value):
+            self.__materialize()
+            return super(ArrayInstance, self).__contains__(value)
+        
+        #The following three items exist specifically to ensure field objects
+        #don't escape their parent structures, just the data.
+        def __getitem__(self, key):
+            #Uncoerce field into core data. Does not support slicing yet.
+            return self.__item(key).core
+
+        def __setitem__(self, key, value):
+            self.__item(key).core = value
+        
+        def __delitem__(self, key):
+            self.__materialize()
+            removed = super(ArrayInstance, self).__getitem__(key)
+            if not isinstance(key, slice):
+                removed = [removed]
+            delta = -sum(item.bytelength for item in removed)
+            
+            super(ArrayInstance, self).__delitem__(key)
+            self.changed(delta)
+            self.__resize()
+        
+        def append(self, item):
+            self.extend((item,))
+        
+        def extend(self, otherlist):
+            items = self.__coerce(otherlist)
+            self.__adoptall(items)
+            self.changed(sum(item.bytelength for item in items))
+            self.__resize()
+        
+        def __add__(self, item):
+            self.extend(item)
+            return self
+        
+        def __radd__(self, item):
+            self.extend(item)
+            return self
+        
+        def __iadd__(self, item):
+            self.extend(item)
+            return self
+        
+        def __imul__(self, count):
+            self.__materialize()
+            items = list(super(ArrayInstance, self).__iter__())
+            if count <= 0:
+                del self[:]
+            else:
+                self.extend([item.clone() for i in range(count - 1) for item in items])
+            return self
+        
+        def insert(self, index, item):
+            self.__materialize()
+            (item,) = self.__coerce((item,))
+            super(ArrayInstance, self).insert(index, item)
+            item.reparent(str(self.__uniqid), container = self)
+            self.__uniqid += 1
+            self.changed(item.bytelength)
+            self.__resize()
+        
+        def pop(self, index = -1):
+            self.__materialize()
+            item = super(ArrayInstance, self).__getitem__(index)
+            del self[index]
+            return item.core
+        
+        def remove(self, value):
+            for index, item in enumerate(self):
+                if item is value or item.core == value:
+                    del self[index]
+                    return
+            raise ValueError(value)
+        
+        def clear(self):
+            del self[:]
+        
+        def reverse(self):
+            self.__materialize()
+            super(ArrayInstance, self).reverse()
+            self.changed(0)
+        
+        def sort(self, key = None, reverse = False):
+            """Sort the array by its elements' core values, or by key of them."""
+            self.__materialize()
+            if key is None:
+                fieldkey = lambda item: item.core
+            else:
+                fieldkey = lambda item: key(item.core)
+            super(ArrayInstance, self).sort(key = fieldkey, reverse = reverse)
+            self.changed(0)
+        
+        @property
+        def bytes(self):
+            if self._CField__cache is not None:
+                return self._CField__cache
+            
+            childbytes = []
+            rawstart = None
+            for i in range(len(self)):
+                thing = super(ArrayInstance, self).__getitem__(i)
+                if thing is None:
+                    #Unparsed lazy elements are copied out verbatim
+                    if rawstart is None:
+                        rawstart = self.__lazyoffsets[i]
+                    continue
+                
+                if rawstart is not None:
+                    childbytes.append(self.__lazybuf[rawstart:self.__lazyoffsets[i]])
+                    rawstart = None
+                childbytes.append(thing.bytes)
+            
+            if rawstart is not None:
+                childbytes.append(self.__lazybuf[rawstart:self.__lazyoffsets[len(self)]])
+            
+            obytes = b"".join(childbytes)
+            if self._CField__cacheable:
+                self._CField__cache = obytes
+            return obytes
+        
+        def parseview(self, view, offset):
+            self.__reset()
+            scount = _arraysize(self, sizeParam)
+            
+            if lazy:
+                if countType is EntriesCount:
+                    offsets = self.__lazybounds(view, offset, None, scount)
+                elif countType is BytesCount:
+                    if offset + scount > len(view):
+                        raise CorruptedData
+                    offsets = self.__lazybounds(view, offset, offset + scount, None)
+                elif countType is ParseToEOF:
+                    offsets = self.__lazybounds(view, offset, len(view) - scount, None)
+                
+                self.__lazyinstall(view, offsets)
+                self.__tie()
+                return offsets[-1]
+            
+            if countType is EntriesCount:
+                items = scount
+                for i in range(0,items):
+                    if offset >= len(view):
+                        #We ran out of data before parsing was complete.
+                        raise CorruptedData
+                
+                    childItem = containedType()
+                    self.__adopt(childItem)
+                    offset = childItem.parseview(view, offset)
+                
+                self.__tie()
+                return offset
+            elif countType is BytesCount:
+                endpos = offset + scount
+                if endpos > len(view):
+                    raise CorruptedData
+                
+                #Children only get to see our bytes.
+                myview = view[:endpos]
+                while offset < endpos:
+                    #Just keep parsing until we run out of bytes.
+                    childItem = containedType()
+                    self.__adopt(childItem)
+                    
+                    oldoffset = offset
+                    offset = childItem.parseview(myview, offset)
+                    
+                    if oldoffset == offset:
+                        #All Array subtypes must consume at least ONE byte.
+                        #If the contained type is empty, then parsing it again
+                        #won't do anything and we will infinitely-loop until
+                        #we run out of memory.
+                        raise InvalidSchema
+                
+                self.__tie()
+                return endpos
+            elif countType is ParseToEOF:
+                endpos = len(view) - scount
+                myview = view[:endpos]
+
+                while offset < endpos:
+                    childItem = containedType()
+                    self.__adopt(childItem)
+                    
+                    oldoffset = offset
+                    offset = childItem.parseview(myview, offset)
+                    
+                    if oldoffset == offset:
+                        raise InvalidSchema
+                return offset
+        
+        @property
+        def core(self):
+            """Core property for ArrayInstance.
+
+            Implemented by repacking the whole ArrayInstance into a normal list.
+            The items are kept until the array changes, but every read returns
+            a new list of them, which the caller is free to modify."""
+            items = self._CField__corecache
+            if items is None:
+                items = tuple(item.core for item in self)
+                if self._CField__cacheable:
+                    self._CField__corecache = items
+            
+            return list(items)
+
+        @core.setter
+        def core(self, normallist):
+            #Build the whole new contents before touching the old ones, and
+            #don't bother parsing lazy elements just to throw them away.
+            items = self.__coerce(normallist)
+            self.__reset()
+            self.__adoptall(items)
+            self.changed()
+            self.__resize()
+        
+        @property
+        def bytelength(self):
+            if staticsize is not None:
+                return staticsize
+            if stride is not None:
+                return len(self) * stride
+            if self._CField__cache is not None:
+                return len(self._CField__cache)
+            
+            if self._CField__size is None:
+                size = 0
+                for i in range(len(self)):
+                    thing = super(ArrayInstance, self).__getitem__(i)
+                    if thing is None:
+                        size += self.__lazyoffsets[i + 1] - self.__lazyoffsets[i]
+                    else:
+                        size += thing.bytelength
+                if not self._CField__cacheable:
+                    return size
+                self._CField__size = size
+            
+            return self._CField__size
+        
+        def seek_to(self, fileobj, index, start = 0):
+            """Position fileobj at element index of an array which starts at offset start.
+            
+            Only arrays of fixed-size elements can be seeked in."""
+            fileobj.seek(_recordoffset(stride, sizeParam, countType, index, start), io.SEEK_SET)
+        
+        def record_at(self, source, index, start = 0):
+            """Read element index of an array which starts at offset start in source.
+            
+            source is either a file object or a buffer. Only that one element
+            is read and parsed, and it is returned without being added to the
+            array."""
+            item = containedType(name = str(index), container = self)
+            item.parseview(*_recordview(source, stride, sizeParam, countType, index, start))
+            return item
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            scount = sizeParam if type(sizeParam) is int else _skimargument(scope, sizeParam)
+            
+            end = _skimcount(countType, scount, offset, len(view), stride)
+            items = None
+            if scope._keep:
+                scope = scope._inner({})
+                items = []
+            
+            if countType is EntriesCount:
+                for i in range(0, scount):
+                    (item, offset) = _skimfield(containedType, view, offset, scope)
+                    if items is not None:
+                        items.append(item)
+                return (items, offset)
+            
+            myview = view[:end]
+            while offset < end:
+                oldoffset = offset
+                (item, offset) = _skimfield(containedType, myview, offset, scope)
+                if offset == oldoffset:
+                    #Elements must consume at least one byte here; a real
+                    #parse would raise InvalidSchema.
+                    raise CorruptedData(offset)
+                if items is not None:
+                    items.append(item)
+            return (items, offset)
+        
+        #Since this CField is a subtype of list, it doubles as a native Python
+        #object and thus should be exposed to the user
+        PRIMITIVE = False
+        STATICSIZE = staticsize
+    
+    return ArrayInstance
+
+def _TypedArray(containedType, sizeParam, countType):
+    """Array class factory for arrays of primitive ints.
+    
+    The array doubles as a native array.array of the contained type's values;
+    indexing it gives ints, not fields. Use Array instead of calling this."""
+    typecode = containedType.TYPECODE
+    itemsize = array.array(typecode).itemsize
+    swap = itemsize > 1 and containedType.BYTEORDER != sys.byteorder
+    
+    class ArrayInstance(CField, array.array):
+        DYNARGS = (sizeParam,) if type(sizeParam) is str else ()
+        TIEDARGS = DYNARGS if countType in (EntriesCount, BytesCount) else ()
+        SUBTYPES = (containedType,)
+        STATICSIZE = _arraystaticsize(sizeParam, countType, itemsize)
+        
+        #Set once the size parameter has been tied to our length.
+        __tied = False
+        
+        def __new__(cls, *args, **kwargs):
+            return array.array.__new__(cls, typecode)
+        
+        def _CField__clone(self, container):
+            twin = super(ArrayInstance, self)._CField__clone(container)
+            array.array.frombytes(twin, self.tobytes())
+            if self.__tied:
+                _arrayretie(twin, sizeParam, countType)
+            return twin
+        
+        def __tie(self):
+            self.__tied = _arraytie(self, sizeParam, countType)
+        
+        def _CField__skipsize(self):
+            return _arrayskipsize(self, sizeParam, countType, itemsize)
+        
+        def iter_load(self, fileobj, size = None):
+            """Load values from fileobj one at a time; see Array.iter_load."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            return _iter_load(fileobj, countType, size, containedType.loadvalue)
+        
+        def iterparse(self, obytes, size = None, offset = 0):
+            """Parse values out of a byte string or buffer one at a time; see Array.iter_load."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            return _iter_parse(memoryview(obytes), offset, countType, size, containedType.parsevalue)
+        
+        def __frombytes(self, obytes):
+            if len(obytes) % itemsize != 0:
+                raise CorruptedData
+            
+            items = array.array(typecode)
+            items.frombytes(obytes)
+            if swap:
+                items.byteswap()
+            array.array.__delitem__(self, slice(None))
+            array.array.extend(self, items)
+        
+        def load(self, fileobj, projection = None):
+            #Our elements have no fields, so there's nothing to project
+            scount = _arraysize(self, sizeParam)
+            
+            self.__frombytes(_readarray(fileobj, countType, scount, itemsize))
+            self.__tie()
+            self._CField__reloaded(fileobj)
+        
+        def parseview(self, view, offset):
+            scount = _arraysize(self, sizeParam)
+            
+            end = offset + _arraybytecount(countType, scount, len(view) - offset, itemsize)
+            self.__frombytes(view[offset:end])
+            self.__tie()
+            return end
+        
+        @property
+        def bytes(self):
+            if swap:
+                items = array.array(typecode, self)
+                items.byteswap()
+                return items.tobytes()
+            
+            return self.tobytes()
+        
+        def save(self, fileobj):
+            fileobj.write(self.bytes)
+        
+        @property
+        def core(self):
+            return self.tolist()
+        
+        @core.setter
+        def core(self, normallist):
+            oldlength = len(self)
+            array.array.__delitem__(self, slice(None))
+            array.array.extend(self, normallist)
+            self.__resized(oldlength)
+        
+        @property
+        def bytelength(self):
+            return len(self) * itemsize
+        
+        def seek_to(self, fileobj, index, start = 0):
+            """Position fileobj at element index; see Array.seek_to."""
+            fileobj.seek(_recordoffset(itemsize, sizeParam, countType, index, start), io.SEEK_SET)
+        
+        def record_at(self, source, index, start = 0):
+            """Read the value of element index; see Array.record_at."""
+            return containedType.parsevalue(*_recordview(source, itemsize, sizeParam, countType, index, start))[0]
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            scount = sizeParam if type(sizeParam) is int else _skimargument(scope, sizeParam)
+            
+            end = _skimcount(countType, scount, offset, len(view), itemsize)
+            if (end - offset) % itemsize != 0:
+                raise CorruptedData
+            if scope._keep:
+                return ([containedType.parsevalue(view, itemoffset)[0] for itemoffset in range(offset, end, itemsize)], end)
+            return (None, end)
+        
+        #Mutations keep the size parameter in sync with the array.
+        def __resized(self, oldlength):
+            self.__tie()
+            self.changed((len(self) - oldlength) * itemsize)
+        
+        def __setitem__(self, key, value):
+            oldlength = len(self)
+            try:
+                array.array.__setitem__(self, key, value)
+            except OverflowError:
+                #Value doesn't fit in the field.
+                raise CorruptedData
+            self.__resized(oldlength)
+        
+        def __delitem__(self, key):
+            oldlength = len(self)
+            array.array.__delitem__(self, key)
+            self.__resized(oldlength)
+        
+        def append(self, item):
+            oldlength = len(self)
+            try:
+                array.array.append(self, item)
+            except OverflowError:
+                raise CorruptedData
+            self.__resized(oldlength)
+        
+        def extend(self, items):
+            oldlength = len(self)
+            try:
+                array.array.extend(self, items)
+            except OverflowError:
+                #Value doesn't fit in the field; undo the partial extension.
+                array.array.__delitem__(self, slice(oldlength, None))
+                raise CorruptedData
+            self.__resized(oldlength)
+        
+        def insert(self, index, item):
+            oldlength = len(self)
+            try:
+                array.array.insert(self, index, item)
+            except OverflowError:
+                raise CorruptedData
+            self.__resized(oldlength)
+        
+        def pop(self, *args):
+            oldlength = len(self)
+            item = array.array.pop(self, *args)
+            self.__resized(oldlength)
+            return item
+        
+        def remove(self, item):
+            oldlength = len(self)
+            array.array.remove(self, item)
+            self.__resized(oldlength)
+        
+        def frombytes(self, obytes):
+            oldlength = len(self)
+            array.array.frombytes(self, obytes)
+            self.__resized(oldlength)
+        
+        def fromlist(self, items):
+            oldlength = len(self)
+            try:
+                array.array.fromlist(self, items)
+            except OverflowError:
+                raise CorruptedData
+            self.__resized(oldlength)
+        
+        def fromfile(self, fileobj, count):
+            oldlength = len(self)
+            try:
+                array.array.fromfile(self, fileobj, count)
+            finally:
+                #Short reads keep whatever was read before raising EOFError
+                self.__resized(oldlength)
+        
+        def reverse(self):
+            array.array.reverse(self)
+            self.changed(0)
+        
+        def byteswap(self):
+            array.array.byteswap(self)
+            self.changed(0)
+        
+        def __iadd__(self, items):
+            self.extend(items)
+            return self
+        
+        def __imul__(self, count):
+            oldlength = len(self)
+            array.array.__imul__(self, count)
+            self.__resized(oldlength)
+            return self
+        
+        #Since this CField is a subtype of array, it doubles as a native Python
+        #object and thus should be exposed to the user
+        PRIMITIVE = False
+    
+    return ArrayInstance
+
+def _ColumnarArray(containedType, sizeParam, countType):
+    """Array class factory for arrays of flat int Structs stored column-wise.
+    
+    Each field of the contained Struct gets its own array.array column, which
+    column() returns, so tables can be filtered, sorted and aggregated with
+    builtins (sum, max, sorted...) or handed to numpy.frombuffer without
+    creating a Struct per row. Indexing or iterating the array gives row
+    objects whose attributes read and write the columns. Use Array(...,
+    columnar = True) instead of calling this."""
+    plan = getattr(containedType, "_Struct__plan", None)
+    if plan is None or len(plan) != 1 or not isinstance(plan[0], _StructRun):
+        #Only Structs which are one struct-module run can be split into columns
+        raise InvalidSchema
+    
+    codec = plan[0].codec
+    order = containedType._Struct__order
+    types = containedType._Struct__types
+    coretype = containedType._Struct__coretype
+    #Declarative fields such as BitStruct encode as a number but aren't one
+    typecodes = [_arraycode(fieldtype.STRUCTFMT) if fieldtype.PRIMITIVE else None for fieldtype in types]
+    if None in typecodes:
+        raise InvalidSchema
+    
+    stride = codec.size
+    columnindex = {fieldname: index for index, fieldname in enumerate(order)}
+    #Fields such as Enum, which don't accept everything they can decode
+    checked = [(index, fieldtype.checkvalue) for index, fieldtype in enumerate(types) if not fieldtype.STRUCTEXACT]
+    
+    class ArrayRow(object):
+        """One row of a columnar array.
+        
+        Rows are views of the array at a fixed index; they don't follow the
+        row around if earlier rows are deleted or the array is sorted."""
+        __slots__ = ("_ArrayRow__array", "_ArrayRow__index")
+        
+        def __init__(self, array, index):
+            self.__array = array
+            self.__index = index
+        
+        @property
+        def core(self):
+            return coretype(*self.__array._ArrayInstance__row(self.__index))
+        
+        @core.setter
+        def core(self, items):
+            self.__array[self.__index] = items
+        
+        @property
+        def bytes(self):
+            return codec.pack(*self.__array._ArrayInstance__row(self.__index))
+    
+    def rowproperty(index):
+        def getter(self):
+            return self._ArrayRow__array._ArrayInstance__columns[index][self._ArrayRow__index]
+        
+        def setter(self, val):
+            self._ArrayRow__array._ArrayInstance__setcell(self._ArrayRow__index, index, val)
+        
+        return property(getter, setter)
+    
+    for index, fieldname in enumerate(order):
+        setattr(ArrayRow, fieldname, rowproperty(index))
+    
+    class ArrayInstance(CField):
+        DYNARGS = (sizeParam,) if type(sizeParam) is str else ()
+        TIEDARGS = DYNARGS if countType in (EntriesCount, BytesCount) else ()
+        SUBTYPES = (containedType,)
+        STATICSIZE = _arraystaticsize(sizeParam, countType, stride)
+        
+        #Set once the size parameter has been tied to our length.
+        __tied = False
+        
+        def __init__(self, *args, **kwargs):
+            self.__columns = [array.array(typecode) for typecode in typecodes]
+            super(ArrayInstance, self).__init__(*args, **kwargs)
+        
+        def _CField__clone(self, container):
+            twin = super(ArrayInstance, self)._CField__clone(container)
+            twin.__columns = [array.array(column.typecode, column) for column in self.__columns]
+            if self.__tied:
+                _arrayretie(twin, sizeParam, countType)
+            return twin
+        
+        def __tie(self):
+            self.__tied = _arraytie(self, sizeParam, countType)
+        
+        def __row(self, index):
+            return [column[index] for column in self.__columns]
+        
+        def __setcell(self, index, column, val):
+            try:
+                self.__columns[column][index] = types[column].checkvalue(val)
+            except OverflowError:
+                #Value doesn't fit in the field.
+                raise CorruptedData
+            self.changed(0)
+        
+        def __checkrow(self, items):
+            values = [fieldtype.checkvalue(val) for fieldtype, val in zip(types, items)]
+            if len(values) != len(order):
+                raise CorruptedData
+            return values
+        
+        def __fromrows(self, rows):
+            """Replace our contents with the given rows of field values."""
+            columns = [array.array(typecode) for typecode in typecodes]
+            try:
+                for row in rows:
+                    for index, checkvalue in checked:
+                        checkvalue(row[index])
+                    for column, val in zip(columns, row):
+                        column.append(val)
+            except OverflowError:
+                raise CorruptedData
+            self.__columns = columns
+        
+        def column(self, fieldname):
+            """Return the array.array holding every row's value of one field.
+            
+            The column is live: assigning to its items changes the rows (call
+            changed() afterwards if this array has been encoded). Don't resize
+            it; use the array's own methods to add or remove rows."""
+            return self.__columns[columnindex[fieldname]]
+        
+        def __len__(self):
+            return len(self.__columns[0])
+        
+        def __iter__(self):
+            for i in range(len(self)):
+                yield ArrayRow(self, i)
         
-        #The following three items exist specifically to ensure field objects
-        #don't escape their parent structures, just the data.
         def __getitem__(self, key):
-            #Uncoerce field into core data. Does not support slicing yet.
-            return super(ArrayInstance, self).__getitem__(key).core
-
+            if isinstance(key, slice):
+                return [ArrayRow(self, i) for i in range(*key.indices(len(self)))]
+            
+            if key < 0:
+                key += len(self)
+            if key < 0 or key >= len(self):
+                raise IndexError
+            return ArrayRow(self, key)
+        
         def __setitem__(self, key, value):
-            super(ArrayInstance, self).__getitem__(key).core = value
+            values = self.__checkrow(value)
+            row = self.__row(key)
+            try:
+                for column, val in zip(self.__columns, values):
+                    column[key] = val
+            except OverflowError:
+                for column, val in zip(self.__columns, row):
+                    column[key] = val
+                raise CorruptedData
+            self.changed(0)
         
         def __delitem__(self, key):
-            super(ArrayInstance, self).__delitem__(key)
-            self.alter_dynamic_argument(sizeParam, lambda x: len(self))
+            oldlength = len(self)
+            for column in self.__columns:
+                del column[key]
+            self.__tie()
+            self.changed((len(self) - oldlength) * stride)
         
         def append(self, item):
-            if type(item) != containedType:
-                #Arrays, unlike Python lists, can only contain one type
-                #We'll try to coerce the input into a real type by wrapping it
-                nitem = containedType()
-                nitem.core = item
-                item = nitem
+            """Add a row, given as a sequence of field values in order."""
+            self.extend([item])
+        
+        def extend(self, items):
+            rows = [self.__checkrow(item) for item in items]
+            length = len(self)
+            try:
+                for row in rows:
+                    for column, val in zip(self.__columns, row):
+                        column.append(val)
+            except OverflowError:
+                #Value doesn't fit in the field; undo the partial rows.
+                for column in self.__columns:
+                    del column[length:]
+                raise CorruptedData
             
-            itemname = str(self.__uniqid)
-            self.__uniqid += 1
-            super(ArrayInstance, self).append(item)
+            self.__tie()
+            self.changed((len(self) - length) * stride)
+        
+        def sort(self, *fieldnames, reverse = False):
+            """Reorder the rows by the values of the named fields."""
+            keys = [self.column(fieldname) for fieldname in fieldnames]
+            if len(keys) == 1:
+                permutation = sorted(range(len(self)), key = keys[0].__getitem__, reverse = reverse)
+            else:
+                permutation = sorted(range(len(self)), key = lambda i: [key[i] for key in keys], reverse = reverse)
             
-            item.reparent(itemname, container = self)
-            self.alter_dynamic_argument(sizeParam, lambda x: len(self))
+            self.__columns = [array.array(column.typecode, map(column.__getitem__, permutation)) for column in self.__columns]
+            self.changed(0)
         
-        def extend(self, otherlist):
-            for item in otherList:
-                self.append(self, item)
+        def _CField__skipsize(self):
+            return _arrayskipsize(self, sizeParam, countType, stride)
         
-        def __add__(self, item):
-            self.extend(item)
-            return self
+        def load(self, fileobj, projection = None):
+            #Our rows are always loaded whole
+            scount = _arraysize(self, sizeParam)
+            
+            self.__fromrows(codec.iter_unpack(_readarray(fileobj, countType, scount, stride)))
+            self.__tie()
+            self._CField__reloaded(fileobj)
         
-        def __radd__(self, item):
-            self.extend(item)
-            return self
+        def parseview(self, view, offset):
+            scount = _arraysize(self, sizeParam)
+            
+            end = offset + _arraybytecount(countType, scount, len(view) - offset, stride)
+            self.__fromrows(codec.iter_unpack(view[offset:end]))
+            self.__tie()
+            return end
         
-        def __iadd__(self, item):
-            self.extend(item)
-            return self
+        def iter_load(self, fileobj, size = None):
+            """Load rows from fileobj one at a time, yielding each as a tuple of field values."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            return _iter_load(fileobj, countType, size, lambda fileobj: coretype(*codec.unpack(fileobj.read(stride))))
+        
+        def iterparse(self, obytes, size = None, offset = 0):
+            """Parse rows out of a byte string or buffer one at a time; see iter_load."""
+            if size is None:
+                size = _arraysize(self, sizeParam)
+            
+            def parseone(view, offset):
+                return (coretype(*codec.unpack_from(view, offset)), offset + stride)
+            
+            return _iter_parse(memoryview(obytes), offset, countType, size, parseone)
         
         @property
         def bytes(self):
-            childbytes = []
-            for thing in self:
-                childbytes.append(thing.bytes)
-            return b"".join(childbytes)
+            try:
+                return b"".join(codec.pack(*row) for row in zip(*self.__columns))
+            except struct.error:
+                raise CorruptedData
         
-        def parsebytes(self, obytes):
-            scount = sizeParam
-            if type(sizeParam) is not int:
-                scount = self.get_dynamic_argument(sizeParam)
-            
-            if countType is EntriesCount:
-                items = scount
-                for i in range(0,items):
-                    if (len(obytes) == 0):
-                        #We ran out of data before parsing was complete.
-                        raise CorruptedData
-                
-                    childItem = containedType()
-                    self.append(childItem)
-                    obytes = childItem.parsebytes(obytes)
-                
-                if type(sizeParam) is str:
-                    self.find_argument_field(sizeParam).tie_to_length(self)
-                return obytes
-            elif countType is BytesCount:
-                bytecount = scount
-                mybytes = obytes[:bytecount]
-                while len(mybytes) > 0:
-                    #Just keep parsing until we run out of bytes.
-                    childItem = containedType()
-                    self.append(childItem)
-                    
-                    oldcount = len(mybytes)
-                    mybytes = childItem.parsebytes(mybytes)
-                    
-                    if oldcount == len(mybytes):
-                        #All Array subtypes must consume at least ONE byte.
-                        #If the contained type is empty, then parsing it again
-                        #won't do anything and we will infinitely-loop until
-                        #we run out of memory.
-                        raise InvalidSchema
-                
-                if type(sizeParam) is str:
-                    self.find_argument_field(sizeParam).tie_to_length(self, "bytes")
-                return obytes[bytecount:]
-            elif countType is ParseToEOF:
-                mybytes = b""
-                if scount is 0:
-                    mybytes = obytes
-                else:
-                    mybytes = obytes[:-(scount)]
-
-                while len(mybytes) > 0:
-                    childItem = containedType()
-                    self.append(childItem)
-                    
-                    oldcount = len(mybytes)
-                    mybytes = childItem.parsebytes(mybytes)
-                    
-                    if oldcount == len(mybytes):
-                        raise InvalidSchema
-                return obytes[-(scount):]
+        def save(self, fileobj):
+            fileobj.write(self.bytes)
         
         @property
         def core(self):
-            """Core property for ArrayInstance.
-
-            Implemented by repacking the whole ArrayInstance into a normal list."""
-            normallist = []
-            for item in self:
-                normallist.append(item.core)
-            
-            return normallist
-
+            return [coretype(*row) for row in zip(*self.__columns)]
+        
         @core.setter
         def core(self, normallist):
-            del self[:]
-            
-            for item in normallist:
-                self.append(item)
+            oldlength = len(self)
+            self.__fromrows([self.__checkrow(row) for row in normallist])
+            self.__tie()
+            self.changed((len(self) - oldlength) * stride)
         
         @property
         def bytelength(self):
-            raise PEBKAC #this could be supported, but we dont yet
+            return len(self) * stride
+        
+        def seek_to(self, fileobj, index, start = 0):
+            """Position fileobj at row index; see Array.seek_to."""
+            fileobj.seek(_recordoffset(stride, sizeParam, countType, index, start), io.SEEK_SET)
+        
+        def record_at(self, source, index, start = 0):
+            """Read row index as a tuple of field values; see Array.record_at."""
+            return coretype(*codec.unpack_from(*_recordview(source, stride, sizeParam, countType, index, start)))
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            scount = sizeParam if type(sizeParam) is int else _skimargument(scope, sizeParam)
+            
+            end = _skimcount(countType, scount, offset, len(view), stride)
+            if (end - offset) % stride != 0:
+                raise CorruptedData
+            
+            for rowoffset in range(offset, end, stride if len(checked) > 0 else end):
+                row = codec.unpack_from(view, rowoffset)
+                for index, checkvalue in checked:
+                    try:
+                        checkvalue(row[index])
+                    except CorruptedData:
+                        raise CorruptedData(rowoffset)
+            if scope._keep:
+                return ([coretype(*row) for row in codec.iter_unpack(view[offset:end])], end)
+            return (None, end)
         
-        #Since this CField is a subtype of list, it doubles as a native Python
-        #object and thus should be exposed to the user
         PRIMITIVE = False
     
     return ArrayInstance
 
 def Blob(sizeParam):
+    """Blob class factory.
+    
+    sizeParam can be an integer, for fixed-size blobs, or the name of another
+    previously-parsed integer parameter holding the size of the blob."""
     class BlobInstance(CField):
+        DYNARGS = (sizeParam,) if type(sizeParam) is str else ()
+        STATICSIZE = sizeParam if type(sizeParam) is int else None
+        
         def __init__(self, *args, **kwargs):
-            self.__obytes = b""
+            self.__obytes = b"" if type(sizeParam) is str else bytes(sizeParam)
             super(BlobInstance, self).__init__(*args, **kwargs)
         
         def load(self, fileobj):
-            self.bytes = fileobj.read(self.get_dynamic_argument(sizeParam))
+            size = self.bytelength
+            obytes = fileobj.read(size)
+            if len(obytes) != size:
+                raise CorruptedData
+            self.bytes = obytes
         
         @property
         def bytes(self):
-            return self.__obytes
+            obytes = self.__obytes
+            if type(obytes) is memoryview:
+                #Parsed out of a mapping; copy it out now that it's wanted,
+                #and stop holding the mapping open. Clones share the view, so
+                #it's only dropped, not released; the last one out frees it.
+                self.__obytes = obytes.tobytes()
+                return self.__obytes
+            return obytes
         
         @bytes.setter
         def bytes(self, obytes):
-            self.__obytes = obytes
+            if type(sizeParam) is int:
+                if len(obytes) != sizeParam:
+                    raise CorruptedData
+                self.__obytes = obytes
+                self.changed(0)
+                return
+            
             self.set_dynamic_argument(sizeParam, len(obytes))
+            self.__obytes = obytes
+            self.changed()
         
-        def parsebytes(self, obytes):
-            count = self.get_dynamic_argument(sizeParam)
-            self.bytes = obytes[0:count]
-            return obytes[count:-1]
+        def parseview(self, view, offset):
+            end = offset + self.bytelength
+            if end > len(view):
+                raise CorruptedData
+            
+            if view.readonly and isinstance(view.obj, mmap.mmap):
+                #Reference the mapped pages instead of copying them, until
+                #something asks for our bytes
+                self.__obytes = view[offset:end]
+            else:
+                self.__obytes = bytes(view[offset:end])
+            return end
         
         @property
         def core(self):
@@ -616,7 +2553,22 @@ def Blob(sizeParam):
         
         @property
         def bytelength(self):
-            raise PEBKAC #this could be supported, but we dont yet
+            if type(sizeParam) is int:
+                return sizeParam
+            return self.get_dynamic_argument(sizeParam)
+        
+        def _CField__skipsize(self):
+            return self.bytelength
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            size = sizeParam
+            if type(sizeParam) is not int:
+                size = _skimargument(scope, sizeParam)
+            
+            if size < 0 or offset + size > len(view):
+                raise CorruptedData
+            return (None, offset + size)
     
     return BlobInstance
 
@@ -651,14 +2603,36 @@ def If(variableName, condition, basetype = None, *args, **kwargs):
     
     class IfInstance(base):
         """Conditional load class that turns into an empty value if an external condition is unfulfilled."""
-        def load(self, fileobj):
+        def load(self, fileobj, *args, **kwargs):
+            if condition(ctxtprov(self, variableName)):
+                super(IfInstance, self).load(fileobj, *args, **kwargs)
+        
+        def _CField__skipsize(self):
             if condition(ctxtprov(self, variableName)):
-                super(IfInstance, self).load(fileobj)
+                return super(IfInstance, self)._CField__skipsize()
+            return 0
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            if variableName is None:
+                #The condition looks at our container, which scope stands in for
+                if condition(scope):
+                    return base._CField__skim(view, offset, scope)
+                return (None, offset)
+            
+            if condition(_skimargument(scope, variableName)):
+                return base._CField__skim(view, offset, scope)
+            return (None, offset)
         
         def save(self, fileobj):
             if condition(ctxtprov(self, variableName)):
                 super(IfInstance, self).save(fileobj)
         
+        def writeinto(self, buf, offset):
+            if condition(ctxtprov(self, variableName)):
+                return super(IfInstance, self).writeinto(buf, offset)
+            return offset
+        
         @property
         def core(self):
             if condition(ctxtprov(self, variableName)):
@@ -669,23 +2643,45 @@ def If(variableName, condition, basetype = None, *args, **kwargs):
         @core.setter
         def core(self, val):
             if condition(ctxtprov(self, variableName)):
-                super(IfInstance, self).core = val
+                base.core.fset(self, val)
 
         @property
         def bytes(self):
             if condition(ctxtprov(self, variableName)):
                 return super(IfInstance, self).bytes
             else:
-                return None
+                return b""
 
         @bytes.setter
         def bytes(self, val):
             if condition(ctxtprov(self, variableName)):
                 super(IfInstance, self).bytesetter(val)
         
-        def parsebytes(self, obytes):
+        def parseview(self, view, offset):
+            if condition(ctxtprov(self, variableName)):
+                return super(IfInstance, self).parseview(view, offset)
+            return offset
+        
+        @property
+        def bytelength(self):
             if condition(ctxtprov(self, variableName)):
-                return super(IfInstance, self).parsebytes(obytes)
+                return super(IfInstance, self).bytelength
+            return 0
+        
+        #Conditional fields can't be coalesced into a Struct's fixed layout.
+        STRUCTFMT = None
+        TYPECODE = None
+        SLOTTED = False
+        STATICSIZE = 0 if base.STATICSIZE == 0 else None
+        
+        DYNARGS = base.DYNARGS + ((variableName,) if variableName is not None else ())
+        SUBTYPES = (base,)
+        
+        #Lets compile_schema test the condition inline.
+        IFCONDITION = (variableName, condition) if variableName is not None else None
+    
+    if variableName is None:
+        IfInstance._CField__nested = list(base._CField__nested) + [(IfInstance, _ANYFIELD, 0)]
     
     return IfInstance
 
@@ -703,8 +2699,27 @@ class EmptyField(CField):
         if len(obytes) > 0:
             raise CorruptedData
     
-    def parsebytes(self, obytes):
-        return obytes
+    def parseview(self, view, offset):
+        return offset
+    
+    @classmethod
+    def _CField__skim(cls, view, offset, scope):
+        return (None, offset)
+    
+    @property
+    def core(self):
+        return None
+    
+    @core.setter
+    def core(self, val):
+        if val is not None:
+            raise CorruptedData
+    
+    @property
+    def bytelength(self):
+        return 0
+    
+    STATICSIZE = 0
 
 def BitRange(targetParam, fromBits, toBits):
     """Define a range of bits shadowed from another field.
@@ -713,12 +2728,19 @@ def BitRange(targetParam, fromBits, toBits):
     lomask = pow(2, fromBits) - 1
     bitmask = pow(2, toBits) - 1 - lomask
     clearmask = -1 - bitmask
-    if toBits is -1:
+    if toBits == -1:
         bitmask = -1 - lomask
         clearmask = lomask
     
     #TODO: Make bitrange lock it's targetParam integer
     class BitRangeInstance(EmptyField):
+        DYNARGS = (targetParam,)
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            basebits = _skimargument(scope, targetParam)
+            return ((basebits & bitmask) >> fromBits, offset)
+        
         @property
         def core(self):
             basebits = self.get_dynamic_argument(targetParam)
@@ -728,7 +2750,7 @@ def BitRange(targetParam, fromBits, toBits):
         @core.setter
         def core(self, newbits):
             basebits = self.get_dynamic_argument(targetParam)
-            ourbits = ((newbits << toBits) & bitmask) | (basebits & clearmask)
+            ourbits = ((newbits << fromBits) & bitmask) | (basebits & clearmask)
             self.set_dynamic_argument(targetParam, ourbits)
 
     return BitRangeInstance
@@ -736,6 +2758,12 @@ def BitRange(targetParam, fromBits, toBits):
 def Bias(targetParam, biasFactor):
     """Define a field based on another field that returns the first field's value, incremented by a bias value."""
     class BiasInstance(EmptyField):
+        DYNARGS = (targetParam,)
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            return (_skimargument(scope, targetParam) + biasFactor, offset)
+        
         @property
         def core(self):
             basebits = self.get_dynamic_argument(targetParam)
@@ -746,6 +2774,30 @@ def Bias(targetParam, biasFactor):
         def core(self, newbits):
             ourbits = newbits - biasFactor
             self.set_dynamic_argument(targetParam, ourbits)
+    
+    return BiasInstance
+
+def Subfield(targetParam, subfieldName):
+    """Define a field which shadows one named part of another field's core value.
+    
+    Lets dynamic arguments, such as a Union's tag, refer to one bit range of a
+    BitStruct or one field of a Struct. Like BitRange, it takes up no space."""
+    class SubfieldInstance(EmptyField):
+        DYNARGS = (targetParam,)
+        
+        @classmethod
+        def _CField__skim(cls, view, offset, scope):
+            return (getattr(_skimargument(scope, targetParam), subfieldName), offset)
+        
+        @property
+        def core(self):
+            return getattr(self.get_dynamic_argument(targetParam), subfieldName)
+        
+        @core.setter
+        def core(self, val):
+            setattr(self.find_argument_field(targetParam), subfieldName, val)
+    
+    return SubfieldInstance
 
 def Enum(storageType, *valueslist, **kwargs):
     """Class factory for the Enum field type.
@@ -775,6 +2827,13 @@ def Enum(storageType, *valueslist, **kwargs):
             iota = value[1]
             valuesDict[value[0]] = iota
     
+    #Values are checked on every load and set, so look them up in a set
+    #instead of scanning valuesDict.
+    validValues = frozenset(valuesDict.values())
+    valueNames = {}
+    for vname, value in valuesDict.items():
+        valueNames.setdefault(value, vname)
+    
     class EnumInstance(storageType):
         """Enum class that wraps a storageType.
         
@@ -788,10 +2847,10 @@ def Enum(storageType, *valueslist, **kwargs):
         @core.setter
         def core(self, val):
             """Enum core.fset that restricts input values"""
-            if val not in valuesDict.values():
+            if val not in validValues:
                 raise CorruptedData
             
-            super(EnumInstance, self).core = val
+            storageType.core.fset(self, val)
         
         @property
         def bytes(self):
@@ -803,11 +2862,37 @@ def Enum(storageType, *valueslist, **kwargs):
             oldCore = self.core
             self.bytesetter(val)
             
-            if self.core not in valuesDict.values():
+            if self.core not in validValues:
+                raise CorruptedData
+        
+        @property
+        def structvalue(self):
+            return self.core
+        
+        @structvalue.setter
+        def structvalue(self, val):
+            """Enum structvalue.fset that validates values unpacked by Struct"""
+            if val not in validValues:
+                raise CorruptedData
+            
+            storageType.structvalue.fset(self, val)
+        
+        @classmethod
+        def checkvalue(cls, val):
+            if val not in validValues:
                 raise CorruptedData
+            
+            return storageType.checkvalue(val)
+        
+        #Typed arrays don't validate their contents, so enums can't use them.
+        TYPECODE = None
+        STRUCTEXACT = False
         
         #This exports values into the parent structure, for convenience
         EXPORTEDVALUES = valuesDict
+        
+        #Name of each value; the first one declared, if a value has several
+        VALUENAMES = valueNames
     
     return EnumInstance
 
@@ -818,6 +2903,87 @@ class _CFieldDecl(type):
         cdict["PRIMITIVE"] = False
         return super(_CFieldDecl, mcls).__new__(mcls, name, bases, cdict)
 
+_StructRun = collections.namedtuple("_StructRun", ["codec", "indices"])
+
+def _compile_runs(order, cfields):
+    """Group adjacent fixed-layout fields of a Struct into precompiled codecs.
+
+    Returns the Struct's parse plan: a list whose items are either the index of
+    a field which must be handled by its own load/parseview/bytes, or a
+    _StructRun covering several STRUCTFMT fields at once."""
+    plan = []
+    runorder = None
+    runcodes = []
+    runindices = []
+    
+    def closerun():
+        if len(runindices) > 0:
+            codec = struct.Struct((runorder or "<") + "".join(runcodes))
+            plan.append(_StructRun(codec, tuple(runindices)))
+            del runcodes[:]
+            del runindices[:]
+    
+    for index, fieldname in enumerate(order):
+        fmt = cfields[fieldname].STRUCTFMT
+        if fmt is None:
+            closerun()
+            runorder = None
+            plan.append(index)
+            continue
+        
+        fmtorder = None
+        if fmt[0] in "<>":
+            fmtorder = fmt[0]
+            fmt = fmt[1:]
+        
+        if fmtorder is not None and runorder is not None and fmtorder != runorder:
+            #struct formats can't mix endianness, so start a new run
+            closerun()
+            runorder = None
+        
+        runorder = runorder or fmtorder
+        runcodes.append(fmt)
+        runindices.append(index)
+    
+    closerun()
+    return plan
+
+class _StructField(object):
+    """Descriptor that _Struct generates for each field of a Struct.
+
+    Gives constant-time access to the field's slot, hiding PRIMITIVE fields
+    behind their core value."""
+    __slots__ = ("index",)
+    
+    def __init__(self, index):
+        self.index = index
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        
+        field = instance._Struct__slots[self.index]
+        if isinstance(field, CField) and field.PRIMITIVE:
+            return field.core
+        return field
+    
+    def __set__(self, instance, val):
+        #Since it is possible for a user program to get access to a field
+        #object, we should copy core-to-core for fields and direct-to-core
+        #for other Python objects.
+        if isinstance(val, CField):
+            if val is instance._Struct__slots[self.index]:
+                #Augmented assignment (e.g. an Array's +=) hands back the
+                #field itself once it has changed in place
+                return
+            val = val.core
+        instance._Struct__setslot(self.index, val)
+    
+    def __delete__(self, instance):
+        #Uh yeah, you aren't deleting stuff from structs. That would change the
+        #schema, and binary formats are parsed with a fixed schema.
+        raise CorruptedData
+
 class _Struct(_CFieldDecl):
     """Metaclass for all Struct types.
     
@@ -832,6 +2998,8 @@ class _Struct(_CFieldDecl):
             mcls.DEFAULT_BASE_MADE = True
             return super(_Struct, mcls).__new__(mcls, name, bases, cdict)
         order = []
+        bindings = []
+        compiled = cdict.pop("__compiled__", False)
         try:
             order = cdict["__order__"]
             del cdict["__order__"]
@@ -847,9 +3015,36 @@ class _Struct(_CFieldDecl):
                 except:
                     pass
         
+            for index, fieldname in enumerate(order):
+                cdict[fieldname] = _StructField(index)
+            
             cdict["_Struct__order"] = order
             cdict["_Struct__fields"] = cfields
+            cdict["_Struct__index"] = dict((fieldname, i) for i, fieldname in enumerate(order))
+            cdict["_Struct__types"] = [cfields[fieldname] for fieldname in order]
+            cdict["_Struct__plan"] = _compile_runs(order, cfields)
             cdict["_Struct__coretype"] = collections.namedtuple("_Struct_{}__coretype".format(name), order)
+            
+            #Bind every dynamic argument our fields use that names one of our
+            #own fields; pass the rest on to whatever contains us.
+            nested = []
+            for index, fieldname in enumerate(order):
+                for consumer, argname, levels in _unbound(cfields[fieldname]):
+                    if argname in cdict["_Struct__index"]:
+                        argindex = cdict["_Struct__index"][argname]
+                        bindings.append((consumer, argname, levels + 1, argindex))
+                    else:
+                        nested.append((consumer, argname, levels + 1))
+            
+            cdict["_CField__nested"] = nested
+            cdict["_CField__cacheable"] = len(nested) == 0
+            cdict["_Struct__argslots"] = frozenset(argindex for consumer, argname, levels, argindex in bindings)
+            cdict["_Struct__tiedslots"] = frozenset(argindex for consumer, argname, levels, argindex in bindings
+                                                    if argname in consumer.TIEDARGS)
+            cdict["SUBTYPES"] = tuple(cdict["_Struct__types"])
+            
+            sizes = [fieldtype.STATICSIZE for fieldtype in cdict["_Struct__types"]]
+            cdict["STATICSIZE"] = sum(sizes) if None not in sizes else None
         except:
             #Check if the class is a subclass of a valid Struct, or if something
             #is up and we should bail out so that the user knows to fix his
@@ -865,99 +3060,401 @@ class _Struct(_CFieldDecl):
                     #copy the superclass data into the child class
                     cdict["_Struct__order"] = base._Struct__order
                     cdict["_Struct__fields"] = base._Struct__fields
+                    cdict["_Struct__index"] = base._Struct__index
+                    cdict["_Struct__types"] = base._Struct__types
+                    cdict["_Struct__plan"] = base._Struct__plan
                     cdict["_Struct__coretype"] = base._Struct__coretype
+                    cdict["_Struct__argslots"] = base._Struct__argslots
+                    cdict["_Struct__tiedslots"] = base._Struct__tiedslots
             
             if not hasvalidbase:
                 #Structs must either have __order__ or valid superclasses with __order__
                 raise InvalidSchema
         
-        return super(_Struct, mcls).__new__(mcls, name, bases, cdict)
+        cls = super(_Struct, mcls).__new__(mcls, name, bases, cdict)
+        for consumer, argname, levels, argindex in bindings:
+            _bind(consumer, argname, (levels, cls, argindex))
+        
+        if compiled:
+            compile_schema(cls)
+        
+        return cls
 
 class Struct(CField, metaclass=_Struct):
+    """Base class for declarative structures.
+    
+    Fields are kept in a flat list of slots, in field order. SLOTTED fields are
+    stored as their bare core value until something asks for the field object
+    itself, at which point it is created and takes over the slot. All other
+    fields get their field object up front.
+    
+    Each field is exposed as an attribute through a _StructField descriptor.
+    
+    Declaring __compiled__ = True replaces the generic per-field methods with
+    ones generated for this particular schema; see compile_schema."""
+    #Set while this instance can't use compiled methods: some SLOTTED field
+    #was promoted to a field object, or it was partially loaded. Loading or
+    #parsing it in full puts it back on the compiled path.
+    __generic = False
+    
+    #Set while fields skipped by a projected load are missing.
+    __partial = False
+    
     def __init__(self, *args, **kwargs):
-        self.__storage = {}
-        for field in self.__order:
-            self.__storage[field] = self.__fields[field](name = field, container = self)
+        slots = []
+        for index, (fieldname, fieldtype) in enumerate(zip(self.__order, self.__types)):
+            #Array sizes get tied to the array as soon as it's parsed, which
+            #needs the field object, so don't bother with a bare value for them.
+            if fieldtype.SLOTTED and index not in self.__tiedslots:
+                slots.append(fieldtype.DEFAULTVALUE)
+            else:
+                slots.append(fieldtype(name = fieldname, container = self))
         
+        self.__slots = slots
         super(Struct, self).__init__(*args, **kwargs)
     
-    def __getattribute__(self, name):
-        if name == "_Struct__order":
-            #practically I can't keep users from altering the struct order
-            #without making this class twice as verbose
-            #I hope the use of the PEP8-mangling will discourage that
-            return super(Struct, self).__getattribute__(name)
-        elif name in self.__order:
-            field = self.__storage[name]
-            if field.PRIMITIVE:
-                return field.core
-            else:
-                return field
+    def _CField__clone(self, container):
+        twin = super(Struct, self)._CField__clone(container)
+        #Copy fields in order, so that anything looking up a dynamic argument
+        #while being copied finds the copy of it.
+        slots = list(self.__slots)
+        twin.__slots = slots
+        for index, slot in enumerate(slots):
+            if isinstance(slot, CField):
+                slots[index] = slot._CField__clone(twin)
+        
+        return twin
+    
+    def __setslot(self, index, val):
+        slot = self.__slots[index]
+        if isinstance(slot, CField):
+            slot.core = val
         else:
-            return super(Struct, self).__getattribute__(name)
-
-    def __setattribute__(self, name, val):
-        if name == "_Struct__order":
-            raise CorruptedData #we really shouldn't alter the struct order so brazenly
-        elif name in self.__order:
-            #Since it is possible for a user program to get access to a field
-            #object, we should copy core-to-core for fields and direct-to-core
-            #for other Python objects.
-            if "PRIMITIVE" in val.__dict__.keys():
-                self.__storage[name].core = val.core
+            fieldtype = self.__types[index]
+            oldval = self.__slots[index]
+            val = fieldtype.checkvalue(val)
+            self.__slots[index] = val
+            
+            if index in self.__argslots or not self._CField__cacheable:
+                #Other fields' sizes may depend on this one, including through
+                #conditions we can't see into
+                self.changed(0 if val == oldval else None)
+            elif fieldtype.STATICSIZE is not None:
+                self.changed(0)
             else:
-                self.__storage[name].core = val
-        else:
-            super(Struct, self).__setattribute__(name, val)
+                self.changed(len(fieldtype.encodevalue(val)) - len(fieldtype.encodevalue(oldval)))
+    
+    def _CField__fieldindex(self, name):
+        return self.__index.get(name)
+    
+    def _CField__getslot(self, index):
+        """Internal function that allows CField to access fields irregardless of PRIMITIVE.
+        
+        While it is possible for anyone to call this, you should be discouraged
+        by the use of the __variable mangling indicating that this function is
+        intended for CField and CField only."""
+        field = self.__slots[index]
+        if not isinstance(field, CField):
+            #Bare value; promote it to a real field.
+            value = field
+            field = self.__types[index](name = self.__order[index], container = self)
+            field.core = value
+            self.__slots[index] = field
+            self.__generic = True
+        
+        return field
+    
+    def __demote(self):
+        """Go back to bare values for promoted fields, before loading in full.
+        
+        Field objects handed out for them before are left out of the Struct,
+        like fields of a Struct whose core was replaced."""
+        slots = self.__slots
+        for index, fieldtype in enumerate(self.__types):
+            field = slots[index]
+            if fieldtype.SLOTTED and index not in self.__tiedslots and isinstance(field, CField):
+                slots[index] = field.core
+                field.reparent(None, None)
+        
+        self.__generic = False
+    
+    def _CField__getslotvalue(self, index):
+        field = self.__slots[index]
+        if isinstance(field, CField):
+            return field.core
+        return field
+    
+    def _CField__setslotvalue(self, index, val):
+        self.__setslot(index, val)
+
+    def save(self, fileobj):
+        if self.__partial:
+            raise PEBKAC #some fields were never loaded
+        
+        if self._CField__cache is not None:
+            fileobj.write(self._CField__cache)
+            return
+        
+        _writeout(self, fileobj)
+    
+    def writeinto(self, buf, offset):
+        if self.__partial:
+            raise PEBKAC #some fields were never loaded
+        
+        if self._CField__cache is not None:
+            end = offset + len(self._CField__cache)
+            buf[offset:end] = self._CField__cache
+            return end
+        
+        slots = self.__slots
+        for step in self.__plan:
+            if type(step) is _StructRun:
+                values = []
+                for index in step.indices:
+                    field = slots[index]
+                    if isinstance(field, CField):
+                        field = field.structvalue
+                    values.append(field)
+                
+                try:
+                    step.codec.pack_into(buf, offset, *values)
+                except struct.error:
+                    #Value doesn't fit in the field.
+                    raise CorruptedData
+                offset += step.codec.size
+                continue
+            
+            field = slots[step]
+            if isinstance(field, CField):
+                offset = field.writeinto(buf, offset)
+            else:
+                obytes = self.__types[step].encodevalue(field)
+                buf[offset:offset + len(obytes)] = obytes
+                offset += len(obytes)
+        
+        return offset
+    
+    @classmethod
+    def __skimsetup(cls):
+        """Flatten our plan into what _CField__skim needs, once per Struct type."""
+        #Fields not skimmed yet have their default values, as when parsing
+        defaults = dict((fieldname, fieldtype.DEFAULTVALUE if fieldtype.SLOTTED else None)
+                        for fieldname, fieldtype in zip(cls.__order, cls.__types))
+        
+        steps = []
+        for step in cls.__plan:
+            if type(step) is not _StructRun:
+                steps.append((None, cls.__order[step], cls.__types[step]))
+                continue
+            
+            #Fields such as Enum, which don't accept everything they can decode
+            checks = []
+            fieldoffset = 0
+            for position, index in enumerate(step.indices):
+                fieldtype = cls.__types[index]
+                if not fieldtype.STRUCTEXACT:
+                    checks.append((position, fieldoffset, fieldtype.checkvalue))
+                fieldoffset += fieldtype.STATICSIZE
+            
+            steps.append((step.codec, tuple(cls.__order[index] for index in step.indices), checks))
+        
+        cls.__skimplan = (defaults, steps)
+        return cls.__skimplan
+    
+    @classmethod
+    def _CField__skim(cls, view, offset, scope):
+        (defaults, steps) = cls.__dict__.get("_Struct__skimplan") or cls.__skimsetup()
+        values = defaults.copy()
+        scope = scope._inner(values)
+        
+        for step in steps:
+            if step[0] is None:
+                (_, fieldname, fieldtype) = step
+                (values[fieldname], offset) = _skimfield(fieldtype, view, offset, scope)
+                continue
+            
+            (codec, names, checks) = step
+            if offset + codec.size > len(view):
+                raise CorruptedData(offset)
+            row = codec.unpack_from(view, offset)
+            for position, fieldoffset, checkvalue in checks:
+                try:
+                    checkvalue(row[position])
+                except CorruptedData:
+                    raise CorruptedData(offset + fieldoffset)
+            
+            values.update(zip(names, row))
+            offset += codec.size
+        
+        if scope._keep:
+            #Stands in for our core, without the container it would reach
+            return (_SkimScope(values, None, True), offset)
+        return (None, offset)
+
+    def load(self, fileobj, projection = None):
+        """Load the struct from a file.
+        
+        If a projection is given (see _projection for the format), only the
+        fields it names are loaded in full. Other fields are skipped over
+        without being parsed, wherever their size is known from what has been
+        loaded so far; SLOTTED fields are cheap and may be needed as dynamic
+        arguments, so they are always loaded. A partially loaded struct can't
+        be saved or encoded."""
+        if not isinstance(fileobj, ReadBuffer):
+            self.changed()
+            buffered = ReadBuffer(fileobj)
+            try:
+                self.load(buffered, projection)
+            finally:
+                buffered.release()
+            return
+        
+        self._CField__cache = None
+        self._CField__corecache = None
+        self._CField__size = None
+        self.__partial = False
+        projection = _projection(projection)
+        if projection is not None:
+            self.__loadprojected(fileobj, projection)
+            return
+        
+        if self.__generic:
+            self.__demote()
+        
+        slots = self.__slots
+        for step in self.__plan:
+            if type(step) is _StructRun:
+                obytes = fileobj.read(step.codec.size)
+                if len(obytes) != step.codec.size:
+                    raise CorruptedData
+                self.__unpackrun(step, step.codec.unpack(obytes))
+                continue
+            
+            field = slots[step]
+            if isinstance(field, CField):
+                field.load(fileobj)
+            else:
+                slots[step] = self.__types[step].loadvalue(fileobj)
+    
+    def __loadprojected(self, fileobj, projection):
+        slots = self.__slots
+        for index, fieldtype in enumerate(self.__types):
+            field = slots[index]
+            fieldname = self.__order[index]
+            if not isinstance(field, CField):
+                slots[index] = fieldtype.loadvalue(fileobj)
+            elif fieldname in projection or fieldtype.SLOTTED:
+                if field.PRIMITIVE or projection.get(fieldname) is None:
+                    field.load(fileobj)
+                else:
+                    field.load(fileobj, projection[fieldname])
+            else:
+                self.__partial = True
+                self.__generic = True
+                
+                size = field._CField__skipsize()
+                if size is not None:
+                    fileobj.seek(size, io.SEEK_CUR)
+                elif field.PRIMITIVE:
+                    field.load(fileobj)
+                else:
+                    #Skip over as much of it as we can
+                    field.load(fileobj, {})
     
-    def _CField__getfield(self, name):
-        """Internal function that allows CField to access fields irregardless of PRIMITIVE.
+    def __packrun(self, step):
+        values = []
+        for index in step.indices:
+            field = self.__slots[index]
+            if isinstance(field, CField):
+                field = field.structvalue
+            values.append(field)
         
-        While it is possible for anyone to call this, you should be discouraged
-        by the use of the __variable mangling indicating that this function is
-        intended for CField and CField only."""
-        return self.__storage[name]
+        try:
+            return step.codec.pack(*values)
+        except struct.error:
+            #Value doesn't fit in the field.
+            raise CorruptedData
     
-    def __delattribute__(self, name):
-        #Uh yeah, you aren't deleting stuff from structs. That would change the
-        #schema, and binary formats are parsed with a fixed schema.
-        raise CorruptedData
-
-    def save(self, fileobj):
-        for field in self.__order:
-            self.__storage[field].save(fileobj)
-
-    def load(self, fileobj):
-        for field in self.__order:
-            self.__storage[field].load(fileobj)
+    def __unpackrun(self, step, values):
+        slots = self.__slots
+        types = self.__types
+        for index, val in zip(step.indices, values):
+            field = slots[index]
+            if isinstance(field, CField):
+                field.structvalue = val
+            else:
+                slots[index] = types[index].checkvalue(val)
     
     @property
     def bytes(self):
+        if self.__partial:
+            raise PEBKAC #some fields were never loaded
+        
+        if self._CField__cache is not None:
+            return self._CField__cache
+        
         lisbytes = []
-        for field in self.__order:
-            lisbytes.append(field.bytes)
+        for step in self.__plan:
+            if type(step) is _StructRun:
+                lisbytes.append(self.__packrun(step))
+                continue
+            
+            field = self.__slots[step]
+            if isinstance(field, CField):
+                lisbytes.append(field.bytes)
+            else:
+                lisbytes.append(self.__types[step].encodevalue(field))
         
-        return b"".join(lisbytes)
+        obytes = b"".join(lisbytes)
+        if self._CField__cacheable:
+            self._CField__cache = obytes
+        return obytes
     
     @bytes.setter
     def bytes(self, val):
-        for field in self.__order:
-            val = self.__storage[field].parsebytes(val)
-        
-        if len(val) > 0:
+        self.changed()
+        if self.parseview(memoryview(val), 0) != len(val):
             #raise an exception if the input was too big
             raise CorruptedData
     
-    def parsebytes(self, obytes):
-        for field in self.__order:
-            obytes = self.__storage[field].parsebytes(obytes)
+    def parseview(self, view, offset):
+        self._CField__cache = None
+        self._CField__corecache = None
+        self._CField__size = None
+        self.__partial = False
+        if self.__generic:
+            self.__demote()
+        
+        slots = self.__slots
+        for step in self.__plan:
+            if type(step) is _StructRun:
+                if offset + step.codec.size > len(view):
+                    raise CorruptedData
+                self.__unpackrun(step, step.codec.unpack_from(view, offset))
+                offset += step.codec.size
+                continue
+            
+            field = slots[step]
+            if isinstance(field, CField):
+                offset = field.parseview(view, offset)
+            else:
+                (slots[step], offset) = self.__types[step].parsevalue(view, offset)
+        
+        return offset
     
     @property
     def core(self):
-        items = []
-        for field in self.__order:
-            items.append(self.__storage[field].core)
-        return self.__coretype(*items)
+        core = self._CField__corecache
+        if core is None:
+            items = []
+            for field in self.__slots:
+                if isinstance(field, CField):
+                    field = field.core
+                items.append(field)
+            core = self.__coretype(*items)
+            if self._CField__cacheable:
+                self._CField__corecache = core
+        return core
     
     @core.setter
     def core(self, items):
@@ -966,19 +3463,76 @@ class Struct(CField, metaclass=_Struct):
             #we need as many items as there are fields
             raise CorruptedData
         
-        for item, field in zip(items, self.__order):
-            self.__storage[field].core = item
+        for index, item in enumerate(items):
+            self.__setslot(index, item)
+    
+    @property
+    def bytelength(self):
+        if self.STATICSIZE is not None:
+            return self.STATICSIZE
+        if self.__partial:
+            raise PEBKAC #some fields were never loaded
+        if self._CField__cache is not None:
+            return len(self._CField__cache)
+        
+        if self._CField__size is None:
+            size = 0
+            for fieldtype, field in zip(self.__types, self.__slots):
+                if isinstance(field, CField):
+                    size += field.bytelength
+                elif fieldtype.STATICSIZE is not None:
+                    size += fieldtype.STATICSIZE
+                else:
+                    size += len(fieldtype.encodevalue(field))
+            if not self._CField__cacheable:
+                return size
+            self._CField__size = size
+        
+        return self._CField__size
+    
+    @classmethod
+    def overlay(cls, buffer, offset = 0):
+        """Bind this Struct's layout directly to a buffer at offset.
+        
+        Returns an overlay object whose fields decode straight out of the
+        buffer when read, and encode straight into it when written; there's
+        no separate parse or save step. The buffer must be writable (e.g. a
+        bytearray or writable mmap) to write through the overlay. Only Structs
+        with a STATICSIZE can be overlaid."""
+        return _overlaytype(cls)(buffer, offset)
 
 ExternalTag = 0
 InternalTag = 1
 
+class _UnionMember(object):
+    """Descriptor that _Union generates for each named field of a Union.
+
+    Accessing the field switches the union's tag to that field if needed."""
+    __slots__ = ("value",)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        
+        if instance.__tag__ != self.value:
+            instance.__tag__ = self.value
+        return instance.__contents__
+    
+    def __set__(self, instance, val):
+        if instance.__tag__ != self.value:
+            instance.__tag__ = self.value
+        instance.__contents__ = val
+
 class _Union(_CFieldDecl):
     DEFAULT_BASE_MADE = False
     
     def __new__(mcls, name, bases, cdict):
         if name == "Union" and not mcls.DEFAULT_BASE_MADE:
             #Do nothing if the Union class hasn't been constructed yet
-            mcls.DefaultBaseMade = True
+            mcls.DEFAULT_BASE_MADE = True
             return super(_Union, mcls).__new__(mcls, name, bases, cdict)
         #The "Default" class is the type of field that gets used for the mapping
         #if the field is unspecified.
@@ -1013,15 +3567,15 @@ class _Union(_CFieldDecl):
         reverseValues = {}
         mapping = {}
         for vname, value in values.items():
-            if value in mapping.keys() and cdict[vname] is not cdict[reverseValues[value]]:
-                #You are not allowed to generate two different field types
-                #for the same enum value.
-                raise InvalidSchema
-            
-            try: #Attempt to fill the mapping with the user-specified field
+            if vname in cdict: #Fill the mapping with the user-specified field
+                if mapping.get(value, defaultField) not in (defaultField, cdict[vname]):
+                    #You are not allowed to generate two different field types
+                    #for the same enum value.
+                    raise InvalidSchema
+                
                 mapping[value] = cdict[vname]
                 del cdict[vname]
-            except: #Otherwise use the default
+            elif value not in mapping: #Otherwise use the default
                 mapping[value] = defaultField
             
             try: #reverseValues is a dict of lists, because dicts are not
@@ -1030,7 +3584,30 @@ class _Union(_CFieldDecl):
             except KeyError:
                 reverseValues[value] = [vname]
         
+        #Naming a field lets you access it regardless of the current tag
+        for vname, value in values.items():
+            if mapping[value] is not defaultField:
+                cdict[vname] = _UnionMember(value)
+        
         cdict["_Union__mapping"] = mapping
+        
+        #The union is the container of both its tag and contents fields; any
+        #dynamic arguments they use are resolved by whatever contains us.
+        nested = []
+        for fieldtype in set(mapping.values()) | ({tag} if cdict["_Union__mode"] is InternalTag else set()):
+            nested.extend((consumer, argname, levels + 1) for consumer, argname, levels in _unbound(fieldtype))
+        cdict["_CField__nested"] = nested
+        cdict["SUBTYPES"] = tuple(set(mapping.values()) | {tag})
+        
+        #Unions only have a static size if every possible field has the same one
+        sizes = set(fieldtype.STATICSIZE for fieldtype in mapping.values())
+        tagsize = tag.STATICSIZE if cdict["_Union__mode"] is InternalTag else 0
+        cdict["STATICSIZE"] = None
+        if len(sizes) == 1 and None not in sizes and tagsize is not None:
+            cdict["STATICSIZE"] = tagsize + sizes.pop()
+        if cdict["_Union__mode"] is ExternalTag:
+            cdict["DYNARGS"] = (tagname,)
+        cdict["_CField__cacheable"] = len(nested) == 0 and cdict["_Union__mode"] is InternalTag
         cdict["_Union__reverseValues"] = reverseValues
         cdict["_Union__coretype"] = collections.namedtuple("_Union_{}__coretype".format(name), ["tag", "contents"])
 
@@ -1040,7 +3617,7 @@ class _Union(_CFieldDecl):
         #and make the new tag's field attempt to parse them.
         try:
             cdict["_Union__reparse_on_retag"] = cdict["__reparse_on_retag__"]
-            del cdict["__reparsable__"]
+            del cdict["__reparse_on_retag__"]
         except:
             cdict["_Union__reparse_on_retag"] = False
 
@@ -1053,43 +3630,95 @@ class Union(CField, metaclass = _Union):
     on a tag value, which specifies which type to delegate to.
 
     It can either specify the tag type and storage directly, or refer to an
-    external variable for the tag."""
+    external variable for the tag.
+    
+    Changing the tag to one with a different field type keeps the old field
+    around, so changing it back restores the old contents instead of building
+    a new field."""
+    #Fields replaced by a retag, by type. Only created once we are retagged.
+    __retired = None
+    
     def __init__(self, *args, **kwargs):
         if self.__mode is InternalTag:
             self.__tagstorage = self.__tag(name = "__tag__", container = self)
-            self.__fieldstorage = None
-            self.__currenttag = None
-        elif self.__mode is ExternalTag:
-            self.__tagstorage = self.find_argument_field(self.__tagname)
-            self.__fieldstorage = self.__mapping[self.__tagstorage.core](name = "__contents__", container = self)
-            self.__currenttag = self.__tagstorage.core
+        self.__fieldstorage = None
+        self.__currenttag = None
         
         super(Union, self).__init__(*args, **kwargs)
     
-    def load(self, fileobj):
+    def _CField__clone(self, container):
+        twin = super(Union, self)._CField__clone(container)
+        twin.__retired = None
+        if self.__mode is InternalTag:
+            twin.__tagstorage = self.__tagstorage._CField__clone(twin)
+        if self.__fieldstorage is not None:
+            twin.__fieldstorage = self.__fieldstorage._CField__clone(twin)
+        return twin
+    
+    def load(self, fileobj, projection = None):
+        if not isinstance(fileobj, ReadBuffer):
+            self.changed()
+            buffered = ReadBuffer(fileobj)
+            try:
+                self.load(buffered, projection)
+            finally:
+                buffered.release()
+            return
+        
+        self._CField__corecache = None
         if self.__mode is InternalTag:
             self.__tagstorage.load(fileobj)
         self.__updatestate()
-        self.__fieldstorage.load(fileobj)
+        
+        #Projections apply to whichever field we contain
+        if projection is not None and not self.__fieldstorage.PRIMITIVE:
+            self.__fieldstorage.load(fileobj, projection)
+        else:
+            self.__fieldstorage.load(fileobj)
     
     @property
     def bytes(self):
-        self.__updatestate()
-        obytes = b""
+        field = self.__current()
         if self.__mode is InternalTag:
-            obytes += self.__tagstorage.bytes
-        return obytes + self.__fieldstorage.bytes
+            return self.__tagstorage.bytes + field.bytes
+        return field.bytes
     
-    def parsebytes(self, obytes):
+    def writeinto(self, buf, offset):
+        field = self.__current()
+        if self.__mode is InternalTag:
+            offset = self.__tagstorage.writeinto(buf, offset)
+        return field.writeinto(buf, offset)
+    
+    @classmethod
+    def _CField__skim(cls, view, offset, scope):
+        if cls.__mode is InternalTag:
+            (tagvalue, offset) = _skimfield(cls.__tag, view, offset, scope)
+        else:
+            tagvalue = _skimargument(scope, cls.__tagname)
+        
+        contents = cls.__mapping.get(tagvalue)
+        if contents is None:
+            raise CorruptedData
+        if scope._keep:
+            return _skimfield(contents, view, offset, scope._inner({}))
+        return (None, _skimfield(contents, view, offset, scope)[1])
+    
+    def parseview(self, view, offset):
+        self._CField__corecache = None
         if self.__mode is InternalTag:
-            obytes = self.__tagstorage.parsebytes(obytes)
+            offset = self.__tagstorage.parseview(view, offset)
         self.__updatestate()
-        return self.__fieldstorage.parsebytes(obytes)
+        return self.__fieldstorage.parseview(view, offset)
     
     @property
     def core(self):
-        self.__updatestate()
-        return self.__coretype(self.__tag__, self.__fieldstorage.core)
+        field = self.__current()
+        core = self._CField__corecache
+        if core is None:
+            core = self.__coretype(self.__currenttag, field.core)
+            if self._CField__cacheable:
+                self._CField__corecache = core
+        return core
     
     @core.setter
     def core(self, val):
@@ -1097,82 +3726,708 @@ class Union(CField, metaclass = _Union):
             raise PEBKAC #must give two values, the tag and the contents
         
         self.__tag__ = val[0]
-        self.__contents__.core = val[1]
+        self.__contents__ = val[1]
+    
+    @property
+    def bytelength(self):
+        if self.STATICSIZE is not None:
+            return self.STATICSIZE
+        
+        field = self.__current()
+        if self.__mode is InternalTag:
+            return self.__tagstorage.bytelength + field.bytelength
+        return field.bytelength
+    
+    def __tagvalue(self):
+        if self.__mode is InternalTag:
+            return self.__tagstorage.core
+        return self.get_dynamic_argument(self.__tagname)
+    
+    def __current(self):
+        """Return the field for the current tag.
+        
+        An internal tag can only change through us, so we only have to check it
+        against the current field when the tag is external."""
+        if self.__mode is ExternalTag or self.__fieldstorage is None:
+            self.__updatestate()
+        return self.__fieldstorage
     
     def __updatestate(self):
         """This function is called to ensure that the tag value and current field match.
         
         It is usually called when the tag or contents are accessed, to keep them synced."""
-        if self.__tagstorage.core == self.__currenttag:
-            return #nothing needs to be done
-        
-        if self.__currenttag is None:
+        newval = self.__tagvalue()
+        if self.__fieldstorage is None:
             #Tag was not parsed at __init__
             #It better have been parsed by now!!
-            self.__currenttag = self.__tagstorage.core
-            self.__fieldstorage = self.__mapping[self.__tagstorage.core](name = "__contents__", container = self)
-        
-        newval = self.__tagstorage.core
-        if self.__mapping[self.__currenttag] is not self.__mapping[newval]:
+            self.__fieldstorage = self.__mapping[newval](name = "__contents__", container = self)
+        elif newval == self.__currenttag:
+            return #nothing needs to be done
+        elif self.__mapping[self.__currenttag] is not self.__mapping[newval]:
+            oldfield = self.__fieldstorage
+            newtype = self.__mapping[newval]
+            if self.__retired is None:
+                self.__retired = {}
+            self.__retired[type(oldfield)] = oldfield
+            
+            self.__fieldstorage = self.__retired.pop(newtype, None)
+            if self.__fieldstorage is None:
+                self.__fieldstorage = newtype(name = "__contents__", container = self)
+            
             if self.__reparse_on_retag:
                 #"MissingNO" mode (bytewise reparse)
                 #You have to declare __reparse_on_retag__ = True in your class
                 #since this is a behavior 99% of users DON'T want.
-                oldfield = self.__fieldstorage
-                self.__fieldstorage = self.__mapping[newval](name = "__contents__", container = self)
-                
                 #new fields may throw out bytes.
                 self.__fieldstorage.parsebytes(oldfield.bytes)
-            else:
-                self.__fieldstorage = self.__mapping[newval](name = "__contents__", container = self)
         
+        self._CField__corecache = None
         self.__currenttag = newval
+    
+    @property
+    def __tag__(self):
+        #__tag__ is a special member
+        self.__current()
+        return self.__currenttag
+    
+    @__tag__.setter
+    def __tag__(self, val):
+        #setting __tag__ forces the field to change
+        if self.__mode is InternalTag:
+            self.__tagstorage.core = val
+        else:
+            self.set_dynamic_argument(self.__tagname, val)
+        self.__updatestate()
+        
+        #The contents may have been replaced with a different type
+        self.changed()
+    
+    @property
+    def __contents__(self):
+        #__contents__ will give you the field for the current tag
+        field = self.__current()
+        if field.PRIMITIVE:
+            return field.core
+        else:
+            return field
+    
+    @__contents__.setter
+    def __contents__(self, val):
+        field = self.__current()
+        if isinstance(val, CField):
+            field.core = val.core
+        else:
+            field.core = val
 
-    def __getattribute__(self, name):
-        if name.startswith("_Union"):
-            #psuedoprivate variables are accessed directly
-            return super(Union, self).__getattribute__(name)
-        elif name == "__tag__":
-            #__tag__ is a special member
-            self.__updatestate()
-            return self.__tagstorage.core
-        elif name == "__contents__":
-            #__contents__ will give you the current tag
-            self.__updatestate()
-            if self.__fieldstorage.PRIMITIVE:
-                return self.__fieldstorage.core
-            else:
-                return self.__fieldstorage
-        elif name in self.__mapping.keys():
-            #naming a field will let you access that field, regardless of the
-            #current tag
-            if name not in self.__reverseValues[self.__tag__]:
-                #check if accessing this field would cause a field change, and
-                #if so, change the tag.
-                self.__tag__ = self.__mapping[name]
-            return self.__contents__
+class _BitStructField(object):
+    """Descriptor that _BitStruct generates for each bit range of a BitStruct.
+    
+    Writing a range masks it into the storage word directly, rather than
+    decoding and encoding the whole word."""
+    __slots__ = ("index", "shift", "mask", "limit")
+    
+    def __init__(self, index, shift, mask, limit):
+        self.index = index
+        self.shift = shift
+        self.mask = mask
+        self.limit = limit
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.core[self.index]
+    
+    def __set__(self, instance, val):
+        if val < 0 or (self.limit is not None and val > self.limit):
+            raise CorruptedData
+        
+        storage = instance._BitStruct__storage
+        storage.core = (storage.core & ~self.mask) | (val << self.shift)
+    
+    def __delete__(self, instance):
+        raise CorruptedData
+
+def _compile_bits(name, order, ranges):
+    """Generate the decoder and encoder for a BitStruct's bit ranges.
+    
+    The decoder turns a storage word into a tuple of every range at once, and
+    the encoder turns such a tuple back into a word; both are straight-line
+    expressions with every shift and mask bound as a constant."""
+    decoded = []
+    encoded = []
+    for index, (fromBits, toBits) in enumerate(ranges):
+        if toBits == -1:
+            decoded.append("word >> {}".format(fromBits))
+            encoded.append("_v{} << {}".format(index, fromBits))
         else:
-            #User variable or class/user function
-            return super(Union, self).__getattribute__(name)
-
-    def __setattribute__(self, name, val):
-        if name.startswith("_Union"):
-            #psuedoprivates are specialcased to avoid recursion
-            super(Union, self).__setattribute__(name, val)
-        elif name == "__tag__":
-            #setting __tag__ forces the field to change
-            self.__tagstorage.core = val
-            self.__updatestate()
-        elif name == "__contents__":
-            self.__updatestate()
+            width = (1 << (toBits - fromBits)) - 1
+            decoded.append("word >> {} & {}".format(fromBits, width))
+            encoded.append("(_v{} & {}) << {}".format(index, width, fromBits))
+    
+    names = "".join("_v{}, ".format(index) for index in range(len(order)))
+    source = "\n".join(["def decode(word):",
+                        "    return ({},)".format(", ".join(decoded)),
+                        "def encode(values):",
+                        "    ({}) = values".format(names),
+                        "    return {}".format(" | ".join(encoded) or "0")])
+    
+    env = {}
+    exec(compile(source, "<compiled bits {}>".format(name), "exec"), env)
+    return env["decode"], env["encode"]
+
+class _BitStruct(_CFieldDecl):
+    """Metaclass for all BitStruct types.
+    
+    Takes the bit ranges out of the class namespace, checks that they don't
+    overlap, and compiles them into one decoder and one encoder."""
+    def __new__(mcls, name, bases, cdict):
+        if "__order__" not in cdict:
+            #The BitStruct base class, or a subclass of some BitStruct
+            return super(_BitStruct, mcls).__new__(mcls, name, bases, cdict)
+        
+        order = cdict.pop("__order__")
+        storage = cdict.pop("__storage__")
+        ranges = [cdict.pop(fieldname) for fieldname in order]
+        
+        used = 0
+        for fromBits, toBits in ranges:
+            if fromBits < 0 or (toBits != -1 and toBits <= fromBits):
+                raise InvalidSchema
+            
+            if toBits == -1:
+                mask = -1 << fromBits
+            else:
+                mask = (1 << toBits) - (1 << fromBits)
             
-            if "PRIMITIVE" in val.__dict__.keys():
-                self.__fieldstorage.core = val.core
+            if used & mask:
+                #Bit ranges may not share bits
+                raise InvalidSchema
+            used |= mask
+        
+        for index, (fieldname, (fromBits, toBits)) in enumerate(zip(order, ranges)):
+            if toBits == -1:
+                cdict[fieldname] = _BitStructField(index, fromBits, -1 << fromBits, None)
             else:
-                self.__fieldstorage.core = val
-        elif name in self.__mapping.keys():
-            if name not in self.__reverseValues[self.__tag__]:
-                self.__tag__ = self.__mapping[name]
-            self.__contents__ = val
+                limit = (1 << (toBits - fromBits)) - 1
+                cdict[fieldname] = _BitStructField(index, fromBits, limit << fromBits, limit)
+        
+        coretype = collections.namedtuple("_BitStruct_{}__coretype".format(name), order)
+        decode, encode = _compile_bits(name, order, ranges)
+        
+        cdict["_BitStruct__order"] = order
+        cdict["_BitStruct__storagetype"] = storage
+        cdict["_BitStruct__coretype"] = coretype
+        cdict["_BitStruct__decode"] = staticmethod(decode)
+        cdict["_BitStruct__encode"] = staticmethod(encode)
+        cdict["_BitStruct__limits"] = [cdict[fieldname].limit for fieldname in order]
+        
+        #We are encoded exactly like our storage field
+        cdict["STATICSIZE"] = storage.STATICSIZE
+        cdict["STRUCTFMT"] = storage.STRUCTFMT
+        cdict["STRUCTEXACT"] = storage.STRUCTEXACT
+        cdict["SUBTYPES"] = (storage,)
+        cdict["_CField__nested"] = [(consumer, argname, levels + 1) for consumer, argname, levels in _unbound(storage)]
+        
+        return super(_BitStruct, mcls).__new__(mcls, name, bases, cdict)
+
+class BitStruct(CField, metaclass = _BitStruct):
+    """Base class for declarative bit fields packed into one integer.
+    
+    Subclasses declare the integer type they are stored as in __storage__, and
+    each bit range as a (fromBits, toBits) pair, where toBits is exclusive, or
+    -1 for all of the bits from fromBits up. As with Struct, __order__ lists
+    them, in the order the core value gives them in:
+    
+        class PatchCommand(BitStruct):
+            __storage__ = VarInt
+            action = (0, 2)
+            length = (2, -1)
+            __order__ = ["action", "length"]
+    
+    Every range is decoded at once, the first time any of them is read after
+    the storage changes, instead of fetching and masking the storage for each
+    one like BitRange does."""
+    def __init__(self, *args, **kwargs):
+        self.__storage = self.__storagetype(name = "__storage__", container = self)
+        super(BitStruct, self).__init__(*args, **kwargs)
+    
+    def _CField__clone(self, container):
+        twin = super(BitStruct, self)._CField__clone(container)
+        twin.__storage = self.__storage._CField__clone(twin)
+        return twin
+    
+    def load(self, fileobj, projection = None):
+        #Every bit range comes with the storage, so projections don't matter
+        self._CField__corecache = None
+        self.__storage.load(fileobj)
+    
+    def parseview(self, view, offset):
+        self._CField__corecache = None
+        return self.__storage.parseview(view, offset)
+    
+    def _CField__skipsize(self):
+        return self.__storage._CField__skipsize()
+    
+    @classmethod
+    def _CField__skim(cls, view, offset, scope):
+        (word, offset) = _skimfield(cls.__storagetype, view, offset, scope)
+        return (tuple.__new__(cls.__coretype, cls.__decode(word)), offset)
+    
+    @property
+    def bytes(self):
+        return self.__storage.bytes
+    
+    def writeinto(self, buf, offset):
+        return self.__storage.writeinto(buf, offset)
+    
+    @property
+    def bytelength(self):
+        return self.__storage.bytelength
+    
+    @property
+    def structvalue(self):
+        return self.__storage.structvalue
+    
+    @structvalue.setter
+    def structvalue(self, val):
+        self._CField__corecache = None
+        self.__storage.structvalue = val
+    
+    @property
+    def core(self):
+        core = self._CField__corecache
+        if core is None:
+            core = tuple.__new__(self.__coretype, self.__decode(self.__storage.core))
+            self._CField__corecache = core
+        return core
+    
+    @core.setter
+    def core(self, items):
+        """Setter method for bit structs that accepts any iterable with a value for each bit range."""
+        items = tuple(items)
+        if len(items) != len(self.__order):
+            raise CorruptedData
+        
+        for item, limit in zip(items, self.__limits):
+            if item < 0 or (limit is not None and item > limit):
+                raise CorruptedData
+        
+        self.__storage.core = self.__encode(items)
+
+def _generate_struct(cls):
+    """Generate __init__, load, parseview, writeinto and bytes for a Struct type.
+    
+    The generated methods unroll the Struct's plan into straight-line code with
+    every field type, codec and default value bound as a constant. They assume
+    that SLOTTED fields other than tied array sizes are still bare values and
+    that all fields are present. Once either stops being true, writeinto and
+    bytes defer to the generic Struct methods, until a full load or parse puts
+    the bare values back."""
+    order = cls._Struct__order
+    types = cls._Struct__types
+    plan = cls._Struct__plan
+    tiedslots = cls._Struct__tiedslots
+    bindings = {}
+    env = {"CorruptedData": CorruptedData, "ReadBuffer": ReadBuffer, "Struct": Struct, "_structerror": struct.error}
+    
+    def bare(index):
+        """Whether a field is kept as a bare value, as Struct.__init__ decides."""
+        return types[index].SLOTTED and index not in tiedslots
+    
+    init = ["def __init__(self, *args, **kwargs):", "    self._Struct__slots = ["]
+    for index, (fieldname, fieldtype) in enumerate(zip(order, types)):
+        env["_t{}".format(index)] = fieldtype
+        if bare(index):
+            env["_d{}".format(index)] = fieldtype.DEFAULTVALUE
+            init.append("        _d{},".format(index))
+        else:
+            init.append("        _t{}(name = {!r}, container = self),".format(index, fieldname))
+    init.append("    ]")
+    init.append("    super(Struct, self).__init__(*args, **kwargs)")
+    
+    def slotvalue(index):
+        if bare(index):
+            return "slots[{}]".format(index)
+        return "slots[{}].core".format(index)
+    
+    def ifcondition(index):
+        """Inline condition for an If field whose variable is one of our fields."""
+        fieldtype = types[index]
+        if bare(index) or getattr(fieldtype, "IFCONDITION", None) is None:
+            return None
+        
+        variable, condition = fieldtype.IFCONDITION
+        binding = fieldtype._CField__bindings.get(variable)
+        if binding is None or binding[0] != 1 or binding[1] is not cls:
+            return None
+        
+        env["_cond{}".format(index)] = condition
+        env["_base{}".format(index)] = fieldtype.SUBTYPES[0]
+        return "_cond{}({})".format(index, slotvalue(binding[2]))
+    
+    parse = ["def parseview(self, view, offset):",
+             "    self._CField__cache = None",
+             "    self._CField__corecache = None",
+             "    self._CField__size = None",
+             "    self._Struct__partial = False",
+             "    if self._Struct__generic:",
+             "        self._Struct__demote()",
+             "    slots = self._Struct__slots",
+             "    end = len(view)"]
+    load = ["def load(self, fileobj, projection = None):",
+            "    if projection is not None or not isinstance(fileobj, ReadBuffer):",
+            "        return _generic_load(self, fileobj, projection)",
+            "    self._CField__cache = None",
+            "    self._CField__corecache = None",
+            "    self._CField__size = None",
+            "    self._Struct__partial = False",
+            "    if self._Struct__generic:",
+            "        self._Struct__demote()",
+            "    slots = self._Struct__slots",
+            "    read = fileobj.read"]
+    writeinto = ["def writeinto(self, buf, offset):",
+                 "    if self._Struct__generic or self._CField__cache is not None:",
+                 "        return _generic_writeinto(self, buf, offset)",
+                 "    slots = self._Struct__slots"]
+    tobytes = ["def tobytes(self):",
+               "    if self._Struct__generic or self._CField__cache is not None:",
+               "        return _generic_bytes(self)",
+               "    slots = self._Struct__slots",
+               "    obytes = b''.join(("]
+    
+    for stepnum, step in enumerate(plan):
+        if type(step) is _StructRun:
+            env["_unpackfrom{}".format(stepnum)] = step.codec.unpack_from
+            env["_unpack{}".format(stepnum)] = step.codec.unpack
+            env["_pack{}".format(stepnum)] = step.codec.pack
+            env["_packinto{}".format(stepnum)] = step.codec.pack_into
+            size = step.codec.size
+            names = ", ".join("_v{}".format(index) for index in step.indices)
+            
+            stores = []
+            for index in step.indices:
+                fieldtype = types[index]
+                if not bare(index):
+                    stores.append("    slots[{0}].structvalue = _v{0}".format(index))
+                elif fieldtype.STRUCTEXACT:
+                    stores.append("    slots[{0}] = _v{0}".format(index))
+                else:
+                    env["_check{}".format(index)] = fieldtype.checkvalue
+                    stores.append("    slots[{0}] = _check{0}(_v{0})".format(index))
+            
+            parse.append("    if offset + {} > end:".format(size))
+            parse.append("        raise CorruptedData")
+            parse.append("    ({},) = _unpackfrom{}(view, offset)".format(names, stepnum))
+            parse.append("    offset += {}".format(size))
+            parse.extend(stores)
+            
+            load.append("    obytes = read({})".format(size))
+            load.append("    if len(obytes) != {}:".format(size))
+            load.append("        raise CorruptedData")
+            load.append("    ({},) = _unpack{}(obytes)".format(names, stepnum))
+            load.extend(stores)
+            
+            packed = []
+            for index in step.indices:
+                if bare(index):
+                    packed.append("slots[{}]".format(index))
+                else:
+                    packed.append("slots[{}].structvalue".format(index))
+            packed = ", ".join(packed)
+            writeinto.append("    _packinto{}(buf, offset, {})".format(stepnum, packed))
+            writeinto.append("    offset += {}".format(size))
+            tobytes.append("        _pack{}({}),".format(stepnum, packed))
+            continue
+        
+        index = step
+        fieldtype = types[index]
+        if bare(index):
+            env["_parse{}".format(index)] = fieldtype.parsevalue
+            env["_load{}".format(index)] = fieldtype.loadvalue
+            env["_encode{}".format(index)] = fieldtype.encodevalue
+            parse.append("    (slots[{0}], offset) = _parse{0}(view, offset)".format(index))
+            load.append("    slots[{0}] = _load{0}(fileobj)".format(index))
+            writeinto.append("    obytes = _encode{0}(slots[{0}])".format(index))
+            writeinto.append("    buf[offset:offset + len(obytes)] = obytes")
+            writeinto.append("    offset += len(obytes)")
+            tobytes.append("        _encode{0}(slots[{0}]),".format(index))
+            continue
+        
+        condition = ifcondition(index)
+        if condition is not None:
+            #Skip the If's own dispatch and go straight to the wrapped type.
+            parse.append("    if {}:".format(condition))
+            parse.append("        offset = _base{0}.parseview(slots[{0}], view, offset)".format(index))
+            load.append("    if {}:".format(condition))
+            load.append("        _base{0}.load(slots[{0}], fileobj)".format(index))
         else:
-            super(Union, self).__setattribute__(name, val)
+            parse.append("    offset = slots[{}].parseview(view, offset)".format(index))
+            load.append("    slots[{}].load(fileobj)".format(index))
+        writeinto.append("    offset = slots[{}].writeinto(buf, offset)".format(index))
+        tobytes.append("        slots[{}].bytes,".format(index))
+    
+    parse.append("    return offset")
+    writeinto.append("    return offset")
+    tobytes.append("    ))")
+    if cls._CField__cacheable:
+        tobytes.append("    self._CField__cache = obytes")
+    tobytes.append("    return obytes")
+    
+    #Values which don't fit their run's format fail in the codec
+    for method in (writeinto, tobytes):
+        body = method[3:]
+        del method[3:]
+        method.append("    try:")
+        method.extend("    " + line for line in body)
+        method.append("    except _structerror:")
+        method.append("        raise CorruptedData")
+    
+    env["_generic_parseview"] = Struct.parseview
+    env["_generic_load"] = Struct.load
+    env["_generic_writeinto"] = Struct.writeinto
+    env["_generic_bytes"] = Struct.bytes.fget
+    
+    source = "\n".join(init + parse + load + writeinto + tobytes) + "\n"
+    exec(compile(source, "<compiled schema {}>".format(cls.__name__), "exec"), env)
+    
+    cls.__init__ = env["__init__"]
+    cls.parseview = env["parseview"]
+    cls.load = env["load"]
+    cls.writeinto = env["writeinto"]
+    cls.bytes = property(env["tobytes"], Struct.bytes.fset)
+    cls._Struct__compiled = source
+
+def compile_schema(fieldtype):
+    """Compile a schema into specialized Python code.
+    
+    Every Struct type reachable from fieldtype gets generated load, parseview,
+    writeinto and bytes methods (and __init__) in place of the generic ones,
+    which walk the Struct's plan and dispatch on each field. Other field types keep
+    their own methods. The schema's declarations don't change, and can still
+    be used and subclassed as normal.
+    
+    Returns fieldtype, so that it may be used as a class decorator."""
+    if "_Struct__compiled" in fieldtype.__dict__:
+        return fieldtype
+    
+    if isinstance(fieldtype, _Struct) and fieldtype is not Struct:
+        derived = [base for base in fieldtype.__bases__
+                   if getattr(base, "_Struct__order", None) is fieldtype._Struct__order]
+        
+        #Subclasses of a Struct (including If) use their base's methods.
+        fieldtype._Struct__compiled = None
+        for base in derived:
+            compile_schema(base)
+        
+        for subtype in fieldtype.SUBTYPES:
+            compile_schema(subtype)
+        
+        if len(derived) == 0:
+            _generate_struct(fieldtype)
+    else:
+        for subtype in fieldtype.SUBTYPES:
+            compile_schema(subtype)
+    
+    return fieldtype
+
+class _Overlay(object):
+    """Base class of the overlay types generated by Struct.overlay."""
+    __slots__ = ("_Overlay__buffer", "_Overlay__offset")
+    
+    def __init__(self, buffer, offset):
+        if offset < 0 or offset + self.STATICSIZE > len(buffer):
+            raise CorruptedData
+        
+        self.__buffer = buffer
+        self.__offset = offset
+    
+    def __parsed(self):
+        """Parse a regular Struct out of our part of the buffer."""
+        return self.STRUCTTYPE.from_mmap(self.__buffer, self.__offset)
+    
+    def __store(self, field):
+        self.__buffer[self.__offset:self.__offset + self.STATICSIZE] = field.bytes
+    
+    @property
+    def bytes(self):
+        return bytes(self.__buffer[self.__offset:self.__offset + self.STATICSIZE])
+    
+    @property
+    def core(self):
+        return self.__parsed().core
+    
+    @core.setter
+    def core(self, items):
+        field = self.STRUCTTYPE()
+        field.core = items
+        self.__store(field)
+
+class _OverlayField(object):
+    """Descriptor for a field of an overlay at a fixed offset.
+    
+    get(buffer, offset) and put(buffer, offset, val) do the actual decoding and
+    encoding. Fields which can't be accessed on their own in place (such as
+    BitRange, which depends on its siblings) have neither, and go through a
+    regular Struct parsed out of the overlay's bytes instead."""
+    __slots__ = ("name", "offset", "get", "put")
+    
+    def __init__(self, name, offset, get, put):
+        self.name = name
+        self.offset = offset
+        self.get = get
+        self.put = put
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        
+        if self.get is None:
+            return getattr(instance._Overlay__parsed(), self.name)
+        return self.get(instance._Overlay__buffer, instance._Overlay__offset + self.offset)
+    
+    def __set__(self, instance, val):
+        if self.put is None:
+            field = instance._Overlay__parsed()
+            setattr(field, self.name, val)
+            instance._Overlay__store(field)
+            return
+        
+        self.put(instance._Overlay__buffer, instance._Overlay__offset + self.offset, val)
+
+class _ArrayOverlay(object):
+    """Overlay of a fixed-size Array, indexed like a list of its elements."""
+    __slots__ = ("_ArrayOverlay__buffer", "_ArrayOverlay__offset", "_ArrayOverlay__count",
+                 "_ArrayOverlay__stride", "_ArrayOverlay__get", "_ArrayOverlay__put")
+    
+    def __init__(self, buffer, offset, count, stride, get, put):
+        self.__buffer = buffer
+        self.__offset = offset
+        self.__count = count
+        self.__stride = stride
+        self.__get = get
+        self.__put = put
+    
+    def __len__(self):
+        return self.__count
+    
+    def __index(self, index):
+        if index < 0:
+            index += self.__count
+        if index < 0 or index >= self.__count:
+            raise IndexError(index)
+        return self.__offset + index * self.__stride
+    
+    def __getitem__(self, index):
+        return self.__get(self.__buffer, self.__index(index))
+    
+    def __setitem__(self, index, val):
+        self.__put(self.__buffer, self.__index(index), val)
+    
+    def __iter__(self):
+        for index in range(self.__count):
+            yield self[index]
+    
+    @property
+    def core(self):
+        #Elements which are themselves overlays give their core, as in a Struct
+        return [item.core if isinstance(item, _Overlay) else item for item in self]
+
+def _overlayaccess(fieldtype):
+    """Get the functions which decode and encode a fixed-size field type in place.
+    
+    Returns (get, put), or (None, None) if the field can't be accessed alone."""
+    if len(_unbound(fieldtype)) > 0:
+        #Needs its containers to make sense of itself
+        return (None, None)
+    
+    if isinstance(fieldtype, (_Struct, _BitStruct)):
+        #BitStructs have a STRUCTFMT, but their core value isn't the word
+        overlaytype = _overlaytype(fieldtype)
+        
+        def put(buffer, offset, val):
+            overlaytype(buffer, offset).core = val
+        
+        return (overlaytype, put)
+    
+    if fieldtype.STRUCTFMT is not None:
+        fmt = fieldtype.STRUCTFMT
+        codec = struct.Struct(fmt if fmt[0] in "<>" else "<" + fmt)
+        
+        def get(buffer, offset):
+            return codec.unpack_from(buffer, offset)[0]
+        
+        def put(buffer, offset, val):
+            try:
+                codec.pack_into(buffer, offset, fieldtype.checkvalue(val))
+            except struct.error:
+                raise CorruptedData
+        
+        return (get, put)
+    
+    element = fieldtype.SUBTYPES[0] if len(fieldtype.SUBTYPES) == 1 else None
+    if issubclass(fieldtype, (list, array.array)) and element.STATICSIZE:
+        count = fieldtype.STATICSIZE // element.STATICSIZE
+        elementget, elementput = _overlayaccess(element)
+        if elementget is not None:
+            def get(buffer, offset):
+                return _ArrayOverlay(buffer, offset, count, element.STATICSIZE, elementget, elementput)
+            
+            def put(buffer, offset, val):
+                if len(val) != count:
+                    raise CorruptedData
+                for index, item in enumerate(val):
+                    elementput(buffer, offset + index * element.STATICSIZE, item)
+            
+            return (get, put)
+    
+    #Anything else with a fixed size can be parsed and encoded by itself.
+    size = fieldtype.STATICSIZE
+    
+    def get(buffer, offset):
+        field = fieldtype()
+        field.parseview(memoryview(buffer), offset)
+        return field.core
+    
+    def put(buffer, offset, val):
+        field = fieldtype()
+        field.core = val
+        buffer[offset:offset + size] = field.bytes
+    
+    return (get, put)
+
+def _bitaccess(bitfield, wordget, wordput):
+    """Get the functions which decode and encode one bit range of a word in place."""
+    def get(buffer, offset):
+        return (wordget(buffer, offset) & bitfield.mask) >> bitfield.shift
+    
+    def put(buffer, offset, val):
+        if val < 0 or (bitfield.limit is not None and val > bitfield.limit):
+            raise CorruptedData
+        word = wordget(buffer, offset)
+        wordput(buffer, offset, (word & ~bitfield.mask) | (val << bitfield.shift))
+    
+    return (get, put)
+
+def _overlaytype(structtype):
+    """Generate (or reuse) the overlay type for a Struct or BitStruct type."""
+    if "_Struct__overlay" in structtype.__dict__:
+        return structtype._Struct__overlay
+    
+    if structtype.STATICSIZE is None:
+        raise PEBKAC #variable-size structs can't be overlaid
+    
+    namespace = {"__slots__": (), "STRUCTTYPE": structtype, "STATICSIZE": structtype.STATICSIZE}
+    if isinstance(structtype, _BitStruct):
+        #Every bit range is masked in and out of the one storage word
+        wordget, wordput = _overlayaccess(structtype._BitStruct__storagetype)
+        for fieldname in structtype._BitStruct__order:
+            namespace[fieldname] = _OverlayField(fieldname, 0, *_bitaccess(structtype.__dict__[fieldname], wordget, wordput))
+    else:
+        offset = 0
+        for fieldname, fieldtype in zip(structtype._Struct__order, structtype._Struct__types):
+            namespace[fieldname] = _OverlayField(fieldname, offset, *_overlayaccess(fieldtype))
+            offset += fieldtype.STATICSIZE
+    
+    overlaytype = type("{}Overlay".format(structtype.__name__), (_Overlay,), namespace)
+    structtype._Struct__overlay = overlaytype
+    return overlaytype
@@ -0,0 +1,91 @@
+"""Small object files and patches for tests to parse, built byte by byte."""
+import struct
+
+def cstr(text):
+    return text.encode("ascii") + b"\x00"
+
+def varint(number):
+    """Encode a number as a BPS variable size integer."""
+    encoded = bytearray()
+    while True:
+        encoded.append(number & 0x7F)
+        number >>= 7
+        if number == 0:
+            encoded[-1] |= 0x80
+            return bytes(encoded)
+        number -= 1
+
+def rgb2(symbols = 6, sections = 2, patches = 2):
+    """An RGB2 object file.
+    
+    Symbols cycle through local, import and export; imports have no value.
+    Even sections hold code with patches patches, odd sections are BSS."""
+    out = [b"RGB2", struct.pack("<II", symbols, sections)]
+    for symnum in range(symbols):
+        out.append(cstr("sym{}".format(symnum)) + bytes((symnum % 3,)))
+        if symnum % 3 != 1:
+            out.append(struct.pack("<II", symnum % sections, symnum * 4))
+    
+    #LONG 5 + SymID 1
+    expr = b"\x80" + struct.pack("<I", 5) + b"\x81" + struct.pack("<I", 1) + b"\x00"
+    for secnum in range(sections):
+        data = bytes(range(16))
+        if secnum % 2:
+            out.append(struct.pack("<IBii", len(data), 0, -1, -1))
+            continue
+        
+        out.append(struct.pack("<IBii", len(data), 2, -1, secnum) + data)
+        out.append(struct.pack("<I", patches))
+        for patchnum in range(patches):
+            out.append(cstr("file{}.asm".format(secnum)))
+            out.append(struct.pack("<IIBI", patchnum + 1, patchnum * 2, 1, len(expr)) + expr)
+    
+    return b"".join(out)
+
+def xobj(symbols = 2, sections = 2, patches = 2):
+    """An ASMotor XObj object file.
+    
+    Each section has symbols symbols. Even sections are in the code group,
+    with data and patches patches; odd ones are in the BSS group."""
+    out = [b"XOB\x00", struct.pack("<I", 2)]
+    out.append(cstr("BSS") + struct.pack("<I", 1))
+    out.append(cstr("CODE") + struct.pack("<I", 0))
+    out.append(struct.pack("<I", sections))
+    
+    #OBJ_CONSTANT 5 + OBJ_SYMBOL 1
+    expr = b"\x1e" + struct.pack("<I", 5) + b"\x1f" + struct.pack("<I", 1) + b"\x01"
+    for secnum in range(sections):
+        groupid = 1 if secnum % 2 == 0 else 0
+        out.append(struct.pack("<i", groupid) + cstr("sect{}".format(secnum)))
+        out.append(struct.pack("<iiI", -1, -1, symbols))
+        for symnum in range(symbols):
+            out.append(cstr("s{}_{}".format(secnum, symnum)) + struct.pack("<i", symnum % 3))
+            if symnum % 3 != 1:
+                out.append(struct.pack("<i", symnum * 4))
+        
+        data = bytes(range(16))
+        out.append(struct.pack("<I", len(data)))
+        if groupid == 1:
+            out.append(data + struct.pack("<I", patches))
+            for patchnum in range(patches):
+                out.append(struct.pack("<III", patchnum * 2, 0, len(expr)) + expr)
+    
+    return b"".join(out)
+
+def bps(commands = 8, readlen = 4):
+    """A BPS patch whose commands cycle through all four actions.
+    
+    The checksums are not real checksums."""
+    metadata = b"<patch/>"
+    out = [b"BPS1", varint(commands * readlen), varint(commands * readlen),
+           varint(len(metadata)), metadata]
+    for cmdnum in range(commands):
+        action = cmdnum % 4
+        out.append(varint(((readlen - 1) << 2) | action))
+        if action == 1:
+            out.append(bytes(range(readlen)))
+        elif action > 1:
+            out.append(varint(cmdnum))
+    
+    out.append(struct.pack("<III", 1, 2, 3))
+    return b"".join(out)
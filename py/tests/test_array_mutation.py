@@ -0,0 +1,187 @@
+"""Array mutators must keep the size parameter and cached encodings in sync."""
+import array, io, unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import rgbds
+
+import objects
+
+class Record(cmodel.Struct):
+    value = cmodel.LeU32
+    
+    __order__ = ["value"]
+
+class LazyRecords(cmodel.Struct):
+    count = cmodel.LeU32
+    records = cmodel.Array(Record, "count", lazy = True)
+    
+    __order__ = ["count", "records"]
+
+class Shorts(cmodel.Struct):
+    count = cmodel.LeU16
+    values = cmodel.Array(cmodel.LeU16, "count")
+    
+    __order__ = ["count", "values"]
+
+class ListArrayMutation(unittest.TestCase):
+    def parsed(self):
+        obj = rgbds.Rgb2()
+        obj.parsebytes(objects.rgb2())
+        #Fill every cache before mutating
+        obj.bytes
+        obj.core
+        return obj
+    
+    def assertConsistent(self, obj):
+        reparsed = rgbds.Rgb2()
+        reparsed.parsebytes(obj.bytes)
+        self.assertEqual(reparsed.bytes, obj.bytes)
+        self.assertEqual(reparsed.core, obj.core)
+        self.assertEqual(obj.bytelength, len(obj.bytes))
+        self.assertEqual(obj.numsyms, len(obj.symbols))
+    
+    def names(self, obj):
+        return [symbol.name for symbol in obj.core.symbols]
+    
+    def test_pop(self):
+        obj = self.parsed()
+        self.assertEqual(obj.symbols.pop().name, "sym5")
+        self.assertEqual(obj.symbols.pop(0).name, "sym0")
+        self.assertEqual(obj.numsyms, 4)
+        self.assertConsistent(obj)
+    
+    def test_insert(self):
+        obj = self.parsed()
+        obj.symbols.insert(1, ("inserted", 1, None))
+        self.assertEqual(self.names(obj)[1], "inserted")
+        self.assertIs(list.__getitem__(obj.symbols, 1)._CField__container, obj.symbols)
+        self.assertConsistent(obj)
+    
+    def test_remove(self):
+        obj = self.parsed()
+        obj.symbols.remove(obj.symbols[2])
+        self.assertNotIn("sym2", self.names(obj))
+        self.assertConsistent(obj)
+        self.assertRaises(ValueError, obj.symbols.remove, "nonexistent")
+    
+    def test_reverse(self):
+        obj = self.parsed()
+        obj.symbols.reverse()
+        self.assertEqual(self.names(obj)[0], "sym5")
+        self.assertConsistent(obj)
+    
+    def test_sort(self):
+        obj = self.parsed()
+        obj.symbols.sort(key = lambda symbol: symbol.name, reverse = True)
+        self.assertEqual(self.names(obj), ["sym5", "sym4", "sym3", "sym2", "sym1", "sym0"])
+        self.assertConsistent(obj)
+    
+    def test_clear(self):
+        obj = self.parsed()
+        obj.symbols.clear()
+        self.assertEqual(obj.numsyms, 0)
+        self.assertConsistent(obj)
+    
+    def test_iadd(self):
+        obj = self.parsed()
+        obj.symbols += [("added", 1, None)]
+        self.assertEqual(self.names(obj)[-1], "added")
+        self.assertConsistent(obj)
+    
+    def test_imul(self):
+        obj = self.parsed()
+        obj.symbols *= 2
+        self.assertEqual(obj.numsyms, 12)
+        self.assertConsistent(obj)
+        obj.symbols *= 0
+        self.assertEqual(obj.numsyms, 0)
+        self.assertConsistent(obj)
+    
+    def test_lazy_insert(self):
+        obj = LazyRecords()
+        obj.parsebytes(b"\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x02\x00\x00\x00")
+        obj.bytes
+        obj.records.insert(0, (9,))
+        self.assertEqual([record.value for record in obj.core.records], [9, 0, 1, 2])
+        self.assertEqual(obj.bytes, b"\x04\x00\x00\x00\x09\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x02\x00\x00\x00")
+
+    def test_core_copy(self):
+        obj = LazyRecords()
+        obj.parsebytes(b"\x02\x00\x00\x00\x05\x00\x00\x00\x06\x00\x00\x00")
+        records = obj.records.core
+        records.append((7,))
+        del records[0]
+        self.assertEqual([record.value for record in obj.records.core], [5, 6])
+        self.assertIsNot(obj.records.core, obj.records.core)
+
+class TypedArrayMutation(unittest.TestCase):
+    def parsed(self):
+        obj = Shorts()
+        obj.parsebytes(b"\x02\x00\x01\x00\x02\x00")
+        obj.bytes
+        obj.core
+        return obj
+    
+    def assertConsistent(self, obj):
+        reparsed = Shorts()
+        reparsed.parsebytes(obj.bytes)
+        self.assertEqual(reparsed.core, obj.core)
+        self.assertEqual(obj.count, len(obj.values))
+        self.assertEqual(obj.bytelength, len(obj.bytes))
+    
+    def test_frombytes(self):
+        obj = self.parsed()
+        obj.values.frombytes(array.array("H", [3]).tobytes())
+        self.assertEqual(obj.bytes[0], 3)
+        self.assertConsistent(obj)
+    
+    def test_fromlist(self):
+        obj = self.parsed()
+        obj.values.fromlist([7, 8])
+        self.assertEqual(obj.core.values, [1, 2, 7, 8])
+        self.assertConsistent(obj)
+    
+    def test_fromfile(self):
+        obj = self.parsed()
+        obj.values.fromfile(io.BytesIO(array.array("H", [9]).tobytes()), 1)
+        self.assertEqual(obj.core.values, [1, 2, 9])
+        self.assertConsistent(obj)
+    
+    def test_reverse(self):
+        obj = self.parsed()
+        obj.values.reverse()
+        self.assertEqual(obj.bytes, b"\x02\x00\x02\x00\x01\x00")
+        self.assertConsistent(obj)
+    
+    def test_byteswap(self):
+        obj = self.parsed()
+        obj.values.byteswap()
+        self.assertEqual(obj.core.values, [256, 512])
+        self.assertConsistent(obj)
+    
+    def test_iadd(self):
+        obj = self.parsed()
+        obj.values += [5]
+        self.assertEqual(obj.count, 3)
+        self.assertConsistent(obj)
+    
+    def test_imul(self):
+        obj = self.parsed()
+        obj.values *= 2
+        self.assertEqual(obj.core.values, [1, 2, 1, 2])
+        self.assertConsistent(obj)
+    
+    def test_overflow(self):
+        obj = self.parsed()
+        values = obj.values
+        self.assertRaises(cmodel.CorruptedData, values.append, -1)
+        self.assertRaises(cmodel.CorruptedData, values.__setitem__, 0, 70000)
+        self.assertRaises(cmodel.CorruptedData, values.insert, 0, 70000)
+        self.assertRaises(cmodel.CorruptedData, values.extend, [3, 70000])
+        self.assertRaises(cmodel.CorruptedData, values.fromlist, [3, -1])
+        self.assertEqual(obj.core.values, [1, 2])
+        self.assertEqual(obj.bytes, b"\x02\x00\x01\x00\x02\x00")
+        self.assertConsistent(obj)
+
+if __name__ == "__main__":
+    unittest.main()
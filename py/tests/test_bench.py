@@ -0,0 +1,80 @@
+"""The benchmark's generated files must parse, and its command must report and compare runs."""
+import json, os, tempfile, unittest
+
+from CodeModule import bench, cmd
+
+TINY = {"symbols": 6, "sections": 2, "patches": 2, "exprlen": 3, "commands": 8, "readlen": 2}
+
+class Generators(unittest.TestCase):
+    def test_round_trip(self):
+        for casename, (schema, generate) in sorted(bench.CASES.items()):
+            data = generate(TINY)
+            obj = schema()
+            self.assertEqual(obj.parsebytes(data), b"", casename)
+            self.assertEqual(obj.bytes, data, casename)
+    
+    def test_scale(self):
+        obj = bench.CASES["rgb2"][0]()
+        obj.parsebytes(bench.rgb2_object(symbols = 9, sections = 4, patches = 3, exprlen = 5))
+        self.assertEqual((obj.numsyms, obj.numsects), (9, 4))
+        patch = obj.sections[0].datsec.patches[2]
+        self.assertEqual(len(patch.patchexprs), 5)
+        
+        obj = bench.CASES["bps"][0]()
+        obj.parsebytes(bench.bps_patch(commands = 12, readlen = 3))
+        self.assertEqual(len(obj.patchData), 12)
+
+class Suite(unittest.TestCase):
+    def test_run(self):
+        results = bench.run_suite(["xobj"], TINY, repeat = 1)
+        self.assertEqual(results["scale"], dict(bench.DEFAULT_SCALE, **TINY))
+        self.assertEqual(list(results["cases"].keys()), ["xobj"])
+        
+        case = results["cases"]["xobj"]
+        self.assertEqual(case["size"], len(bench.CASES["xobj"][1](results["scale"])))
+        self.assertEqual(sorted(case["operations"].keys()), sorted(bench.OPERATIONS))
+        for measured in case["operations"].values():
+            self.assertEqual(sorted(measured.keys()), ["files_per_s", "mbps", "median", "peak", "seconds"])
+            self.assertGreaterEqual(measured["median"], measured["seconds"])
+    
+    def test_compare(self):
+        def run(seconds):
+            return {"cases": {"bps": {"operations": {"load": {"seconds": seconds}}}}}
+        
+        self.assertEqual(bench.compare(run(1.05), run(1.0)), [])
+        self.assertEqual(bench.compare(run(1.2), run(1.0)), [("bps", "load", 1.0, 1.2)])
+        self.assertEqual(bench.compare(run(1.2), {"cases": {}}), [])
+
+class Command(unittest.TestCase):
+    def invoke(self, *args):
+        resp = cmd.parser.parse_args(["bench", "-c", "bps", "-r", "1", "--commands", "8", "--readlen", "2"] + list(args))
+        with self.assertLogs("bench", "INFO") as logs:
+            resp.func(resp)
+        return logs.output
+    
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outpath = os.path.join(tmpdir, "results.json")
+            output = self.invoke("-o", outpath)
+            self.assertEqual(len([line for line in output if "files/s" in line]), len(bench.OPERATIONS))
+            
+            with open(outpath) as fileobj:
+                results = json.load(fileobj)
+            self.assertEqual(results["scale"]["commands"], 8)
+            self.assertIn("bps", results["cases"])
+    
+    def test_regression(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            basepath = os.path.join(tmpdir, "baseline.json")
+            baseline = bench.run_suite(["bps"], {"commands": 8, "readlen": 2}, repeat = 1)
+            for measured in baseline["cases"]["bps"]["operations"].values():
+                measured["seconds"] = 0
+            
+            with open(basepath, "w") as fileobj:
+                json.dump(baseline, fileobj)
+            
+            with self.assertRaises(SystemExit):
+                self.invoke("--baseline", basepath)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Dynamic arguments must be found whether the schema could bind them or not."""
+import unittest
+
+from CodeModule import cmodel
+
+Name = cmodel.Blob("size")
+
+class Inner(cmodel.Struct):
+    name = Name
+    value = cmodel.U8
+    
+    __order__ = ["name", "value"]
+
+class Outer(cmodel.Struct):
+    size = cmodel.U8
+    inner = Inner
+    
+    __order__ = ["size", "inner"]
+
+class Flat(cmodel.Struct):
+    size = cmodel.U8
+    name = Name
+    
+    __order__ = ["size", "name"]
+
+class Table(cmodel.Struct):
+    size = cmodel.U8
+    count = cmodel.U8
+    entries = cmodel.Array(Inner, "count")
+    
+    __order__ = ["size", "count", "entries"]
+
+class Orphan(cmodel.Struct):
+    name = cmodel.Blob("missing")
+    
+    __order__ = ["name"]
+
+class Bindings(unittest.TestCase):
+    def test_bound(self):
+        Fixed = cmodel.Blob("size")
+        class Holder(cmodel.Struct):
+            size = cmodel.U8
+            wrapped = cmodel.Array(Fixed, 1)
+            
+            __order__ = ["size", "wrapped"]
+        
+        self.assertEqual(Fixed._CField__bindings["size"], (2, Holder, 0))
+        obj = Holder()
+        obj.parsebytes(b"\x02ab")
+        self.assertEqual(obj.core, (2, [b"ab"]))
+    
+    def test_nested(self):
+        obj = Outer()
+        self.assertEqual(obj.parsebytes(b"\x02ab\x05tail"), b"tail")
+        self.assertEqual(obj.inner.name, b"ab")
+        self.assertEqual(obj.inner.value, 5)
+        
+        name = obj.inner._CField__getslot(0)
+        self.assertEqual(name.get_dynamic_argument("size"), 2)
+        self.assertIs(name.find_argument_field("size"), obj._CField__getslot(0))
+        
+        obj.inner.name = b"xyz"
+        self.assertEqual(obj.size, 3)
+        self.assertEqual(obj.bytes, b"\x03xyz\x05")
+    
+    def test_shared_type(self):
+        #Name is used one level below its argument in Flat, but two in Outer
+        #and three in Table, so it has to search for it at runtime
+        self.assertIsNone(Name._CField__bindings["size"])
+        
+        flat = Flat()
+        flat.parsebytes(b"\x01a")
+        self.assertEqual(flat.name, b"a")
+        
+        table = Table()
+        table.parsebytes(b"\x01\x02a\x01b\x02")
+        self.assertEqual(table.core.entries, [(b"a", 1), (b"b", 2)])
+        table.parsebytes(b"\x02\x01ab\x01")
+        self.assertEqual(table.core.entries, [(b"ab", 1)])
+    
+    def test_missing(self):
+        self.assertRaises(AttributeError, Orphan().parsebytes, b"ab")
+
+if __name__ == "__main__":
+    unittest.main()
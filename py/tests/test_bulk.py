@@ -0,0 +1,98 @@
+"""Arrays built up in bulk must encode the same as arrays parsed from the same bytes."""
+import unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import rgbds
+
+import objects
+
+class Pair(cmodel.Struct):
+    left = cmodel.U8
+    right = cmodel.LeU16
+    
+    __order__ = ["left", "right"]
+
+class Pairs(cmodel.Struct):
+    count = cmodel.U8
+    pairs = cmodel.Array(Pair, "count")
+    
+    __order__ = ["count", "pairs"]
+
+class Sized(cmodel.Struct):
+    size = cmodel.U8
+    names = cmodel.Array(cmodel.String("ascii"), "size", cmodel.BytesCount)
+    
+    __order__ = ["size", "names"]
+
+class LazyPairs(cmodel.Struct):
+    count = cmodel.U8
+    pairs = cmodel.Array(Pair, "count", lazy = True)
+    
+    __order__ = ["count", "pairs"]
+
+class Extend(unittest.TestCase):
+    def test_values(self):
+        obj = Pairs()
+        obj.parsebytes(b"\x01\x01\x02\x00")
+        obj.pairs.extend([(3, 4), (5, 0x106)])
+        self.assertEqual(obj.count, 3)
+        self.assertEqual(obj.bytes, b"\x03\x01\x02\x00\x03\x04\x00\x05\x06\x01")
+        self.assertEqual(obj.bytelength, 10)
+    
+    def test_fields(self):
+        obj = Pairs()
+        obj.parsebytes(b"\x00")
+        pair = Pair()
+        pair.core = (7, 8)
+        obj.pairs.extend([pair, (9, 10)])
+        self.assertIs(list.__getitem__(obj.pairs, 0), pair)
+        self.assertIs(pair._CField__container, obj.pairs)
+        self.assertEqual(obj.core, (2, [(7, 8), (9, 10)]))
+    
+    def test_bad_value(self):
+        obj = Pairs()
+        obj.parsebytes(b"\x01\x01\x02\x00")
+        self.assertRaises(cmodel.CorruptedData, obj.pairs.extend, [(3, 4), (5,)])
+        self.assertEqual(obj.bytes, b"\x01\x01\x02\x00")
+    
+    def test_byte_count(self):
+        obj = Sized()
+        obj.parsebytes(b"\x02a\x00")
+        obj.names.append("bcd")
+        self.assertEqual(obj.size, 6)
+        obj.names.extend(["", "e"])
+        self.assertEqual(obj.bytes, b"\x09a\x00bcd\x00\x00e\x00")
+        del obj.names[1]
+        self.assertEqual(obj.bytes, b"\x05a\x00\x00e\x00")
+
+class CoreAssignment(unittest.TestCase):
+    def test_replace(self):
+        obj = Pairs()
+        obj.parsebytes(b"\x01\x01\x02\x00")
+        obj.pairs.core = [(i, i * 2) for i in range(100)]
+        self.assertEqual(obj.count, 100)
+        
+        again = Pairs()
+        again.parsebytes(obj.bytes)
+        self.assertEqual(again.core, obj.core)
+    
+    def test_lazy(self):
+        obj = LazyPairs()
+        obj.parsebytes(b"\x02\x01\x02\x00\x03\x04\x00")
+        obj.pairs.core = [(5, 6)]
+        self.assertEqual(obj.bytes, b"\x01\x05\x06\x00")
+    
+    def test_round_trip(self):
+        data = objects.rgb2(symbols = 12, sections = 4, patches = 3)
+        parsed = rgbds.Rgb2()
+        parsed.parsebytes(data)
+        
+        built = rgbds.Rgb2()
+        built.parsebytes(objects.rgb2(symbols = 0, sections = 0))
+        built.symbols.core = parsed.core.symbols
+        built.sections.core = parsed.core.sections
+        self.assertEqual((built.numsyms, built.numsects), (12, 4))
+        self.assertEqual(built.bytes, data)
+
+if __name__ == "__main__":
+    unittest.main()
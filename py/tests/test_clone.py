@@ -0,0 +1,89 @@
+"""Clones must be independent copies of the fields they were made from."""
+import copy, gc, unittest
+
+from CodeModule import cmodel
+
+class Entry(cmodel.Struct):
+    size = cmodel.LeU8
+    name = cmodel.Blob("size")
+    value = cmodel.LeU16
+    
+    __order__ = ["size", "name", "value"]
+
+class Table(cmodel.Struct):
+    count = cmodel.LeU8
+    entries = cmodel.Array(Entry, "count")
+    
+    __order__ = ["count", "entries"]
+
+class Pair(cmodel.Struct):
+    left = cmodel.U8
+    right = cmodel.U8
+    
+    __order__ = ["left", "right"]
+
+class Columns(cmodel.Struct):
+    count = cmodel.U8
+    values = cmodel.Array(cmodel.LeU16, "count")
+    size = cmodel.U8
+    pairs = cmodel.Array(Pair, "size", cmodel.BytesCount, columnar = True)
+    
+    __order__ = ["count", "values", "size", "pairs"]
+
+DATA = b"\x02\x02ab\x01\x00\x01c\x02\x00"
+
+class Clone(unittest.TestCase):
+    def parsed(self):
+        obj = Table()
+        obj.parsebytes(DATA)
+        obj.bytes
+        obj.core
+        return obj
+    
+    def test_independent(self):
+        obj = self.parsed()
+        twin = obj.clone()
+        list.__getitem__(twin.entries, 0).value = 7
+        twin.entries.append((3, b"xyz", 9))
+        self.assertEqual(obj.bytes, DATA)
+        self.assertEqual(obj.count, 2)
+        self.assertEqual(twin.count, 3)
+        self.assertEqual(twin.bytes, b"\x03\x02ab\x07\x00\x01c\x02\x00\x03xyz\x09\x00")
+    
+    def test_arrays_stay_tied(self):
+        obj = Columns()
+        obj.parsebytes(b"\x01\x05\x00\x02\x01\x02")
+        twin = obj.clone()
+        twin.values.append(6)
+        twin.pairs.append((3, 4))
+        self.assertEqual((twin.count, twin.size), (2, 4))
+        self.assertEqual(twin.bytes, b"\x02\x05\x00\x06\x00\x04\x01\x02\x03\x04")
+        self.assertEqual(obj.bytes, b"\x01\x05\x00\x02\x01\x02")
+    
+    def test_gc_state(self):
+        obj = self.parsed()
+        gc.disable()
+        try:
+            obj.clone()
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+    
+    def test_deepcopy_memo(self):
+        obj = self.parsed()
+        pair = copy.deepcopy([obj, obj])
+        self.assertIs(pair[0], pair[1])
+        self.assertIsNot(pair[0], obj)
+        self.assertEqual(pair[0].bytes, DATA)
+        
+        memo = {}
+        twin = copy.deepcopy(obj, memo)
+        self.assertIs(copy.deepcopy(obj, memo), twin)
+        
+        memo = {}
+        twin = obj.__deepcopy__(memo)
+        self.assertIs(memo[id(obj)], twin)
+        self.assertIs(obj.__deepcopy__(memo), twin)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Compiled schemas must keep running their compiled methods."""
+import io, sys, unittest
+
+from CodeModule import cmodel, bps
+from CodeModule.asm import rgbds, asmotor
+
+import objects
+
+GENERIC = {cmodel.Struct.parseview.__code__, cmodel.Struct.load.__code__,
+           cmodel.Struct.writeinto.__code__, cmodel.Struct.bytes.fget.__code__}
+
+def structs(field):
+    """Every Struct in a parsed tree."""
+    if isinstance(field, cmodel.Struct):
+        yield field
+        children = field._Struct__slots
+    elif isinstance(field, list):
+        children = list.__iter__(field)
+    else:
+        return
+    
+    for child in children:
+        if isinstance(child, cmodel.CField):
+            yield from structs(child)
+
+def called(func):
+    """Run func, and get the code objects of every Python function it called."""
+    codes = set()
+    def profile(frame, event, arg):
+        if event == "call":
+            codes.add(frame.f_code)
+    
+    sys.setprofile(profile)
+    try:
+        func()
+    finally:
+        sys.setprofile(None)
+    return codes
+
+class CompiledPath(unittest.TestCase):
+    def assertCompiled(self, obj):
+        for struct in structs(obj):
+            self.assertFalse(struct._Struct__generic)
+        
+        def encode():
+            obj.changed()
+            obj.bytes
+            obj.save(io.BytesIO())
+        
+        codes = called(encode)
+        self.assertFalse(codes & GENERIC)
+        self.assertTrue(any(code.co_filename.startswith("<compiled schema") for code in codes))
+    
+    def test_schemas(self):
+        for schema, data in ((rgbds.Rgb2, objects.rgb2()),
+                             (asmotor.XObj, objects.xobj()),
+                             (bps.BPSPatchStruct, objects.bps())):
+            obj = schema()
+            codes = called(lambda: obj.parsebytes(data))
+            self.assertFalse(codes & GENERIC)
+            self.assertCompiled(obj)
+            
+            obj = schema()
+            obj.load(io.BytesIO(data))
+            self.assertCompiled(obj)
+    
+    def test_after_edit(self):
+        obj = rgbds.Rgb2()
+        obj.parsebytes(objects.rgb2())
+        obj.symbols.append(obj.symbols[0])
+        list.__getitem__(obj.sections, 0).org = 5
+        self.assertEqual(obj.numsyms, 7)
+        self.assertCompiled(obj)
+    
+    def test_reload_after_promotion(self):
+        data = objects.rgb2()
+        obj = rgbds.Rgb2()
+        obj.parsebytes(data)
+        section = list.__getitem__(obj.sections, 0)
+        section._CField__getslot(2)
+        self.assertTrue(section._Struct__generic)
+        
+        obj.parsebytes(data)
+        self.assertCompiled(obj)
+        self.assertEqual(obj.bytes, data)
+    
+    def test_reload_after_projection(self):
+        data = objects.rgb2()
+        obj = rgbds.Rgb2()
+        obj.load(io.BytesIO(data), ["numsyms"])
+        self.assertTrue(obj._Struct__generic)
+        
+        obj.load(io.BytesIO(data))
+        self.assertCompiled(obj)
+        self.assertEqual(obj.bytes, data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Fields which depend on an outer field must follow it when it changes."""
+import io, struct, unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import asmotor
+
+class Inner(cmodel.Struct):
+    low = cmodel.BitRange("flags", 0, 3)
+    biased = cmodel.Bias("flags", 10)
+    opt = cmodel.If("flags", lambda flags: flags & 4 == 0, cmodel.U8)
+    
+    __order__ = ["low", "biased", "opt"]
+
+class Outer(cmodel.Struct):
+    flags = cmodel.U8
+    inner = Inner
+    
+    __order__ = ["flags", "inner"]
+
+class DependentCache(unittest.TestCase):
+    def parsed(self):
+        obj = Outer()
+        obj.parsebytes(b"\x03\x05")
+        #Fill every cache before changing the outer field
+        obj.core
+        obj.bytes
+        obj.bytelength
+        obj.inner.core
+        obj.inner.bytes
+        obj.inner.bytelength
+        return obj
+    
+    def test_inner_follows_outer(self):
+        obj = self.parsed()
+        self.assertEqual(obj.inner.low, 3)
+        self.assertEqual(obj.inner.opt, 5)
+        
+        obj.flags = 4
+        self.assertEqual(obj.inner.bytelength, 0)
+        self.assertEqual(obj.inner.low, 4)
+        self.assertEqual(obj.inner.biased, 14)
+        self.assertEqual(obj.inner.opt, None)
+        self.assertEqual(obj.inner.core, (4, 14, None))
+        self.assertEqual(obj.inner.bytes, b"")
+        self.assertEqual(obj.bytelength, 1)
+        self.assertEqual(obj.bytes, b"\x04")
+        self.assertEqual(obj.core, (4, (4, 14, None)))
+    
+    def test_outer_follows_inner(self):
+        obj = self.parsed()
+        obj.inner.low = 0
+        self.assertEqual(obj.flags, 0)
+        self.assertEqual(obj.inner.core, (0, 10, 5))
+        self.assertEqual(obj.bytes, b"\x00\x05")
+
+def xobj(groupid, typeid=0):
+    """An XObj with a BSS group, a group of typeid and one section in groupid."""
+    out = [b"XOB\x00", struct.pack("<I", 2)]
+    out.append(b"BSS\x00" + struct.pack("<I", 1))
+    out.append(b"CODE\x00" + struct.pack("<I", typeid))
+    out.append(struct.pack("<I", 1))
+    out.append(struct.pack("<i", groupid) + b"sect\x00" + struct.pack("<iiI", -1, -1, 0))
+    out.append(struct.pack("<I", 4))
+    if groupid == 1 and typeid == 0:
+        #The section's data, and no patches
+        out.append(b"\x01\x02\x03\x04" + struct.pack("<I", 0))
+    return b"".join(out)
+
+class CallableCondition(unittest.TestCase):
+    """XObj's section data depends on its group's type, through a callable If."""
+    def parsed(self):
+        obj = asmotor.XObj()
+        obj.parsebytes(xobj(1))
+        obj.bytes
+        obj.core
+        obj.bytelength
+        return obj
+    
+    def test_outer_field(self):
+        obj = self.parsed()
+        list.__getitem__(obj.groups, 1).typeid = asmotor.SectionGroup.GROUP_BSS
+        self.assertEqual(obj.bytes, xobj(1, 1))
+        self.assertEqual(obj.bytelength, len(xobj(1, 1)))
+        self.assertEqual(obj.core.sections[0].data, None)
+    
+    def test_own_field(self):
+        obj = self.parsed()
+        list.__getitem__(obj.sections, 0).groupid = 0
+        self.assertEqual(obj.bytelength, len(xobj(0)))
+        saved = io.BytesIO()
+        obj.save(saved)
+        self.assertEqual(saved.getvalue(), xobj(0))
+        self.assertEqual(obj.bytes, xobj(0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Struct and Union fields must be reachable as plain attributes."""
+import unittest
+
+from CodeModule import cmodel
+
+class Point(cmodel.Struct):
+    x = cmodel.LeU16
+    y = cmodel.LeU16
+    
+    __order__ = ["x", "y"]
+
+class Shape(cmodel.Union):
+    __tag__ = cmodel.Enum(cmodel.U8, "NONE", "WIDTH", "POINT")
+    WIDTH = cmodel.LeU16
+    POINT = Point
+
+class Wide(cmodel.Union):
+    __tag__ = cmodel.Enum(cmodel.U8, "BYTE", "WORD")
+    __reparse_on_retag__ = True
+    BYTE = cmodel.U8
+    WORD = cmodel.LeU16
+
+class Value(cmodel.Union):
+    __tagname__ = "kind"
+    __tag__ = cmodel.Enum(cmodel.U8, "BYTE", "WORD")
+    BYTE = cmodel.U8
+    WORD = cmodel.LeU16
+
+class Record(cmodel.Struct):
+    kind = cmodel.U8
+    value = Value
+    
+    __order__ = ["kind", "value"]
+
+class StructAccess(unittest.TestCase):
+    def test_get_set(self):
+        obj = Point()
+        obj.parsebytes(b"\x01\x00\x02\x00")
+        self.assertEqual((obj.x, obj.y), (1, 2))
+        obj.y = 5
+        self.assertEqual(obj.y, 5)
+        self.assertEqual(obj.bytes, b"\x01\x00\x05\x00")
+    
+    def test_set_from_field(self):
+        obj = Point()
+        obj.parsebytes(b"\x01\x00\x02\x00")
+        other = cmodel.LeU16()
+        other.core = 9
+        obj.x = other
+        self.assertEqual(obj.x, 9)
+        self.assertIsNot(obj._CField__getslot(0), other)
+    
+    def test_descriptors(self):
+        self.assertIsInstance(Point.x, cmodel._StructField)
+        self.assertRaises(AttributeError, getattr, Point(), "z")
+        
+        obj = Point()
+        with self.assertRaises(cmodel.CorruptedData):
+            del obj.x
+    
+    def test_nested(self):
+        obj = Shape()
+        obj.parsebytes(b"\x02\x01\x00\x02\x00")
+        obj.POINT.x = 3
+        self.assertEqual(obj.bytes, b"\x02\x03\x00\x02\x00")
+
+class UnionAccess(unittest.TestCase):
+    def test_named_member(self):
+        obj = Shape()
+        obj.parsebytes(b"\x01\x07\x00")
+        self.assertEqual(obj.__tag__, 1)
+        self.assertEqual(obj.WIDTH, 7)
+        self.assertEqual(obj.__tag__, 1)
+        
+        #Reading another member switches the tag to it
+        self.assertIsInstance(obj.POINT, Point)
+        self.assertEqual(obj.__tag__, 2)
+        self.assertEqual(obj.bytes, b"\x02\x00\x00\x00\x00")
+        
+        #and switching back restores the old contents
+        obj.WIDTH = obj.WIDTH
+        self.assertEqual(obj.bytes, b"\x01\x07\x00")
+    
+    def test_core(self):
+        obj = Shape()
+        obj.parsebytes(b"\x00")
+        obj.core = (1, 300)
+        self.assertEqual(obj.core, (1, 300))
+        self.assertEqual(obj.bytes, b"\x01\x2c\x01")
+        self.assertRaises(cmodel.PEBKAC, setattr, obj, "core", (1,))
+    
+    def test_reparse_on_retag(self):
+        obj = Wide()
+        obj.parsebytes(b"\x01\x05\x01")
+        obj.__tag__ = 0
+        self.assertEqual(obj.core, (0, 5))
+        self.assertEqual(obj.bytes, b"\x00\x05")
+    
+    def test_external_tag(self):
+        obj = Record()
+        obj.parsebytes(b"\x01\x34\x12")
+        self.assertEqual(obj.value.__tag__, 1)
+        self.assertEqual(obj.value.__contents__, 0x1234)
+        
+        #Retagging the union writes the struct's tag field
+        obj.value.BYTE = 4
+        self.assertEqual(obj.kind, 0)
+        self.assertEqual(obj.bytes, b"\x00\x04")
+        
+        #and writing the tag field retags the union
+        obj.kind = 1
+        self.assertEqual(obj.value.core, (1, 0x1234))
+
+if __name__ == "__main__":
+    unittest.main()
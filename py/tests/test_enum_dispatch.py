@@ -0,0 +1,81 @@
+"""Enums must only take their declared values, and Unions must keep fields across retags."""
+import unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import rgbds
+from CodeModule.exc import InvalidSchema
+
+Opcode = cmodel.Enum(cmodel.U8, "NOP", "LOAD", ("JUMP", 0x10), ("CALL", 0x11), ("GOTO", 0x10))
+
+class Instruction(cmodel.Union):
+    __tag__ = Opcode
+    LOAD = cmodel.LeU16
+    JUMP = cmodel.LeU32
+    CALL = cmodel.LeU32
+
+class EnumValues(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(Opcode.EXPORTEDVALUES, {"NOP": 0, "LOAD": 1, "JUMP": 0x10, "CALL": 0x11, "GOTO": 0x10})
+        self.assertEqual(Opcode.VALUENAMES, {0: "NOP", 1: "LOAD", 0x10: "JUMP", 0x11: "CALL"})
+    
+    def test_check(self):
+        field = Opcode()
+        field.core = 0x11
+        self.assertEqual(field.bytes, b"\x11")
+        self.assertRaises(cmodel.CorruptedData, setattr, field, "core", 2)
+        self.assertRaises(cmodel.CorruptedData, field.parsebytes, b"\x12")
+        self.assertRaises(cmodel.CorruptedData, Opcode.checkvalue, 0x0f)
+        self.assertEqual(Opcode.checkvalue(0x10), 0x10)
+    
+    def test_parse(self):
+        obj = Instruction()
+        self.assertRaises(cmodel.CorruptedData, obj.parsebytes, b"\x02\x00")
+        
+        expr = rgbds.Rgb2PatchExpr()
+        self.assertRaises(cmodel.CorruptedData, expr.parsebytes, b"\x7f")
+
+class UnionRetag(unittest.TestCase):
+    def test_shared_type(self):
+        obj = Instruction()
+        obj.parsebytes(b"\x10\x01\x02\x03\x04")
+        field = obj._Union__fieldstorage
+        
+        #JUMP and CALL are the same type, so retagging between them keeps the field
+        obj.__tag__ = 0x11
+        self.assertIs(obj._Union__fieldstorage, field)
+        self.assertEqual(obj.bytes, b"\x11\x01\x02\x03\x04")
+    
+    def test_retired_field(self):
+        obj = Instruction()
+        obj.parsebytes(b"\x10\x01\x02\x03\x04")
+        jump = obj._Union__fieldstorage
+        
+        obj.LOAD = 5
+        self.assertEqual(obj.bytes, b"\x01\x05\x00")
+        obj.__tag__ = 0x10
+        self.assertIs(obj._Union__fieldstorage, jump)
+        self.assertEqual(obj.core, (0x10, 0x04030201))
+        
+        obj.__tag__ = 1
+        self.assertEqual(obj.core, (1, 5))
+    
+    def test_aliases(self):
+        obj = Instruction()
+        obj.parsebytes(b"\x10\x01\x00\x00\x00")
+        self.assertEqual(obj.GOTO, 1)
+        
+        with self.assertRaises(InvalidSchema):
+            class Conflict(cmodel.Union):
+                __tag__ = Opcode
+                JUMP = cmodel.LeU32
+                GOTO = cmodel.LeU16
+    
+    def test_empty(self):
+        obj = Instruction()
+        obj.parsebytes(b"\x00")
+        self.assertEqual(obj.core, (0, None))
+        obj.__tag__ = 0x10
+        self.assertEqual(obj.bytes, b"\x10\x00\x00\x00\x00")
+
+if __name__ == "__main__":
+    unittest.main()
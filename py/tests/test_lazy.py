@@ -0,0 +1,107 @@
+"""Lazy arrays must find their elements without creating them."""
+import io, os, unittest
+
+from CodeModule import cmodel
+
+class Named(cmodel.Struct):
+    size = cmodel.LeU16
+    name = cmodel.Blob("size")
+    
+    __order__ = ["size", "name"]
+
+class Flagged(cmodel.Struct):
+    flag = cmodel.U8
+    extra = cmodel.If(lambda flagged: flagged._CField__container._CField__container.wide, cmodel.LeU16)
+    
+    __order__ = ["flag", "extra"]
+
+class Directory(cmodel.Struct):
+    count = cmodel.U8
+    names = cmodel.Array(Named, "count", lazy = True)
+    trailer = cmodel.U8
+    
+    __order__ = ["count", "names", "trailer"]
+
+class Flags(cmodel.Struct):
+    wide = cmodel.U8
+    count = cmodel.U8
+    flags = cmodel.Array(Flagged, "count", lazy = True)
+    
+    __order__ = ["wide", "count", "flags"]
+
+NAMES = [b"a", b"", b"x" * 300, b"bc"]
+DIRECTORY = bytes([len(NAMES)]) + b"".join(len(name).to_bytes(2, "little") + name for name in NAMES) + b"\x07"
+
+def piped(data):
+    """Get a file reading data out of a pipe."""
+    readfd, writefd = os.pipe()
+    os.write(writefd, data)
+    os.close(writefd)
+    return os.fdopen(readfd, "rb")
+
+class LazyBounds(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        created = self.created
+        def init(self, *args, **kwargs):
+            created.append(self)
+            cmodel.Struct.__init__(self, *args, **kwargs)
+        
+        Named.__init__ = init
+        Flagged.__init__ = init
+    
+    def tearDown(self):
+        del Named.__init__
+        del Flagged.__init__
+    
+    def check(self, obj):
+        self.assertEqual(self.created, [])
+        self.assertEqual(obj.trailer, 7)
+        self.assertEqual(obj.core.names[2].name, b"x" * 300)
+        self.assertEqual([named.name for named in obj.core.names], NAMES)
+        self.assertEqual(obj.bytes, DIRECTORY)
+    
+    def test_parse(self):
+        obj = Directory()
+        obj.parsebytes(DIRECTORY)
+        self.check(obj)
+    
+    def test_load(self):
+        obj = Directory()
+        obj.load(io.BytesIO(DIRECTORY))
+        self.check(obj)
+    
+    def test_load_from_pipe(self):
+        obj = Directory()
+        with piped(DIRECTORY) as fileobj:
+            obj.load(fileobj)
+            self.assertEqual(fileobj.read(), b"")
+        self.check(obj)
+    
+    def test_array_load_from_pipe(self):
+        obj = Directory()
+        obj.parsebytes(b"\x02\x02\x00yz\x00\x00\x07")
+        with piped(DIRECTORY[1:]) as fileobj:
+            obj.names.load(fileobj)
+        self.assertEqual(self.created, [])
+        self.assertEqual(obj.count, 2)
+        self.assertEqual([named.name for named in obj.core.names], NAMES[:2])
+    
+    def test_truncated(self):
+        for data in (DIRECTORY[:100], DIRECTORY[:-4]):
+            self.assertRaises(cmodel.CorruptedData, Directory().parsebytes, data)
+            self.assertRaises(cmodel.CorruptedData, Directory().load, io.BytesIO(data))
+    
+    def test_callable_condition(self):
+        for wide, data in ((1, b"\x01\x02\x00\x03\x00\x01\x05\x00"), (0, b"\x00\x02\x00\x01")):
+            obj = Flags()
+            obj.load(io.BytesIO(data))
+            self.assertEqual(self.created, [])
+            self.assertEqual(len(obj.flags), 2)
+            self.assertEqual(obj.core.flags[1].flag, 1)
+            self.assertEqual(obj.core.flags[1].extra, 5 if wide else None)
+            self.assertEqual(obj.bytes, data)
+            del self.created[:]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Blobs parsed out of a mapping must still behave like bytes."""
+import mmap, os, tempfile, unittest
+
+from CodeModule import cmodel
+
+class Chunk(cmodel.Struct):
+    size = cmodel.LeU16
+    data = cmodel.Blob("size")
+    tail = cmodel.Blob(2)
+    
+    __order__ = ["size", "data", "tail"]
+
+DATA = b"\x03\x00abcxy"
+
+class MappedBlob(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fileobj:
+            fileobj.write(DATA)
+    
+    def tearDown(self):
+        os.unlink(self.path)
+    
+    def mapped(self):
+        with open(self.path, "rb") as fileobj:
+            return mmap.mmap(fileobj.fileno(), 0, access = mmap.ACCESS_READ)
+    
+    def test_bytes(self):
+        mapping = self.mapped()
+        obj = Chunk.from_mmap(mapping)
+        self.assertIs(type(obj.data), bytes)
+        self.assertIs(type(obj.core.tail), bytes)
+        self.assertEqual(obj.core, (3, b"abc", b"xy"))
+        self.assertEqual(obj.bytes, DATA)
+        
+        #Nothing references the mapping any more
+        mapping.close()
+        self.assertEqual(obj.bytes, DATA)
+    
+    def test_unread_blob_pins_mapping(self):
+        mapping = self.mapped()
+        obj = Chunk.from_mmap(mapping)
+        self.assertRaises(BufferError, mapping.close)
+        
+        obj.data
+        obj.tail
+        mapping.close()
+        self.assertEqual(obj.core, (3, b"abc", b"xy"))
+    
+    def test_clone(self):
+        obj = Chunk.load_path(self.path)
+        twin = obj.clone()
+        self.assertEqual(obj.data, b"abc")
+        self.assertEqual(twin.data, b"abc")
+        self.assertEqual(twin.bytes, DATA)
+
+if __name__ == "__main__":
+    unittest.main()
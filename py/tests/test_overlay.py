@@ -0,0 +1,55 @@
+"""Overlays must read and write BitStructs as bit fields, not bare words."""
+import unittest
+
+from CodeModule import cmodel, bps
+from CodeModule.exc import PEBKAC
+
+class FixedCommand(cmodel.BitStruct):
+    """bps.PatchCommand's bit ranges, stored in a fixed-size word."""
+    __storage__ = cmodel.LeU16
+    action = (0, 2)
+    length = (2, 8)
+    
+    __order__ = ["action", "length"]
+
+class Header(cmodel.Struct):
+    tag = cmodel.U8
+    command = FixedCommand
+    
+    __order__ = ["tag", "command"]
+
+class PatchHeader(cmodel.Struct):
+    command = bps.PatchCommand
+    
+    __order__ = ["command"]
+
+class BitStructOverlay(unittest.TestCase):
+    def test_read(self):
+        buf = bytearray(b"\x01\x0d\x00")
+        overlay = Header.overlay(buf)
+        self.assertEqual(overlay.command.action, 1)
+        self.assertEqual(overlay.command.length, 3)
+        self.assertEqual(overlay.command.core, (1, 3))
+        self.assertEqual(overlay.core, Header.from_mmap(buf).core)
+    
+    def test_write_range(self):
+        buf = bytearray(b"\x01\x0d\x00")
+        overlay = Header.overlay(buf)
+        overlay.command.length = 0x3f
+        self.assertEqual(buf, b"\x01\xfd\x00")
+        self.assertRaises(cmodel.CorruptedData, setattr, overlay.command, "length", 0x40)
+        self.assertEqual(buf, b"\x01\xfd\x00")
+    
+    def test_write_whole(self):
+        buf = bytearray(3)
+        overlay = Header.overlay(buf)
+        overlay.command = (2, 5)
+        self.assertEqual(buf, b"\x00\x16\x00")
+        self.assertRaises(cmodel.CorruptedData, setattr, overlay, "command", (4, 0))
+    
+    def test_varint_command(self):
+        #PatchCommand is stored as a varint, so it has no fixed place to overlay
+        self.assertRaises(PEBKAC, PatchHeader.overlay, bytearray(b"\x85"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Parsing out of a buffer must give the same fields, and the same leftovers, as parsing a copy."""
+import unittest
+
+from CodeModule import cmodel, bps
+from CodeModule.asm import rgbds, asmotor
+
+import objects
+
+class Named(cmodel.Struct):
+    name = cmodel.String("ascii")
+    value = cmodel.LeU16
+    
+    __order__ = ["name", "value"]
+
+class Chunk(cmodel.Struct):
+    size = cmodel.U8
+    names = cmodel.Array(Named, "size", cmodel.BytesCount)
+    
+    __order__ = ["size", "names"]
+
+class Tagged(cmodel.Union):
+    __tag__ = cmodel.Enum(cmodel.U8, "NONE", "SHORT")
+    NONE = cmodel.EmptyField
+    SHORT = cmodel.LeU16
+
+class ParseView(unittest.TestCase):
+    def test_remainder(self):
+        obj = Named()
+        self.assertEqual(obj.parsebytes(b"ab\x00\x01\x02xyz"), b"xyz")
+        self.assertEqual(obj.core, ("ab", 0x201))
+        self.assertEqual(obj.parsebytes(b"\x00\x01\x02"), b"")
+    
+    def test_offsets(self):
+        data = bytearray(b"junkab\x00\x01\x02cd\x00\x03\x04")
+        view = memoryview(data)
+        obj = Named()
+        self.assertEqual(obj.parseview(view, 4), 9)
+        self.assertEqual(obj.core, ("ab", 0x201))
+        self.assertEqual(obj.parseview(view, 9), 14)
+        self.assertEqual(obj.core, ("cd", 0x403))
+        
+        #Nothing parsed refers back to the buffer
+        data[9:11] = b"zz"
+        self.assertEqual(obj.core, ("cd", 0x403))
+    
+    def test_long_string(self):
+        name = "x" * 1000
+        obj = Named()
+        obj.parsebytes(name.encode("ascii") + b"\x00\x05\x00")
+        self.assertEqual(obj.core, (name, 5))
+        self.assertRaises(cmodel.CorruptedData, obj.parsebytes, name.encode("ascii"))
+    
+    def test_byte_counted_bounds(self):
+        obj = Chunk()
+        obj.parsebytes(b"\x08a\x00\x01\x00b\x00\x02\x00")
+        self.assertEqual(obj.core.names, [("a", 1), ("b", 2)])
+        
+        #The second name runs past the array, into the bytes after it
+        self.assertRaises(cmodel.CorruptedData, obj.parsebytes, b"\x07a\x00\x01\x00b\x00\x02\x00")
+    
+    def test_empty_union_member(self):
+        obj = Tagged()
+        self.assertEqual(obj.parsebytes(b"\x00\x05"), b"\x05")
+        self.assertEqual(obj.core[1], None)
+        self.assertEqual(obj.bytes, b"\x00")
+        self.assertEqual(obj.parsebytes(b"\x01\x05\x00"), b"")
+        self.assertEqual(obj.core[1], 5)
+    
+    def test_round_trip(self):
+        #BPS patches run to the end of the data, so they can't have a tail
+        for schema, data, tail in ((rgbds.Rgb2, objects.rgb2(), b"tail"),
+                                   (asmotor.XObj, objects.xobj(), b"tail"),
+                                   (bps.BPSPatchStruct, objects.bps(), b"")):
+            obj = schema()
+            self.assertEqual(obj.parsebytes(data + tail), tail)
+            self.assertEqual(obj.bytes, data)
+            
+            fromview = schema()
+            self.assertEqual(fromview.parseview(memoryview(b"head" + data), 4), len(data) + 4)
+            self.assertEqual(fromview.core, obj.core)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Projected loads must load the fields asked for and skip the rest."""
+import io, unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import rgbds
+from CodeModule.exc import PEBKAC
+
+import objects
+
+class ReadCountingIO(io.BytesIO):
+    """BytesIO which counts the bytes read out of it."""
+    def __init__(self, *args, **kwargs):
+        super(ReadCountingIO, self).__init__(*args, **kwargs)
+        self.consumed = 0
+    
+    def read(self, *args):
+        data = super(ReadCountingIO, self).read(*args)
+        self.consumed += len(data)
+        return data
+
+class Record(cmodel.Struct):
+    size = cmodel.LeU32
+    payload = cmodel.Blob("size")
+    value = cmodel.U8
+    
+    __order__ = ["size", "payload", "value"]
+
+class File(cmodel.Struct):
+    count = cmodel.U8
+    records = cmodel.Array(Record, "count")
+    
+    __order__ = ["count", "records"]
+
+def record(size, value):
+    return size.to_bytes(4, "little") + bytes(size) + bytes((value,))
+
+class Projection(unittest.TestCase):
+    def test_paths(self):
+        self.assertEqual(cmodel._projection(None), None)
+        self.assertEqual(cmodel._projection("symbols"), {"symbols": None})
+        self.assertEqual(cmodel._projection(["sections.org", "sections.bank", "symbols"]),
+                         {"sections": {"org": None, "bank": None}, "symbols": None})
+        self.assertEqual(cmodel._projection(["sections", "sections.org"]), {"sections": None})
+    
+    def test_skip(self):
+        RECORDS = [(700000, 1), (3, 2), (1000000, 3)]
+        data = bytes((len(RECORDS),)) + b"".join(record(*fields) for fields in RECORDS)
+        fileobj = ReadCountingIO(data + b"tail")
+        obj = File()
+        obj.load(fileobj, ["records.value"])
+        self.assertEqual([item.value for item in obj.records], [1, 2, 3])
+        self.assertEqual([item.size for item in obj.records], [700000, 3, 1000000])
+        self.assertEqual(fileobj.read(), b"tail")
+        
+        #Payloads were seeked over; only the read-ahead of each chunk is read
+        self.assertLess(fileobj.consumed, 4 * cmodel.ReadBuffer.CHUNKSIZE)
+    
+    def test_partial(self):
+        obj = File()
+        obj.load(io.BytesIO(b"\x01" + record(2, 9)), ["records.value"])
+        self.assertRaises(PEBKAC, getattr, obj, "bytes")
+        self.assertRaises(PEBKAC, obj.save, io.BytesIO())
+        self.assertRaises(PEBKAC, getattr, obj, "bytelength")
+        
+        #A full load makes it whole again
+        obj.load(io.BytesIO(b"\x01" + record(2, 9)))
+        self.assertEqual(obj.bytes, b"\x01" + record(2, 9))
+    
+    def test_rgb2(self):
+        data = objects.rgb2(symbols = 9, sections = 4, patches = 3)
+        full = rgbds.Rgb2()
+        full.parsebytes(data)
+        
+        fileobj = io.BytesIO(data + b"tail")
+        obj = rgbds.Rgb2()
+        obj.load(fileobj, ["symbols", "sections.org", "sections.bank", "sections.datasize"])
+        self.assertEqual(fileobj.read(), b"tail")
+        self.assertEqual(obj.core.symbols, full.core.symbols)
+        self.assertEqual([(section.org, section.bank, section.datasize) for section in obj.sections],
+                         [(section.org, section.bank, section.datasize) for section in full.sections])
+        self.assertRaises(PEBKAC, getattr, obj, "bytes")
+
+if __name__ == "__main__":
+    unittest.main()
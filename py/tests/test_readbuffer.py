@@ -0,0 +1,87 @@
+"""Loading from a file must read it in chunks and leave it just past the loaded data."""
+import io, unittest
+
+from CodeModule import cmodel
+from CodeModule.asm import rgbds
+
+import objects
+
+class CountingIO(io.BytesIO):
+    """BytesIO which counts calls to read."""
+    def __init__(self, *args, **kwargs):
+        super(CountingIO, self).__init__(*args, **kwargs)
+        self.reads = 0
+    
+    def read(self, *args):
+        self.reads += 1
+        return super(CountingIO, self).read(*args)
+
+class Named(cmodel.Struct):
+    name = cmodel.String("ascii")
+    value = cmodel.LeU16
+    
+    __order__ = ["name", "value"]
+
+class Buffer(unittest.TestCase):
+    def test_read(self):
+        buf = cmodel.ReadBuffer(io.BytesIO(b"abcdef"))
+        self.assertEqual(buf.read(2), b"ab")
+        self.assertEqual(buf.peek(2), b"cd")
+        self.assertEqual(buf.tell(), 2)
+        self.assertEqual(buf.read(10), b"cdef")
+        self.assertEqual(buf.read(1), b"")
+    
+    def test_read_until(self):
+        buf = cmodel.ReadBuffer(io.BytesIO(b"ab\x00\x00cd"))
+        self.assertEqual(buf.read_until(), b"ab")
+        self.assertEqual(buf.read_until(), b"")
+        self.assertEqual(buf.tell(), 4)
+        self.assertRaises(cmodel.CorruptedData, buf.read_until)
+    
+    def test_read_until_chunks(self):
+        buf = cmodel.ReadBuffer(io.BytesIO(b"x" * 10 + b"\r\nrest"))
+        buf.CHUNKSIZE = 4
+        self.assertEqual(buf.read_until(b"\r\n"), b"x" * 10)
+        self.assertEqual(buf.read(), b"rest")
+    
+    def test_seek(self):
+        fileobj = io.BytesIO(b"0123456789")
+        fileobj.seek(2)
+        buf = cmodel.ReadBuffer(fileobj)
+        self.assertEqual(buf.read(3), b"234")
+        self.assertEqual(buf.seek(-1, io.SEEK_CUR), 4)
+        self.assertEqual(buf.read(1), b"4")
+        self.assertEqual(buf.seek(-2, io.SEEK_END), 8)
+        self.assertEqual(buf.read(), b"89")
+        self.assertEqual(buf.seek(0), 0)
+        self.assertEqual(buf.remaining, 10)
+    
+    def test_release(self):
+        fileobj = io.BytesIO(b"0123456789")
+        buf = cmodel.ReadBuffer(fileobj)
+        buf.read(3)
+        self.assertIs(buf.release(), fileobj)
+        self.assertEqual(fileobj.tell(), 3)
+
+class Load(unittest.TestCase):
+    def test_position(self):
+        fileobj = io.BytesIO(b"ab\x00\x01\x02tail")
+        obj = Named()
+        obj.load(fileobj)
+        self.assertEqual(obj.core, ("ab", 0x201))
+        self.assertEqual(fileobj.read(), b"tail")
+    
+    def test_truncated(self):
+        self.assertRaises(cmodel.CorruptedData, Named().load, io.BytesIO(b"ab"))
+    
+    def test_few_reads(self):
+        data = objects.rgb2(symbols = 60)
+        fileobj = CountingIO(data + b"tail")
+        obj = rgbds.Rgb2()
+        obj.load(fileobj)
+        self.assertEqual(obj.bytes, data)
+        self.assertEqual(fileobj.read(), b"tail")
+        self.assertLess(fileobj.reads, 10)
+
+if __name__ == "__main__":
+    unittest.main()
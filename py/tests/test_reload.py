@@ -0,0 +1,66 @@
+"""Loading a field which is already in a container must update the container."""
+import io, unittest
+
+from CodeModule import cmodel
+
+class Pair(cmodel.Struct):
+    left = cmodel.LeU16
+    right = cmodel.LeU16
+    
+    __order__ = ["left", "right"]
+
+class Holder(cmodel.Struct):
+    count = cmodel.LeU16
+    items = cmodel.Array(cmodel.LeU16, "count")
+    pairs = cmodel.Array(Pair, "count")
+    rows = cmodel.Array(Pair, "count", columnar = True)
+    name = cmodel.String("ascii")
+    
+    __order__ = ["count", "items", "pairs", "rows", "name"]
+
+DATA = b"\x02\x00" + b"\x01\x00\x02\x00" + b"\x03\x00\x04\x00\x05\x00\x06\x00" + b"\x07\x00\x08\x00\x09\x00\x0a\x00" + b"ab\x00"
+
+class ReloadChild(unittest.TestCase):
+    def parsed(self):
+        obj = Holder()
+        obj.parsebytes(DATA)
+        #Fill every cache before reloading
+        obj.bytes
+        obj.core
+        obj.bytelength
+        return obj
+    
+    def assertReloaded(self, obj, expected):
+        self.assertEqual(obj.bytes, expected)
+        self.assertEqual(obj.bytelength, len(expected))
+        reparsed = Holder()
+        reparsed.parsebytes(expected)
+        self.assertEqual(obj.core, reparsed.core)
+    
+    def test_typed_array(self):
+        obj = self.parsed()
+        obj.items.load(io.BytesIO(b"\x11\x00\x12\x00"))
+        self.assertReloaded(obj, DATA.replace(b"\x01\x00\x02\x00", b"\x11\x00\x12\x00"))
+    
+    def test_list_array(self):
+        obj = self.parsed()
+        obj.pairs.load(io.BytesIO(b"\x13\x00\x14\x00\x15\x00\x16\x00"))
+        self.assertReloaded(obj, DATA.replace(b"\x03\x00\x04\x00\x05\x00\x06\x00", b"\x13\x00\x14\x00\x15\x00\x16\x00"))
+    
+    def test_columnar_array(self):
+        obj = self.parsed()
+        obj.rows.load(io.BytesIO(b"\x17\x00\x18\x00\x19\x00\x1a\x00"))
+        self.assertReloaded(obj, DATA.replace(b"\x07\x00\x08\x00\x09\x00\x0a\x00", b"\x17\x00\x18\x00\x19\x00\x1a\x00"))
+    
+    def test_string(self):
+        obj = self.parsed()
+        obj._CField__getslot(4).load(io.BytesIO(b"longer\x00"))
+        self.assertReloaded(obj, DATA.replace(b"ab\x00", b"longer\x00"))
+    
+    def test_parsebytes(self):
+        obj = self.parsed()
+        obj.pairs.parsebytes(b"\x13\x00\x14\x00\x15\x00\x16\x00")
+        self.assertReloaded(obj, DATA.replace(b"\x03\x00\x04\x00\x05\x00\x06\x00", b"\x13\x00\x14\x00\x15\x00\x16\x00"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Saving must write the same bytes as bytes gives, in a single write."""
+import io, unittest
+
+from CodeModule import cmodel, bps
+from CodeModule.asm import rgbds, asmotor
+
+import objects
+
+class WriteCountingIO(io.BytesIO):
+    """BytesIO which counts calls to write."""
+    def __init__(self, *args, **kwargs):
+        super(WriteCountingIO, self).__init__(*args, **kwargs)
+        self.writes = 0
+    
+    def write(self, data):
+        self.writes += 1
+        return super(WriteCountingIO, self).write(data)
+
+class Point(cmodel.Struct):
+    x = cmodel.LeU16
+    y = cmodel.U8
+    label = cmodel.Blob(3)
+    
+    __order__ = ["x", "y", "label"]
+
+class Named(cmodel.Struct):
+    size = cmodel.U8
+    name = cmodel.Blob("size")
+    points = cmodel.Array(Point, 2)
+    
+    __order__ = ["size", "name", "points"]
+
+NAMED = b"\x02ab\x01\x00\x02abc\x03\x00\x04def"
+
+def saved(obj):
+    fileobj = WriteCountingIO()
+    obj.save(fileobj)
+    return (fileobj.getvalue(), fileobj.writes)
+
+class Save(unittest.TestCase):
+    def test_static(self):
+        obj = Point()
+        obj.parsebytes(b"\x01\x00\x02abc")
+        obj.y = 7
+        self.assertEqual(saved(obj), (b"\x01\x00\x07abc", 1))
+    
+    def test_known_size(self):
+        obj = Named()
+        obj.parsebytes(NAMED)
+        obj.bytelength
+        obj.points[1] = (5, 6, b"ghi")
+        self.assertIsNotNone(obj._CField__size)
+        self.assertEqual(saved(obj), (b"\x02ab\x01\x00\x02abc\x05\x00\x06ghi", 1))
+        
+        #Resizing the Blob changes its size argument, so the size is forgotten
+        obj.name = b"xyz"
+        self.assertIsNone(obj._CField__size)
+        self.assertEqual(saved(obj), (b"\x03xyz\x01\x00\x02abc\x05\x00\x06ghi", 1))
+    
+    def test_writeinto(self):
+        obj = Named()
+        obj.parsebytes(NAMED)
+        buf = bytearray(b"--" + bytes(len(NAMED)) + b"--")
+        self.assertEqual(obj.writeinto(buf, 2), len(NAMED) + 2)
+        self.assertEqual(buf, b"--" + NAMED + b"--")
+    
+    def test_round_trip(self):
+        for schema, data in ((rgbds.Rgb2, objects.rgb2(symbols = 9, sections = 4)),
+                             (asmotor.XObj, objects.xobj(symbols = 3, sections = 3)),
+                             (bps.BPSPatchStruct, objects.bps())):
+            obj = schema()
+            obj.parsebytes(data)
+            self.assertEqual(saved(obj), (data, 1))
+            
+            obj = schema()
+            obj.load(io.BytesIO(data))
+            obj.bytelength
+            self.assertEqual(saved(obj), (data, 1))
+    
+    def test_mutated(self):
+        obj = rgbds.Rgb2()
+        obj.parsebytes(objects.rgb2(symbols = 9, sections = 4))
+        obj.bytelength
+        list.__getitem__(obj.symbols, 0).name = "a much longer symbol name"
+        list.__getitem__(obj.sections, 0).org = 0x100
+        obj.symbols.append(("new", 1, None))
+        
+        (data, writes) = saved(obj)
+        self.assertEqual(writes, 1)
+        self.assertEqual(data, obj.bytes)
+        
+        again = rgbds.Rgb2()
+        again.parsebytes(data)
+        self.assertEqual(again.core, obj.core)
+
+if __name__ == "__main__":
+    unittest.main()
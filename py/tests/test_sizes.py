@@ -0,0 +1,43 @@
+"""Containers must keep track of their encoded size as their fields change."""
+import unittest
+
+from CodeModule import cmodel
+
+class Point(cmodel.Struct):
+    x = cmodel.U8
+    label = cmodel.Blob(2)
+    
+    __order__ = ["x", "label"]
+
+class Points(cmodel.Struct):
+    count = cmodel.U8
+    points = cmodel.Array(Point, "count")
+    
+    __order__ = ["count", "points"]
+
+class Names(cmodel.Struct):
+    size = cmodel.LeU16
+    names = cmodel.Array(cmodel.String("ascii"), "size", cmodel.BytesCount)
+    
+    __order__ = ["size", "names"]
+
+class TrackedSize(unittest.TestCase):
+    def test_fixed_blob(self):
+        obj = Points()
+        obj.parsebytes(b"\x02\x01ab\x02cd")
+        obj.bytelength
+        obj.points[1] = (3, b"ef")
+        self.assertEqual(obj._CField__size, 7)
+        self.assertEqual(obj.bytes, b"\x02\x01ab\x03ef")
+    
+    def test_byte_counted(self):
+        obj = Names()
+        obj.parsebytes(b"\x04\x00ab\x00\x00")
+        obj.bytelength
+        list.__getitem__(obj.names, 0).core = "abcd"
+        self.assertEqual(obj._CField__size, 8)
+        self.assertEqual(obj.size, 6)
+        self.assertEqual(obj.bytes, b"\x06\x00abcd\x00\x00")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Structs must keep primitive fields as bare values until a field object is asked for."""
+import unittest
+
+from CodeModule import cmodel
+
+class Header(cmodel.Struct):
+    magic = cmodel.Magic(b"HD")
+    kind = cmodel.Enum(cmodel.U8, "SMALL", "LARGE")
+    name = cmodel.String("ascii")
+    size = cmodel.LeU16
+    data = cmodel.Blob("size")
+    
+    __order__ = ["magic", "kind", "name", "size", "data"]
+
+DATA = b"HD\x01abc\x00\x02\x00xy"
+
+class Slots(unittest.TestCase):
+    def parsed(self):
+        obj = Header()
+        obj.parsebytes(DATA)
+        return obj
+    
+    def test_bare_values(self):
+        obj = self.parsed()
+        slots = obj._Struct__slots
+        self.assertEqual(slots[:4], [b"HD", 1, "abc", 2])
+        self.assertIsInstance(slots[4], cmodel.CField)
+        self.assertEqual(obj.core, (b"HD", 1, "abc", 2, b"xy"))
+    
+    def test_set_value(self):
+        obj = self.parsed()
+        obj.name = "abcdef"
+        obj.kind = 0
+        self.assertEqual(obj._Struct__slots[2], "abcdef")
+        self.assertEqual(obj.bytes, b"HD\x00abcdef\x00\x02\x00xy")
+        self.assertEqual(obj.bytelength, len(obj.bytes))
+    
+    def test_bad_value(self):
+        obj = self.parsed()
+        with self.assertRaises(cmodel.CorruptedData):
+            obj.kind = 5
+        self.assertEqual(obj.bytes, DATA)
+    
+    def test_promoted_field(self):
+        obj = self.parsed()
+        size = obj._CField__getslot(4).find_argument_field("size")
+        self.assertIsInstance(size, cmodel.CField)
+        self.assertIs(obj._Struct__slots[3], size)
+        self.assertEqual(obj.size, 2)
+        
+        obj.data = b"wxyz"
+        self.assertEqual(size.core, 4)
+        self.assertEqual(obj.bytes, b"HD\x01abc\x00\x04\x00wxyz")
+        
+        #Parsing again puts the value back in its slot
+        obj.parsebytes(DATA)
+        self.assertEqual(obj._Struct__slots[3], 2)
+        self.assertEqual(obj.bytes, DATA)
+    
+    def test_dynamic_argument(self):
+        obj = self.parsed()
+        data = obj._CField__getslot(4)
+        self.assertEqual(data.get_dynamic_argument("size"), 2)
+        data.set_dynamic_argument("size", 3)
+        #Looking arguments up doesn't create their fields
+        self.assertEqual(obj._Struct__slots[3], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Fixed layouts must know their size up front, and fixed-stride arrays must read single records."""
+import io, unittest
+
+from CodeModule import cmodel
+
+class Stats(cmodel.Struct):
+    hp = cmodel.LeU16
+    attack = cmodel.U8
+    defense = cmodel.U8
+    
+    __order__ = ["hp", "attack", "defense"]
+
+class Named(cmodel.Struct):
+    size = cmodel.U8
+    name = cmodel.Blob("size")
+    
+    __order__ = ["size", "name"]
+
+class Either(cmodel.Union):
+    __tag__ = cmodel.Enum(cmodel.U8, "WORD", "PAIR")
+    WORD = cmodel.LeU16
+    PAIR = cmodel.Array(cmodel.U8, 2)
+
+class Table(cmodel.Struct):
+    count = cmodel.U8
+    stats = cmodel.Array(Stats, "count")
+    
+    __order__ = ["count", "stats"]
+
+StatTable = cmodel.Array(Stats, 3)
+Names = cmodel.Array(Named, 2)
+
+def stats(index):
+    return bytes((index, 0, index + 10, index + 20))
+
+TABLE = b"".join(stats(index) for index in range(3))
+
+class StaticSize(unittest.TestCase):
+    def test_schemas(self):
+        self.assertEqual(Stats.STATICSIZE, 4)
+        self.assertEqual(StatTable.STATICSIZE, 12)
+        self.assertEqual(cmodel.Array(cmodel.U8, 6, cmodel.BytesCount).STATICSIZE, 6)
+        self.assertEqual(Either.STATICSIZE, 3)
+        self.assertIsNone(Named.STATICSIZE)
+        self.assertIsNone(Names.STATICSIZE)
+        self.assertIsNone(Table.STATICSIZE)
+    
+    def test_bytelength(self):
+        obj = Named()
+        obj.parsebytes(b"\x03abc")
+        self.assertEqual(obj.bytelength, 4)
+        self.assertEqual(obj._CField__getslot(1).bytelength, 3)
+        
+        table = Table()
+        table.parsebytes(b"\x03" + TABLE)
+        self.assertEqual(table.stats.bytelength, 12)
+        self.assertEqual(table.bytelength, 13)
+        
+        table.stats.append((1, 2, 3))
+        self.assertEqual(table.bytelength, 17)
+        self.assertEqual(table.bytelength, len(table.bytes))
+
+class RecordAccess(unittest.TestCase):
+    def test_buffer(self):
+        table = StatTable()
+        data = b"head" + TABLE
+        for index in range(3):
+            record = table.record_at(data, index, 4)
+            self.assertEqual(record.core, (index, index + 10, index + 20))
+        self.assertEqual(len(table), 0)
+    
+    def test_file(self):
+        table = StatTable()
+        fileobj = io.BytesIO(b"head" + TABLE + b"tail")
+        table.seek_to(fileobj, 2, 4)
+        self.assertEqual(fileobj.tell(), 12)
+        
+        self.assertEqual(table.record_at(fileobj, 1, 4).hp, 1)
+        self.assertEqual(fileobj.tell(), 12)
+    
+    def test_dynamic_count(self):
+        table = Table()
+        table.parsebytes(b"\x00")
+        self.assertEqual(table.stats.record_at(TABLE, 2).defense, 22)
+        self.assertRaises(cmodel.CorruptedData, table.stats.record_at, TABLE, 3)
+    
+    def test_bounds(self):
+        table = StatTable()
+        self.assertRaises(IndexError, table.record_at, TABLE, 3)
+        self.assertRaises(IndexError, table.record_at, TABLE, -1)
+        self.assertRaises(cmodel.CorruptedData, table.record_at, TABLE[:10], 2)
+        self.assertRaises(cmodel.PEBKAC, Names().record_at, b"\x00\x00", 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Values which don't fit their field must fail encoding with CorruptedData."""
+import io, unittest
+
+from CodeModule import cmodel
+
+class Flags(cmodel.BitStruct):
+    __storage__ = cmodel.LeU16
+    low = (0, 8)
+    high = (8, 16)
+    
+    __order__ = ["low", "high"]
+
+class Record(cmodel.Struct):
+    count = cmodel.LeU16
+    flags = Flags
+    
+    __order__ = ["count", "flags"]
+
+class OutOfRange(unittest.TestCase):
+    def overflowed(self, promote):
+        obj = Record()
+        obj.parsebytes(b"\x01\x00\x02\x03")
+        if promote:
+            #Turning a bare value into a field takes the generic path
+            obj._CField__getslot(0)
+        obj.flags.structvalue = 0x10000
+        return obj
+    
+    def assertCorrupted(self, obj):
+        self.assertRaises(cmodel.CorruptedData, getattr, obj, "bytes")
+        self.assertRaises(cmodel.CorruptedData, obj.writeinto, bytearray(4), 0)
+        self.assertRaises(cmodel.CorruptedData, obj.save, io.BytesIO())
+    
+    def test_compiled(self):
+        self.assertCorrupted(self.overflowed(False))
+    
+    def test_generic(self):
+        self.assertCorrupted(self.overflowed(True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Overlays must read fields straight out of a buffer and write them straight back."""
+import mmap, unittest
+
+from CodeModule import cmodel
+from CodeModule.exc import PEBKAC
+
+class Point(cmodel.Struct):
+    x = cmodel.LeU16
+    y = cmodel.BeU16
+    
+    __order__ = ["x", "y"]
+
+class Entry(cmodel.Struct):
+    kind = cmodel.Enum(cmodel.U8, "NONE", "PLAYER", "ENEMY")
+    position = Point
+    tiles = cmodel.Array(cmodel.U8, 3)
+    path = cmodel.Array(Point, 2)
+    label = cmodel.Blob(2)
+    
+    __order__ = ["kind", "position", "tiles", "path", "label"]
+
+class Named(cmodel.Struct):
+    size = cmodel.U8
+    name = cmodel.Blob("size")
+    
+    __order__ = ["size", "name"]
+
+ENTRY = b"\x01\x02\x00\x00\x03\x04\x05\x06\x07\x00\x00\x08\x09\x00\x00\x0aok"
+
+class StructOverlay(unittest.TestCase):
+    def test_read(self):
+        buf = bytearray(b"pad" + ENTRY)
+        overlay = Entry.overlay(buf, 3)
+        self.assertEqual(overlay.kind, 1)
+        self.assertEqual((overlay.position.x, overlay.position.y), (2, 3))
+        self.assertEqual(overlay.label, b"ok")
+        self.assertEqual(overlay.bytes, ENTRY)
+        self.assertEqual(overlay.core, Entry.from_mmap(ENTRY).core)
+    
+    def test_write(self):
+        buf = bytearray(ENTRY)
+        overlay = Entry.overlay(buf)
+        overlay.kind = 2
+        overlay.position.y = 0x1234
+        overlay.label = b"no"
+        self.assertEqual(buf[:5], b"\x02\x02\x00\x12\x34")
+        self.assertEqual(buf[-2:], b"no")
+        
+        self.assertRaises(cmodel.CorruptedData, setattr, overlay, "kind", 3)
+        self.assertEqual(buf[:5], b"\x02\x02\x00\x12\x34")
+        
+        #Unsigned ints wrap, the same as they do in a Struct
+        overlay.position.x = 0x10001
+        self.assertEqual(buf[1:3], b"\x01\x00")
+    
+    def test_write_nested(self):
+        buf = bytearray(ENTRY)
+        overlay = Entry.overlay(buf)
+        overlay.position = (5, 6)
+        self.assertEqual(buf[1:5], b"\x05\x00\x00\x06")
+    
+    def test_core(self):
+        buf = bytearray(len(ENTRY))
+        Entry.overlay(buf).core = Entry.from_mmap(ENTRY).core
+        self.assertEqual(buf, ENTRY)
+    
+    def test_mmap(self):
+        mapping = mmap.mmap(-1, len(ENTRY))
+        mapping[:] = ENTRY
+        overlay = Entry.overlay(mapping)
+        overlay.position.x = 9
+        self.assertEqual(mapping[1:3], b"\x09\x00")
+        mapping.close()
+    
+    def test_bounds(self):
+        self.assertRaises(cmodel.CorruptedData, Point.overlay, bytearray(4), 1)
+        self.assertRaises(cmodel.CorruptedData, Point.overlay, bytearray(4), -1)
+        self.assertRaises(PEBKAC, Named.overlay, bytearray(b"\x01a"))
+
+class ArrayOverlay(unittest.TestCase):
+    def test_ints(self):
+        buf = bytearray(ENTRY)
+        tiles = Entry.overlay(buf).tiles
+        self.assertEqual(len(tiles), 3)
+        self.assertEqual(list(tiles), [4, 5, 6])
+        self.assertEqual(tiles[-1], 6)
+        
+        tiles[0] = 0xff
+        self.assertEqual(buf[5], 0xff)
+        self.assertRaises(IndexError, tiles.__getitem__, 3)
+        self.assertRaises(IndexError, tiles.__setitem__, -4, 0)
+    
+    def test_structs(self):
+        buf = bytearray(ENTRY)
+        overlay = Entry.overlay(buf)
+        self.assertEqual(overlay.path[1].core, (9, 10))
+        self.assertEqual(overlay.path.core, [(7, 8), (9, 10)])
+        
+        overlay.path[0].x = 1
+        self.assertEqual(buf[8:10], b"\x01\x00")
+    
+    def test_whole(self):
+        buf = bytearray(ENTRY)
+        overlay = Entry.overlay(buf)
+        overlay.tiles = [1, 2, 3]
+        overlay.path = [(1, 2), (3, 4)]
+        self.assertEqual(buf[5:16], b"\x01\x02\x03\x01\x00\x00\x02\x03\x00\x00\x04")
+        self.assertRaises(cmodel.CorruptedData, setattr, overlay, "tiles", [1, 2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Arrays of fixed-size elements must load from files which can't seek."""
+import io, os, unittest
+
+from CodeModule import cmodel, bps
+
+class Pair(cmodel.Struct):
+    left = cmodel.LeU16
+    right = cmodel.LeU16
+    
+    __order__ = ["left", "right"]
+
+class Shorts(cmodel.Struct):
+    count = cmodel.LeU16
+    values = cmodel.Array(cmodel.LeU16, "count")
+    rest = cmodel.Array(cmodel.LeU16, 4, cmodel.ParseToEOF)
+    trailer = cmodel.LeU16
+    trailer2 = cmodel.LeU16
+    
+    __order__ = ["count", "values", "rest", "trailer", "trailer2"]
+
+class Pairs(cmodel.Struct):
+    count = cmodel.LeU16
+    rows = cmodel.Array(Pair, "count", columnar = True)
+    rest = cmodel.Array(Pair, 2, cmodel.ParseToEOF, columnar = True)
+    trailer = cmodel.LeU16
+    
+    __order__ = ["count", "rows", "rest", "trailer"]
+
+class Named(cmodel.Struct):
+    size = cmodel.U8
+    name = cmodel.Blob("size")
+    
+    __order__ = ["size", "name"]
+
+class Names(cmodel.Struct):
+    names = cmodel.Array(Named, 2, cmodel.ParseToEOF)
+    trailer = cmodel.LeU16
+    
+    __order__ = ["names", "trailer"]
+
+class LazyNames(cmodel.Struct):
+    names = cmodel.Array(Named, 2, cmodel.ParseToEOF, lazy = True)
+    trailer = cmodel.LeU16
+    
+    __order__ = ["names", "trailer"]
+
+DATA = b"\x02\x00\x01\x00\x02\x00\x03\x00\x04\x00\x05\x00\x06\x00"
+NAMES = b"\x02ab\x00\x03cde\x07\x00"
+#A target read of "hi" and a source read, both two bytes long
+PATCH = b"BPS1\x84\x84\x80\x85hi\x84" + bytes(range(12))
+PAIRS = b"\x01\x00\x01\x00\x02\x00\x03\x00\x04\x00\x05\x00"
+
+def piped(data):
+    """Get a file reading data out of a pipe."""
+    readfd, writefd = os.pipe()
+    os.write(writefd, data)
+    os.close(writefd)
+    return os.fdopen(readfd, "rb")
+
+class UnseekableLoad(unittest.TestCase):
+    def test_struct_from_pipe(self):
+        obj = Shorts()
+        with piped(DATA) as fileobj:
+            obj.load(fileobj)
+        
+        self.assertEqual(list(obj.values), [1, 2])
+        self.assertEqual(list(obj.rest), [3, 4])
+        self.assertEqual((obj.trailer, obj.trailer2), (5, 6))
+        self.assertEqual(obj.bytes, DATA)
+    
+    def test_counted_from_pipe(self):
+        obj = Shorts()
+        obj.parsebytes(DATA)
+        with piped(b"\x07\x00\x08\x00\x09\x00") as fileobj:
+            obj.values.load(fileobj)
+            self.assertEqual(fileobj.read(), b"\x09\x00")
+        
+        self.assertEqual(list(obj.values), [7, 8])
+    
+    def test_counted_short_read(self):
+        obj = Shorts()
+        obj.parsebytes(DATA)
+        with piped(b"\x07\x00") as fileobj:
+            self.assertRaises(cmodel.CorruptedData, obj.values.load, fileobj)
+    
+    def test_to_end_keeps_position(self):
+        obj = Shorts()
+        obj.parsebytes(DATA)
+        fileobj = io.BytesIO(b"\xff\xff" + DATA[6:])
+        fileobj.seek(2)
+        obj.rest.load(fileobj)
+        self.assertEqual(list(obj.rest), [3, 4])
+        self.assertEqual(fileobj.tell(), 6)
+
+    def test_columnar_from_pipe(self):
+        obj = Pairs()
+        with piped(PAIRS) as fileobj:
+            obj.load(fileobj)
+        
+        self.assertEqual(obj.rows.core, [(1, 2)])
+        self.assertEqual(obj.rest.core, [(3, 4)])
+        self.assertEqual(obj.trailer, 5)
+        self.assertEqual(obj.bytes, PAIRS)
+    
+    def test_columnar_counted_from_pipe(self):
+        obj = Pairs()
+        obj.parsebytes(PAIRS)
+        with piped(b"\x07\x00\x08\x00\x09\x00") as fileobj:
+            obj.rows.load(fileobj)
+            self.assertEqual(fileobj.read(), b"\x09\x00")
+        
+        self.assertEqual(obj.rows.core, [(7, 8)])
+    
+    def test_variable_to_end_from_pipe(self):
+        for schema in (Names, LazyNames):
+            obj = schema()
+            with piped(NAMES) as fileobj:
+                obj.load(fileobj)
+            
+            self.assertEqual([named.name for named in obj.names.core], [b"ab", b"", b"cde"])
+            self.assertEqual(obj.trailer, 7)
+            self.assertEqual(obj.bytes, NAMES)
+    
+    def test_patch_from_pipe(self):
+        patch = bps.BPSPatchStruct()
+        with piped(PATCH) as fileobj:
+            patch.load(fileobj)
+        
+        self.assertEqual([entry.length for entry in patch.core.patchData], [2, 2])
+        self.assertEqual(patch.core.patchData[0].command.contents.data, b"hi")
+        self.assertEqual(patch.tgtChksum, 0x07060504)
+        self.assertEqual(patch.bytes, PATCH)
+        
+        with piped(PATCH[7:]) as fileobj:
+            actions = [entry.action for entry in patch.patchData.iter_load(fileobj)]
+        self.assertEqual(actions, [1, 0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""validate must report where bad data is, and never raise for bad schemas."""
+import io, unittest
+
+from CodeModule import cmodel
+
+class Entry(cmodel.Struct):
+    kind = cmodel.Enum(cmodel.U8, "A", "B")
+    value = cmodel.LeU16
+    
+    __order__ = ["kind", "value"]
+
+class Table(cmodel.Struct):
+    magic = cmodel.Magic(b"TB")
+    count = cmodel.U8
+    entries = cmodel.Array(Entry, "count")
+    
+    __order__ = ["magic", "count", "entries"]
+
+class Sized(cmodel.Struct):
+    data = cmodel.Blob("size")
+    
+    __order__ = ["data"]
+
+class Group(cmodel.Struct):
+    kind = cmodel.U8
+    
+    __order__ = ["kind"]
+
+class Payload(cmodel.Struct):
+    value = cmodel.LeU16
+    
+    __order__ = ["value"]
+
+class Item(cmodel.Struct):
+    group = cmodel.U8
+    data = cmodel.If(lambda item: item._CField__container._CField__container.groups[item.group].kind == 1, Payload)
+    
+    __order__ = ["group", "data"]
+
+class Document(cmodel.Struct):
+    numgroups = cmodel.U8
+    groups = cmodel.Array(Group, "numgroups")
+    numitems = cmodel.U8
+    items = cmodel.Array(Item, "numitems")
+    
+    __order__ = ["numgroups", "groups", "numitems", "items"]
+
+#The first item is in the group of kind 1, so it has data; the second isn't
+DOCUMENT = b"\x02\x00\x01\x02\x01\x05\x00\x00"
+
+GOOD = b"TB\x02\x00\x01\x00\x01\x02\x00"
+BAD = b"TB\x02\x00\x01\x00\x05\x02\x00"
+
+class Validate(unittest.TestCase):
+    def test_buffer(self):
+        self.assertEqual(Table.validate(GOOD), (True, 9))
+        self.assertEqual(Table.validate(BAD), (False, 6))
+        self.assertEqual(Table.validate(b"xx" + BAD, 2), (False, 8))
+    
+    def test_file_offsets(self):
+        fileobj = io.BytesIO(b"junk" + BAD)
+        fileobj.seek(4)
+        self.assertEqual(Table.validate(fileobj), (False, 10))
+        
+        fileobj = io.BytesIO(b"junk" + GOOD)
+        fileobj.seek(4)
+        self.assertEqual(Table.validate(fileobj), (True, 13))
+    
+    def test_missing_argument(self):
+        self.assertEqual(Sized.validate(b"abc"), (False, 0))
+        self.assertEqual(Sized.validate(b"abc", 1), (False, 1))
+    
+    def test_callable_condition(self):
+        created = []
+        def init(self, *args, **kwargs):
+            created.append(self)
+            cmodel.Struct.__init__(self, *args, **kwargs)
+        
+        Item.__init__ = init
+        try:
+            self.assertEqual(Document.validate(DOCUMENT), (True, 8))
+        finally:
+            del Item.__init__
+        self.assertEqual(created, [])
+        
+        #The second item's group doesn't exist, so its data is bad
+        self.assertEqual(Document.validate(DOCUMENT[:-1] + b"\x05"), (False, 8))
+        self.assertEqual(Document.validate(DOCUMENT[:-2]), (False, 5))
+        #Items can't be checked outside of a Document
+        self.assertEqual(Item.validate(b"\x01\x00"), (False, 1))
+
+if __name__ == "__main__":
+    unittest.main()